@@ -0,0 +1,246 @@
+"""
+Benchmark middlewares by crawling the local fixture site with real browsers
+
+    python benchmarks/run.py                       # run all configurations, compare with baselines
+    python benchmarks/run.py -c default -c tabs    # run some configurations
+    python benchmarks/run.py --save                # save results as baselines
+    python benchmarks/run.py --ci                  # fail if a configuration has no baseline
+
+Every configuration is crawled in its own process, pages/sec, p50/p99 latency,
+peak RSS and peak number of browser processes are reported. The run fails if any
+metric is worse than its baseline by more than the tolerance. No baselines are shipped,
+as they depend on hardware, so CI must record them by --save first, with --ci (on if the
+CI environment variable is set) a missing baseline fails the run instead of being skipped.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+import server
+
+BASELINES = os.path.join(HERE, 'baselines.json')
+
+ASYNCIO = {
+    'TWISTED_REACTOR': 'twisted.internet.asyncioreactor.AsyncioSelectorReactor',
+    'DOWNLOADER_MIDDLEWARES': {
+        'gerapy_selenium.downloadermiddlewares.AsyncSeleniumMiddleware': 543,
+    },
+}
+
+CONFIGS = {
+    'default': {},
+    'tabs': {'GERAPY_SELENIUM_TABS_PER_BROWSER': 4},
+    'block': {'GERAPY_SELENIUM_IGNORE_RESOURCE_TYPES': ['image', 'font', 'stylesheet']},
+    'networkidle': {'GERAPY_SELENIUM_WAIT_UNTIL': 'networkidle'},
+    'asyncio': dict(ASYNCIO, GERAPY_SELENIUM_TABS_PER_BROWSER=4),
+}
+
+# metrics compared with baselines, True if higher is better
+METRICS = {
+    'pages_per_sec': True,
+    'p50': False,
+    'p99': False,
+    'peak_rss_mb': False,
+    'peak_browser_processes': False,
+}
+
+
+def crawl(config, port, pages, concurrency):
+    """
+    crawl fixture site in this process and print result as json
+    :param config: name of configuration
+    :param port: port of fixture site
+    :param pages: number of pages
+    :param concurrency: CONCURRENT_REQUESTS
+    :return:
+    """
+    import scrapy
+    from scrapy.crawler import CrawlerProcess
+    from gerapy_selenium import SeleniumRequest
+
+    class BenchmarkSpider(scrapy.Spider):
+        name = 'benchmark'
+
+        async def start(self):
+            for request in self.start_requests():
+                yield request
+
+        def start_requests(self):
+            for index in range(pages):
+                kind = server.KINDS[index % len(server.KINDS)]
+                yield SeleniumRequest(f'http://127.0.0.1:{port}/{kind}/{index}', wait_for='.item',
+                                      callback=self.parse)
+
+        def parse(self, response):
+            yield {'url': response.url, 'items': len(response.css('.item'))}
+
+    settings = {
+        'LOG_LEVEL': 'WARNING',
+        'CONCURRENT_REQUESTS': concurrency,
+        'DOWNLOADER_MIDDLEWARES': {
+            'gerapy_selenium.downloadermiddlewares.SeleniumMiddleware': 543,
+        },
+        'GERAPY_SELENIUM_SLEEP': 0,
+        'GERAPY_SELENIUM_HEADLESS': True,
+        'GERAPY_SELENIUM_NO_SANDBOX': True,
+    }
+    settings.update(CONFIGS[config])
+    process = CrawlerProcess(settings)
+    crawler = process.create_crawler(BenchmarkSpider)
+    process.crawl(crawler)
+    start = time.time()
+    process.start()
+    elapsed = time.time() - start
+    stats = crawler.stats.get_stats()
+    count = stats.get('item_scraped_count', 0)
+    print(json.dumps({
+        'pages': count,
+        'errors': stats.get('log_count/ERROR', 0),
+        'pages_per_sec': count / elapsed if elapsed else 0,
+        'p50': stats.get('selenium/timing/total/p50'),
+        'p99': stats.get('selenium/timing/total/p99'),
+    }))
+
+
+def sample(pid):
+    """
+    get rss in MB and number of browser processes of process tree
+    :param pid:
+    :return:
+    """
+    try:
+        root = psutil.Process(pid)
+        processes = [root] + root.children(recursive=True)
+    except psutil.NoSuchProcess:
+        return 0, 0
+    rss, browsers = 0, 0
+    for process in processes:
+        try:
+            rss += process.memory_info().rss
+            name = process.name().lower()
+        except psutil.NoSuchProcess:
+            continue
+        if ('chrome' in name or 'chromium' in name) and 'driver' not in name:
+            browsers += 1
+    return rss / 1024 / 1024, browsers
+
+
+def run(config, port, pages, concurrency):
+    """
+    run configuration in child process and watch its resources
+    :param config:
+    :param port:
+    :param pages:
+    :param concurrency:
+    :return: metrics
+    """
+    child = subprocess.Popen([sys.executable, __file__, '--child', config, '--port', str(port),
+                              '--pages', str(pages), '--concurrency', str(concurrency)],
+                             stdout=subprocess.PIPE, text=True)
+    peak_rss, peak_browsers = None, None
+    if psutil is not None:
+        peak_rss, peak_browsers = 0, 0
+        while child.poll() is None:
+            rss, browsers = sample(child.pid)
+            peak_rss, peak_browsers = max(peak_rss, rss), max(peak_browsers, browsers)
+            time.sleep(0.2)
+    output, _ = child.communicate()
+    if child.returncode:
+        raise RuntimeError(f'benchmark {config} exited with code {child.returncode}')
+    result = json.loads(output.strip().splitlines()[-1])
+    result['peak_rss_mb'] = peak_rss
+    result['peak_browser_processes'] = peak_browsers
+    return result
+
+
+def compare(config, result, baseline, tolerance):
+    """
+    compare result with baseline
+    :param config:
+    :param result:
+    :param baseline:
+    :param tolerance: allowed ratio of regression, like 0.2
+    :return: list of regressions
+    """
+    regressions = []
+    for metric, higher_is_better in METRICS.items():
+        value, expected = result.get(metric), baseline.get(metric)
+        if value is None or not expected:
+            continue
+        if higher_is_better and value < expected * (1 - tolerance) or \
+                not higher_is_better and value > expected * (1 + tolerance):
+            regressions.append(f'{config} {metric}: {value:.3f}, baseline {expected:.3f}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of gerapy-selenium')
+    parser.add_argument('-c', '--config', action='append', choices=sorted(CONFIGS),
+                        help='configuration to run, all by default')
+    parser.add_argument('--pages', type=int, default=100, help='number of pages to crawl')
+    parser.add_argument('--concurrency', type=int, default=8, help='CONCURRENT_REQUESTS')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed ratio of regression')
+    parser.add_argument('--save', action='store_true', help='save results as baselines')
+    parser.add_argument('--ci', action='store_true', default=bool(os.environ.get('CI')),
+                        help='fail if a configuration has no baseline, on if CI environment variable is set')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return crawl(args.child, args.port, args.pages, args.concurrency)
+    if psutil is None:
+        print('psutil is not installed, peak rss and browser processes are not measured')
+
+    baselines = {}
+    if os.path.exists(BASELINES):
+        with open(BASELINES) as f:
+            baselines = json.load(f)
+    configs = args.config or list(CONFIGS)
+    missing = [config for config in configs if config not in baselines]
+    if missing and args.ci and not args.save:
+        print(f'no baselines of {", ".join(missing)} in {BASELINES}, record them by --save on this machine')
+        sys.exit(1)
+
+    fixture = server.start()
+    port = fixture.server_address[1]
+    results = {}
+    for config in configs:
+        results[config] = run(config, port, args.pages, args.concurrency)
+        print(config, json.dumps(results[config]))
+    fixture.shutdown()
+
+    if args.save:
+        baselines.update(results)
+        with open(BASELINES, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f'saved baselines to {BASELINES}')
+        return
+
+    regressions = []
+    for config, result in results.items():
+        if result['errors'] or result['pages'] < args.pages:
+            regressions.append(f'{config}: {result["pages"]} of {args.pages} pages, {result["errors"]} errors')
+        if config in baselines:
+            regressions.extend(compare(config, result, baselines[config], args.tolerance))
+        else:
+            print(f'no baseline of {config}, run with --save to record one, regressions are not checked')
+    if regressions:
+        print('regressions:\n' + '\n'.join(regressions))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+Local fixture site of synthetic pages for benchmarks:
+
+* /static/<n>: content in raw html
+* /xhr/<n>: content loaded by fetch from /api/<n>
+* /lazy/<n>: content inserted by timer, lazy loaded images
+* /slow/<n>: content in raw html, with assets which delay load event
+* /huge/<n>: content with a dom of tens of thousands of nodes
+"""
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+KINDS = ('static', 'xhr', 'lazy', 'slow', 'huge')
+
+# delay of slow assets and api
+SLOW_DELAY = 1.0
+API_DELAY = 0.2
+HUGE_NODES = 20000
+
+TEMPLATE = '''<!DOCTYPE html>
+<html>
+<head><title>{title}</title><link rel="stylesheet" href="/asset/style.css"></head>
+<body>
+<div id="content">{content}</div>
+{extra}
+</body>
+</html>'''
+
+ITEMS = ''.join(f'<div class="item"><h2>Item {index}</h2><p>Description of item {index}</p></div>'
+                for index in range(20))
+
+XHR_SCRIPT = '''<script>
+fetch('/api/{n}').then(response => response.json()).then(data => {{
+  document.getElementById('content').innerHTML = data.items.map(
+    item => `<div class="item"><h2>${{item}}</h2></div>`).join('');
+}});
+</script>'''
+
+LAZY_SCRIPT = '''<script>
+setTimeout(() => {{
+  document.getElementById('content').innerHTML = `{items}`;
+}}, 300);
+</script>
+''' + ''.join(f'<img loading="lazy" src="/asset/lazy-{index}.png" width="100" height="100">' for index in range(50))
+
+SLOW_ASSETS = ''.join(f'<img src="/asset/slow-{index}.png?delay={SLOW_DELAY}">' for index in range(3))
+
+# 1x1 transparent png
+PNG = bytes.fromhex('89504e470d0a1a0a0000000d4948445200000001000000010806000000'
+                    '1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082')
+
+
+def page(kind, n):
+    """
+    render fixture page
+    :param kind: one of KINDS
+    :param n: number of page
+    :return:
+    """
+    title = f'{kind} {n}'
+    if kind == 'static':
+        return TEMPLATE.format(title=title, content=ITEMS, extra='')
+    if kind == 'xhr':
+        return TEMPLATE.format(title=title, content='', extra=XHR_SCRIPT.format(n=n))
+    if kind == 'lazy':
+        return TEMPLATE.format(title=title, content='', extra=LAZY_SCRIPT.format(items=ITEMS))
+    if kind == 'slow':
+        return TEMPLATE.format(title=title, content=ITEMS, extra=SLOW_ASSETS)
+    if kind == 'huge':
+        rows = ''.join(f'<tr><td>{index}</td><td><span>cell</span></td><td><a href="#{index}">link</a></td></tr>'
+                       for index in range(HUGE_NODES // 6))
+        return TEMPLATE.format(title=title, content=ITEMS, extra=f'<table>{rows}</table>')
+    raise ValueError(f'unknown kind {kind}')
+
+
+class Handler(BaseHTTPRequestHandler):
+    """
+    Serve fixture pages, api and assets
+    """
+
+    def _send(self, body, content_type='text/html; charset=utf-8'):
+        if isinstance(body, str):
+            body = body.encode()
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path, _, query = self.path.partition('?')
+        match = re.fullmatch(r'/(\w+)/(\d+)', path)
+        if match and match.group(1) in KINDS:
+            return self._send(page(match.group(1), int(match.group(2))))
+        if match and match.group(1) == 'api':
+            time.sleep(API_DELAY)
+            items = [f'Item {index}' for index in range(20)]
+            return self._send(json.dumps({'items': items}), 'application/json')
+        if path == '/asset/style.css':
+            return self._send('.item { margin: 4px; }', 'text/css')
+        if path.startswith('/asset/'):
+            delay = re.search(r'delay=([\d.]+)', query)
+            if delay:
+                time.sleep(float(delay.group(1)))
+            return self._send(PNG, 'image/png')
+        self.send_error(404)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start(port=0):
+    """
+    start fixture server in background thread
+    :param port: 0 to pick a free port
+    :return: server, server.server_address[1] is the port
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    server = start(8000)
+    print(f'serving fixture site on http://127.0.0.1:{server.server_address[1]}')
+    threading.Event().wait()
@@ -1,2 +1,2 @@
-from .downloadermiddlewares import SeleniumMiddleware
+from .downloadermiddlewares import SeleniumMiddleware, AsyncSeleniumMiddleware
 from .request import SeleniumRequest
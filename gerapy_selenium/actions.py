@@ -0,0 +1,150 @@
+import time
+import uuid
+from selenium.common.exceptions import TimeoutException
+from gerapy_selenium.pool import TabDriver
+
+# supported actions and their required fields
+ACTIONS = {
+    'scroll': (),
+    'click': ('selector',),
+    'type': ('selector', 'text'),
+    'wait_for': ('selector',),
+    'wait': ('seconds',),
+    'evaluate': ('script',),
+}
+
+# run actions one by one in page, scripts of `evaluate` are compiled in as functions,
+# so that they are not blocked by content security policy like `new Function`
+RUNNER_SCRIPT = '''async function (actions, timeout) {
+  const scripts = [%s];
+  const sleep = ms => new Promise(resolve => setTimeout(resolve, ms));
+  const find = selector => {
+    const element = document.querySelector(selector);
+    if (!element) throw new Error(`no element matches ${selector}`);
+    return element;
+  };
+  const results = [];
+  for (let index = 0; index < actions.length; index++) {
+    const action = actions[index];
+    let result = null;
+    try {
+      switch (action.action) {
+        case 'scroll':
+          if (action.selector) find(action.selector).scrollIntoView();
+          else if (action.by) window.scrollBy(0, action.by);
+          else window.scrollTo(0, document.scrollingElement.scrollHeight);
+          break;
+        case 'click':
+          find(action.selector).click();
+          break;
+        case 'type': {
+          const element = find(action.selector);
+          element.focus();
+          // set value by native setter, so that frameworks like react notice the change
+          Object.getOwnPropertyDescriptor(Object.getPrototypeOf(element), 'value').set.call(element, action.text);
+          element.dispatchEvent(new Event('input', {bubbles: true}));
+          element.dispatchEvent(new Event('change', {bubbles: true}));
+          break;
+        }
+        case 'wait_for': {
+          const deadline = Date.now() + (action.timeout ?? timeout) * 1000;
+          while (!document.querySelector(action.selector)) {
+            if (Date.now() > deadline) throw new Error(`timeout waiting for ${action.selector}`);
+            await sleep(100);
+          }
+          break;
+        }
+        case 'wait':
+          await sleep(action.seconds * 1000);
+          break;
+        case 'evaluate':
+          result = await scripts[action.script]();
+          break;
+      }
+    } catch (e) {
+      return {results: results, error: `${action.action} of action ${index} failed: ${e.message || e}`};
+    }
+    results.push(result === undefined ? null : result);
+  }
+  return {results: results};
+}'''
+
+# run async function of two arguments by execute_async_script of webdriver, which passes callback as last argument
+ASYNC_SCRIPT = '''const done = arguments[arguments.length - 1];
+(%s)(arguments[0], arguments[1]).then(done, e => done({results: [], error: String(e)}));'''
+
+# start async function of two arguments by execute_script of webdriver, its result is kept in window
+START_SCRIPT = '''const key = arguments[2];
+window[key] = {done: false};
+(%s)(arguments[0], arguments[1]).then(
+  result => { window[key] = {done: true, result: result}; },
+  e => { window[key] = {done: true, result: {results: [], error: String(e)}}; });'''
+
+# get result of function started by START_SCRIPT
+POLL_SCRIPT = '''const state = window[arguments[0]];
+if (!state) return {done: true, result: {results: [], error: 'page navigated away'}};
+if (state.done) delete window[arguments[0]];
+return state;'''
+
+# run async function of two arguments by execute_script of page, which awaits promise
+PAGE_SCRIPT = 'return (%s)(arguments[0], arguments[1]);'
+
+
+def compile_actions(actions):
+    """
+    compile actions to a javascript function and its argument
+    :param actions: list of dict, like `{'action': 'click', 'selector': '.more'}`
+    :return: source of function, actions argument
+    """
+    scripts, compiled = [], []
+    for index, action in enumerate(actions):
+        name = action.get('action')
+        if name not in ACTIONS:
+            raise ValueError(f'unknown action {name!r} of action {index}, supported are {", ".join(ACTIONS)}')
+        missing = [field for field in ACTIONS[name] if action.get(field) is None]
+        if missing:
+            raise ValueError(f'{name} of action {index} requires {", ".join(missing)}')
+        action = dict(action)
+        if name == 'evaluate':
+            scripts.append(f'async function () {{\n{action["script"]}\n}}')
+            action['script'] = len(scripts) - 1
+        compiled.append(action)
+    return RUNNER_SCRIPT % ', '.join(scripts), compiled
+
+
+def run_function(browser, function, arguments, timeout, interval=0.1):
+    """
+    run async function of two arguments in page of webdriver, browser used exclusively runs it by one
+    execute_async_script, for tab the function is started and its result is polled by short calls,
+    so that other tabs of browser are not blocked while it runs
+    :param browser: webdriver or TabDriver
+    :param function: source of async function
+    :param arguments: tuple of two arguments
+    :param timeout: max seconds to wait for result
+    :param interval: seconds between polls of tab
+    :return: result of function
+    """
+    if not isinstance(browser, TabDriver):
+        browser.set_script_timeout(timeout)
+        return browser.execute_async_script(ASYNC_SCRIPT % function, arguments[0], arguments[1])
+    key = f'__gerapyTask{uuid.uuid4().hex}'
+    browser.execute_script(START_SCRIPT % function, arguments[0], arguments[1], key)
+    deadline = time.time() + timeout
+    while True:
+        state = browser.execute_script(POLL_SCRIPT, key)
+        if state['done']:
+            return state['result']
+        if time.time() > deadline:
+            raise TimeoutException(f'timeout running script in {timeout}s')
+        time.sleep(interval)
+
+
+def page_script(actions):
+    """
+    get script running actions by execute_script of page which awaits promise,
+    called with actions and default timeout
+    :param actions:
+    :return: script, actions argument
+    """
+    function, arguments = compile_actions(actions)
+    return PAGE_SCRIPT % function, arguments
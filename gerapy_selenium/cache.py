@@ -0,0 +1,232 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+from io import BytesIO
+from scrapy.http import HtmlResponse
+from scrapy.utils.project import data_path
+from w3lib.url import canonicalize_url
+from gerapy_selenium.settings import GERAPY_SELENIUM_CACHE_DIR, GERAPY_SELENIUM_CACHE_EXPIRATION_SECS, \
+    GERAPY_SELENIUM_CACHE_GZIP
+
+logger = logging.getLogger('gerapy.selenium')
+
+# selenium meta which does not affect rendered content
+IGNORED_FIELDS = ('proxy', 'timeout', 'http_first', 'render_check', 'partial')
+
+
+def request_fingerprint(request):
+    """
+    fingerprint of request by url and selenium meta which affect rendered content
+    :param request:
+    :return:
+    """
+    selenium_meta = request.meta.get('selenium') or {}
+    fields = {key: value for key, value in selenium_meta.items()
+              if key not in IGNORED_FIELDS and value is not None}
+    fingerprint = hashlib.sha1()
+    fingerprint.update(canonicalize_url(request.url).encode())
+    fingerprint.update(json.dumps(fields, sort_keys=True, default=str).encode())
+    return fingerprint.hexdigest()
+
+
+def dump_response(response):
+    """
+    serialize rendered response
+    :param response:
+    :return:
+    """
+    screenshot = response.meta.get('screenshot')
+    if isinstance(screenshot, BytesIO):
+        screenshot = screenshot.getvalue()
+    return pickle.dumps({
+        'url': response.url,
+        'status': response.status,
+        'body': response.body,
+        'screenshot': screenshot,
+        'extracted': response.meta.get('selenium_extracted'),
+        'actions': response.meta.get('selenium_actions'),
+        'captured': response.meta.get('selenium_captured'),
+    }, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load_response(data, request):
+    """
+    deserialize rendered response
+    :param data:
+    :param request:
+    :return:
+    """
+    data = pickle.loads(data)
+    response = HtmlResponse(
+        data['url'],
+        status=data['status'],
+        body=data['body'],
+        encoding='utf-8',
+        request=request
+    )
+    screenshot = data.get('screenshot')
+    if isinstance(screenshot, bytes):
+        response.meta['screenshot'] = BytesIO(screenshot)
+    elif screenshot is not None:
+        response.meta['screenshot'] = screenshot
+    if data.get('extracted') is not None:
+        response.meta['selenium_extracted'] = data['extracted']
+    if data.get('actions') is not None:
+        response.meta['selenium_actions'] = data['actions']
+    if data.get('captured') is not None:
+        response.meta['selenium_captured'] = data['captured']
+    return response
+
+
+class FilesystemCacheStorage(object):
+    """
+    Store rendered responses as files, one file for every fingerprint
+    """
+
+    def __init__(self, settings):
+        """
+        :param settings: scrapy settings
+        """
+        self.cachedir = data_path(settings.get('GERAPY_SELENIUM_CACHE_DIR', GERAPY_SELENIUM_CACHE_DIR))
+        self.expiration_secs = settings.getint('GERAPY_SELENIUM_CACHE_EXPIRATION_SECS',
+                                               GERAPY_SELENIUM_CACHE_EXPIRATION_SECS)
+        self.use_gzip = settings.getbool('GERAPY_SELENIUM_CACHE_GZIP', GERAPY_SELENIUM_CACHE_GZIP)
+
+    def open_spider(self, spider):
+        """
+        open storage when spider opened
+        :param spider:
+        :return:
+        """
+        logger.debug('using filesystem cache storage in %s', self.cachedir)
+
+    def close_spider(self, spider):
+        """
+        close storage when spider closed
+        :param spider:
+        :return:
+        """
+
+    def _get_path(self, spider, request):
+        """
+        get file path of request
+        :param spider:
+        :param request:
+        :return:
+        """
+        fingerprint = request_fingerprint(request)
+        filename = fingerprint + ('.pickle.gz' if self.use_gzip else '.pickle')
+        return os.path.join(self.cachedir, spider.name, fingerprint[:2], filename)
+
+    def retrieve_response(self, spider, request):
+        """
+        get cached response of request, None if not cached or expired
+        :param spider:
+        :param request:
+        :return:
+        """
+        path = self._get_path(spider, request)
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            return None
+        if 0 < self.expiration_secs < time.time() - mtime:
+            return None
+        opener = gzip.open if self.use_gzip else open
+        with opener(path, 'rb') as f:
+            return load_response(f.read(), request)
+
+    def store_response(self, spider, request, response):
+        """
+        cache rendered response of request
+        :param spider:
+        :param request:
+        :param response:
+        :return:
+        """
+        path = self._get_path(spider, request)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write to temp file first, so that readers never see partial file
+        temp_path = f'{path}.{threading.get_ident()}.tmp'
+        opener = gzip.open if self.use_gzip else open
+        with opener(temp_path, 'wb') as f:
+            f.write(dump_response(response))
+        os.replace(temp_path, path)
+
+
+class DbmCacheStorage(object):
+    """
+    Store rendered responses in a dbm database of every spider
+    """
+
+    def __init__(self, settings):
+        """
+        :param settings: scrapy settings
+        """
+        self.cachedir = data_path(settings.get('GERAPY_SELENIUM_CACHE_DIR', GERAPY_SELENIUM_CACHE_DIR),
+                                  createdir=True)
+        self.expiration_secs = settings.getint('GERAPY_SELENIUM_CACHE_EXPIRATION_SECS',
+                                               GERAPY_SELENIUM_CACHE_EXPIRATION_SECS)
+        self.use_gzip = settings.getbool('GERAPY_SELENIUM_CACHE_GZIP', GERAPY_SELENIUM_CACHE_GZIP)
+        self.dbmodule = __import__(settings.get('GERAPY_SELENIUM_CACHE_DBM_MODULE', 'dbm'))
+        self.db = None
+        self._lock = threading.Lock()
+
+    def open_spider(self, spider):
+        """
+        open database of spider
+        :param spider:
+        :return:
+        """
+        path = os.path.join(self.cachedir, f'{spider.name}.db')
+        self.db = self.dbmodule.open(path, 'c')
+        logger.debug('using dbm cache storage in %s', path)
+
+    def close_spider(self, spider):
+        """
+        close database of spider
+        :param spider:
+        :return:
+        """
+        with self._lock:
+            self.db.close()
+
+    def retrieve_response(self, spider, request):
+        """
+        get cached response of request, None if not cached or expired
+        :param spider:
+        :param request:
+        :return:
+        """
+        key = request_fingerprint(request)
+        with self._lock:
+            data = self.db.get(f'{key}_data')
+            stored = self.db.get(f'{key}_time')
+        if data is None:
+            return None
+        if 0 < self.expiration_secs < time.time() - float(stored):
+            return None
+        if self.use_gzip:
+            data = gzip.decompress(data)
+        return load_response(data, request)
+
+    def store_response(self, spider, request, response):
+        """
+        cache rendered response of request
+        :param spider:
+        :param request:
+        :param response:
+        :return:
+        """
+        key = request_fingerprint(request)
+        data = dump_response(response)
+        if self.use_gzip:
+            data = gzip.compress(data)
+        with self._lock:
+            self.db[f'{key}_data'] = data
+            self.db[f'{key}_time'] = str(time.time())
@@ -0,0 +1,191 @@
+import asyncio
+import base64
+import json
+import logging
+import re
+import time
+
+logger = logging.getLogger('gerapy.selenium')
+
+# log of webdriver with devtools events, enabled by `goog:loggingPrefs` capability
+PERFORMANCE_LOG = 'performance'
+
+
+def parse_log_entry(entry):
+    """
+    parse entry of performance log
+    :param entry: dict of `message`, which is json of `message` and `webview`
+    :return: tuple of (webview, method, params)
+    """
+    message = json.loads(entry['message'])
+    event = message.get('message') or {}
+    return message.get('webview'), event.get('method'), event.get('params') or {}
+
+
+class ResponseCapture(object):
+    """
+    Collect network responses whose urls match patterns from devtools events of a page
+    """
+
+    def __init__(self, patterns):
+        """
+        :param patterns: regex or list of regex of urls, searched in url of response
+        """
+        if isinstance(patterns, str):
+            patterns = [patterns]
+        self.patterns = [re.compile(pattern) for pattern in patterns]
+        # request id => response waiting for its body
+        self.requests = {}
+        # request ids loaded, whose body can be fetched
+        self.finished = []
+        self.responses = []
+        self.matched = set()
+
+    def _match(self, url):
+        """
+        get index of first pattern matching url
+        :param url:
+        :return:
+        """
+        for index, pattern in enumerate(self.patterns):
+            if pattern.search(url):
+                return index
+        return None
+
+    @property
+    def complete(self):
+        """
+        every pattern is matched by a captured response
+        :return:
+        """
+        return len(self.matched) == len(self.patterns)
+
+    def feed(self, method, params):
+        """
+        handle devtools event of page
+        :param method: like `Network.responseReceived`
+        :param params:
+        :return:
+        """
+        if method == 'Network.responseReceived':
+            response = params.get('response') or {}
+            index = self._match(response.get('url', ''))
+            if index is None:
+                return
+            self.requests[params['requestId']] = (index, {
+                'url': response.get('url'),
+                'status': response.get('status'),
+                'headers': response.get('headers'),
+                'mime_type': response.get('mimeType'),
+                'type': params.get('type'),
+            })
+        elif method == 'Network.loadingFinished':
+            if params.get('requestId') in self.requests:
+                self.finished.append(params['requestId'])
+        elif method == 'Network.loadingFailed':
+            self.requests.pop(params.get('requestId'), None)
+
+    def pop_finished(self):
+        """
+        get request ids loaded since last call
+        :return:
+        """
+        finished, self.finished = self.finished, []
+        return finished
+
+    def add_body(self, request_id, result=None, error=None):
+        """
+        add response with result of `Network.getResponseBody`
+        :param request_id:
+        :param result: dict of `body` and `base64Encoded`
+        :param error: error of fetching body, like body evicted from buffer of browser
+        :return:
+        """
+        index, response = self.requests.pop(request_id)
+        body, data = None, None
+        if result is not None:
+            body = result.get('body')
+            if result.get('base64Encoded'):
+                body = base64.b64decode(body)
+            try:
+                data = json.loads(body)
+            except (TypeError, ValueError):
+                pass
+        response['body'] = body
+        response['data'] = data
+        if error is not None:
+            response['error'] = str(error)
+        self.responses.append(response)
+        self.matched.add(index)
+
+
+def collect(browser, capture):
+    """
+    feed events of performance log and fetch bodies of loaded responses
+    :param browser: webdriver with performance log enabled
+    :param capture: ResponseCapture
+    :return:
+    """
+    for entry in browser.get_log(PERFORMANCE_LOG):
+        _, method, params = parse_log_entry(entry)
+        capture.feed(method, params)
+    for request_id in capture.pop_finished():
+        try:
+            capture.add_body(request_id, browser.execute_cdp_cmd('Network.getResponseBody',
+                                                                 {'requestId': request_id}))
+        except Exception as e:
+            logger.debug('error getting body of response %s: %s', request_id, e)
+            capture.add_body(request_id, error=e)
+
+
+def wait_captured(browser, capture, timeout=10, interval=0.1):
+    """
+    wait until every pattern is matched by a captured response or timeout
+    :param browser: webdriver with performance log enabled
+    :param capture: ResponseCapture
+    :param timeout: max seconds to wait
+    :param interval: seconds between polls
+    :return: whether every pattern is matched
+    """
+    deadline = time.time() + timeout
+    while True:
+        collect(browser, capture)
+        if capture.complete:
+            return True
+        if time.time() >= deadline:
+            return False
+        time.sleep(interval)
+
+
+async def collect_async(page, capture):
+    """
+    fetch bodies of loaded responses, for page of asyncio backend whose events are fed by listeners
+    :param page: gerapy_selenium.cdp.Page
+    :param capture: ResponseCapture
+    :return:
+    """
+    for request_id in capture.pop_finished():
+        try:
+            capture.add_body(request_id, await page.send('Network.getResponseBody', {'requestId': request_id}))
+        except Exception as e:
+            logger.debug('error getting body of response %s: %s', request_id, e)
+            capture.add_body(request_id, error=e)
+
+
+async def wait_captured_async(page, capture, timeout=10, interval=0.1):
+    """
+    wait until every pattern is matched by a captured response or timeout, for page of asyncio backend
+    :param page: gerapy_selenium.cdp.Page
+    :param capture: ResponseCapture
+    :param timeout: max seconds to wait
+    :param interval: seconds between polls
+    :return: whether every pattern is matched
+    """
+    deadline = time.time() + timeout
+    while True:
+        await collect_async(page, capture)
+        if capture.complete:
+            return True
+        if time.time() >= deadline:
+            return False
+        await asyncio.sleep(interval)
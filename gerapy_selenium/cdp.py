@@ -0,0 +1,430 @@
+import asyncio
+import itertools
+import json
+import logging
+import re
+import shutil
+import tempfile
+import time
+from collections import defaultdict
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+logger = logging.getLogger('gerapy.selenium')
+
+# executables of chrome searched in PATH
+CHROME_EXECUTABLES = ('google-chrome', 'google-chrome-stable', 'chromium', 'chromium-browser', 'chrome')
+
+# run script like selenium's execute_script, which is body of function called with arguments
+FUNCTION_SCRIPT = '(async function () {%s}).apply(null, %s)'
+
+
+class CDPError(Exception):
+    """
+    Error returned by chrome devtools protocol
+    """
+
+
+class Connection(object):
+    """
+    Websocket connection to browser, commands of all pages are sent through it
+    """
+
+    def __init__(self, session, websocket):
+        """
+        :param session: aiohttp session
+        :param websocket: websocket of browser
+        """
+        self._session = session
+        self._websocket = websocket
+        self._ids = itertools.count(1)
+        self._callbacks = {}
+        # (session id, event) => futures waiting for event
+        self._listeners = defaultdict(list)
+        # (session id, event) => handlers called on every event
+        self._handlers = defaultdict(list)
+        self._reader = asyncio.ensure_future(self._read())
+
+    @classmethod
+    async def connect(cls, url):
+        """
+        connect to websocket of browser
+        :param url: websocket url, like `ws://127.0.0.1:9222/devtools/browser/xxx`
+        :return:
+        """
+        if aiohttp is None:
+            raise RuntimeError('aiohttp is required by asyncio backend, install it by `pip install aiohttp`')
+        session = aiohttp.ClientSession()
+        try:
+            # screenshots may be larger than default limit of message
+            websocket = await session.ws_connect(url, max_msg_size=0)
+        except Exception:
+            await session.close()
+            raise
+        return cls(session, websocket)
+
+    @property
+    def closed(self):
+        return self._websocket.closed
+
+    async def send(self, method, params=None, session_id=None):
+        """
+        send command and wait for its result
+        :param method: command, like `Page.navigate`
+        :param params:
+        :param session_id: session of page, None for browser
+        :return:
+        """
+        if self.closed:
+            raise CDPError(f'connection closed, cannot send {method}')
+        message_id = next(self._ids)
+        message = {'id': message_id, 'method': method, 'params': params or {}}
+        if session_id:
+            message['sessionId'] = session_id
+        future = asyncio.get_event_loop().create_future()
+        self._callbacks[message_id] = future
+        try:
+            await self._websocket.send_str(json.dumps(message))
+            return await future
+        finally:
+            self._callbacks.pop(message_id, None)
+
+    def wait_event(self, method, session_id=None):
+        """
+        get future of next event, should be called before the command which triggers the event
+        :param method: event, like `Page.loadEventFired`
+        :param session_id:
+        :return:
+        """
+        future = asyncio.get_event_loop().create_future()
+        self._listeners[(session_id, method)].append(future)
+        return future
+
+    def on(self, method, handler, session_id=None):
+        """
+        call handler on every event
+        :param method: event, like `Network.responseReceived`
+        :param handler: callable with event and its params
+        :param session_id:
+        :return:
+        """
+        self._handlers[(session_id, method)].append(handler)
+
+    def discard(self, session_id):
+        """
+        cancel all listeners and remove handlers of closed session
+        :param session_id:
+        :return:
+        """
+        for key in [key for key in self._listeners if key[0] == session_id]:
+            for future in self._listeners.pop(key):
+                future.cancel()
+        for key in [key for key in self._handlers if key[0] == session_id]:
+            del self._handlers[key]
+
+    async def _read(self):
+        """
+        dispatch results and events
+        :return:
+        """
+        try:
+            async for message in self._websocket:
+                if message.type != aiohttp.WSMsgType.TEXT:
+                    continue
+                data = json.loads(message.data)
+                if 'id' in data:
+                    future = self._callbacks.get(data['id'])
+                    if future is None or future.done():
+                        continue
+                    if 'error' in data:
+                        future.set_exception(CDPError(data['error'].get('message')))
+                    else:
+                        future.set_result(data.get('result', {}))
+                    continue
+                key = (data.get('sessionId'), data.get('method'))
+                for future in self._listeners.pop(key, []):
+                    if not future.done():
+                        future.set_result(data.get('params', {}))
+                for handler in self._handlers.get(key, []):
+                    handler(data.get('method'), data.get('params', {}))
+        finally:
+            for future in self._callbacks.values():
+                if not future.done():
+                    future.set_exception(CDPError('connection closed'))
+            for futures in self._listeners.values():
+                for future in futures:
+                    future.cancel()
+            self._listeners.clear()
+            self._handlers.clear()
+
+    async def close(self):
+        """
+        close websocket and session
+        :return:
+        """
+        await self._websocket.close()
+        await self._session.close()
+        await asyncio.gather(self._reader, return_exceptions=True)
+
+
+class Browser(object):
+    """
+    Chrome process driven over devtools protocol, every page is a target in its own browser context
+    """
+
+    def __init__(self, process, connection, user_data_dir):
+        """
+        :param process: chrome process
+        :param connection: websocket connection to browser
+        :param user_data_dir: temporary profile directory
+        """
+        self.process = process
+        self.connection = connection
+        self.user_data_dir = user_data_dir
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.pages = 0
+        self.active = 0
+        # stop using browser, like when it takes too much memory
+        self.dead = False
+
+    @staticmethod
+    def find_executable():
+        """
+        find chrome in PATH
+        :return:
+        """
+        for name in CHROME_EXECUTABLES:
+            path = shutil.which(name)
+            if path:
+                return path
+        raise RuntimeError('chrome executable not found, set it by `GERAPY_SELENIUM_CHROME_PATH`')
+
+    @classmethod
+    async def launch(cls, executable_path=None, args=None, timeout=30):
+        """
+        launch chrome and connect to it
+        :param executable_path: path of chrome, found in PATH if not set
+        :param args: launch arguments
+        :param timeout: seconds to wait for devtools
+        :return:
+        """
+        user_data_dir = tempfile.mkdtemp(prefix='gerapy-selenium-')
+        process = await asyncio.create_subprocess_exec(
+            executable_path or cls.find_executable(), *(args or []),
+            '--remote-debugging-port=0', f'--user-data-dir={user_data_dir}',
+            '--no-first-run', '--no-default-browser-check', 'about:blank',
+            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE)
+        try:
+            url = await asyncio.wait_for(cls._read_devtools_url(process), timeout)
+            connection = await Connection.connect(url)
+        except BaseException:
+            if process.returncode is None:
+                process.kill()
+            await process.wait()
+            shutil.rmtree(user_data_dir, ignore_errors=True)
+            raise
+        # keep draining stderr, or chrome blocks when pipe is full
+        asyncio.ensure_future(cls._drain(process.stderr))
+        logger.debug('launched browser %s', url)
+        return cls(process, connection, user_data_dir)
+
+    @staticmethod
+    async def _read_devtools_url(process):
+        """
+        read websocket url printed by chrome
+        :param process:
+        :return:
+        """
+        while True:
+            line = await process.stderr.readline()
+            if not line:
+                raise CDPError(f'browser exited with code {await process.wait()} before devtools listening')
+            match = re.search(r'DevTools listening on (ws://\S+)', line.decode(errors='ignore'))
+            if match:
+                return match.group(1)
+
+    @staticmethod
+    async def _drain(stream):
+        while await stream.readline():
+            pass
+
+    @property
+    def alive(self):
+        return self.process.returncode is None and not self.connection.closed
+
+    @property
+    def age(self):
+        return time.time() - self.created_at
+
+    async def new_page(self, scripts=None):
+        """
+        open a page in new browser context, so that cookies and storage are isolated
+        :param scripts: scripts to evaluate on every new document
+        :return:
+        """
+        context_id = (await self.connection.send('Target.createBrowserContext', {'disposeOnDetach': True}))[
+            'browserContextId']
+        target_id = (await self.connection.send('Target.createTarget', {
+            'url': 'about:blank', 'browserContextId': context_id}))['targetId']
+        session_id = (await self.connection.send('Target.attachToTarget', {
+            'targetId': target_id, 'flatten': True}))['sessionId']
+        page = Page(self, session_id, target_id, context_id)
+        await page.send('Page.enable')
+        if scripts:
+            await page.send('Page.addScriptToEvaluateOnNewDocument', {'source': scripts})
+        self.pages += 1
+        return page
+
+    async def close(self):
+        """
+        close browser and remove its profile
+        :return:
+        """
+        try:
+            if not self.connection.closed:
+                await asyncio.wait_for(self.connection.send('Browser.close'), 5)
+        except Exception:
+            logger.debug('error closing browser gracefully', exc_info=True)
+        finally:
+            await self.connection.close()
+            if self.process.returncode is None:
+                self.process.kill()
+            await self.process.wait()
+            shutil.rmtree(self.user_data_dir, ignore_errors=True)
+
+
+class Page(object):
+    """
+    Page of browser, the async counterpart of webdriver
+    """
+
+    def __init__(self, browser, session_id, target_id, context_id):
+        """
+        :param browser:
+        :param session_id: session attached to target
+        :param target_id:
+        :param context_id: browser context of page
+        """
+        self.browser = browser
+        self.session_id = session_id
+        self.target_id = target_id
+        self.context_id = context_id
+
+    async def send(self, method, params=None):
+        """
+        send command to page
+        :param method:
+        :param params:
+        :return:
+        """
+        return await self.browser.connection.send(method, params, self.session_id)
+
+    def on(self, method, handler):
+        """
+        call handler on every event of page
+        :param method: event, like `Network.responseReceived`
+        :param handler: callable with event and its params
+        :return:
+        """
+        self.browser.connection.on(method, handler, self.session_id)
+
+    async def execute_script(self, script, *args):
+        """
+        execute script like selenium, `script` is body of function and `arguments` are available
+        :param script:
+        :param args: json serializable arguments
+        :return:
+        """
+        result = await self.send('Runtime.evaluate', {
+            'expression': FUNCTION_SCRIPT % (script, json.dumps(list(args))),
+            'returnByValue': True,
+            'awaitPromise': True,
+        })
+        if result.get('exceptionDetails'):
+            details = result['exceptionDetails']
+            raise CDPError(details.get('exception', {}).get('description') or details.get('text'))
+        return result['result'].get('value')
+
+    async def evaluate(self, script):
+        """
+        evaluate expression, call it if it's a function, like `() => { ... }`
+        :param script:
+        :return:
+        """
+        result = await self.send('Runtime.evaluate', {'expression': script, 'awaitPromise': True})
+        if result.get('exceptionDetails'):
+            raise CDPError(result['exceptionDetails'].get('text'))
+        if result['result'].get('type') == 'function':
+            await self.send('Runtime.callFunctionOn', {
+                'functionDeclaration': 'function () { return this() }',
+                'objectId': result['result']['objectId'],
+                'awaitPromise': True,
+            })
+
+    async def navigate(self, url, timeout=None):
+        """
+        navigate to url and wait for load event
+        :param url:
+        :param timeout:
+        :return:
+        """
+        loaded = self.browser.connection.wait_event('Page.loadEventFired', self.session_id)
+
+        async def _navigate():
+            result = await self.send('Page.navigate', {'url': url})
+            if result.get('errorText'):
+                raise CDPError(f'{result["errorText"]} at {url}')
+            await loaded
+
+        try:
+            # timeout covers the command too, browser may never answer a hanging navigation
+            await asyncio.wait_for(_navigate(), timeout)
+        finally:
+            loaded.cancel()
+
+    async def wait_for_selector(self, selector, timeout=None, interval=0.1):
+        """
+        wait for element matching css selector
+        :param selector:
+        :param timeout:
+        :param interval:
+        :return:
+        """
+        deadline = time.time() + timeout if timeout is not None else None
+        while not await self.execute_script('return document.querySelector(arguments[0]) !== null', selector):
+            if deadline is not None and time.time() > deadline:
+                raise asyncio.TimeoutError(f'timeout waiting for {selector}')
+            await asyncio.sleep(interval)
+
+    async def url(self):
+        """
+        get url of page, which may differ from navigated url after redirects
+        :return:
+        """
+        return await self.execute_script('return location.href')
+
+    async def content(self):
+        """
+        get html of page
+        :return:
+        """
+        return await self.execute_script('return document.documentElement.outerHTML')
+
+    async def close(self):
+        """
+        close page and its browser context
+        :return:
+        """
+        connection = self.browser.connection
+        connection.discard(self.session_id)
+        if connection.closed:
+            return
+        try:
+            await connection.send('Target.closeTarget', {'targetId': self.target_id})
+            await connection.send('Target.disposeBrowserContext', {'browserContextId': self.context_id})
+        except CDPError:
+            logger.debug('error closing page %s', self.target_id, exc_info=True)
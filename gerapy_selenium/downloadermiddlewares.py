@@ -1,20 +1,97 @@
+import asyncio
+import base64
+import copy
+import math
+import threading
 import time
+from collections import defaultdict
+from functools import partial
 from io import BytesIO
-from scrapy.http import HtmlResponse
-from scrapy.utils.python import global_object_name
-from selenium.common.exceptions import TimeoutException
+from urllib.parse import urlparse
+from scrapy import Request, signals
+from scrapy.downloadermiddlewares.cookies import CookiesMiddleware
+from scrapy.exceptions import NotConfigured
+from scrapy.http import HtmlResponse, Response, TextResponse
+from scrapy.utils.misc import load_object
+from scrapy.utils.python import global_object_name, to_unicode
+from scrapy.utils.defer import deferred_from_coro
+from scrapy.utils.reactor import is_asyncio_reactor_installed
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.wait import WebDriverWait
-from gerapy_selenium.pretend import SCRIPTS as PRETEND_SCRIPTS
+from gerapy_selenium.actions import compile_actions, page_script, run_function
+from gerapy_selenium.capture import PERFORMANCE_LOG, ResponseCapture, collect, collect_async, wait_captured, \
+    wait_captured_async
+from gerapy_selenium.cdp import Browser, CDPError, aiohttp
+from gerapy_selenium.fallback import RenderDecider
+from gerapy_selenium.pool import BrowserLimiter, BrowserPool
+from gerapy_selenium.pretend import SCRIPT as PRETEND_SCRIPT
+from gerapy_selenium.profile import ProfileTemplate
+from gerapy_selenium.remote import RemoteNodes
+from gerapy_selenium.screenshot import ScreenshotStore, capture, capture_async
+from gerapy_selenium.scroll import scroll, scroll_async, scroll_options
+from gerapy_selenium.service import DriverServices
+from gerapy_selenium.signals import scroll_snapshot
+from gerapy_selenium.throttle import RenderThrottle
+from gerapy_selenium.timing import PhaseStats, RenderTimings
+from gerapy_selenium.wait import TRACKER_SCRIPT, needs_tracker, wait_until, wait_until_async
+from gerapy_selenium.watchdog import owner_argument, owner_token, psutil, reap, tree_rss
 from gerapy_selenium.settings import *
-import urllib.parse
 from selenium import webdriver
 from selenium.webdriver import ChromeOptions
 from selenium.webdriver.support import expected_conditions as EC
-from twisted.internet.threads import deferToThread
+from twisted.internet import defer
+from twisted.internet.task import LoopingCall, deferLater
+from twisted.internet.threads import deferToThreadPool
+from twisted.python.threadpool import ThreadPool
 
 logger = logging.getLogger('gerapy.selenium')
 
+# file extensions of resource types, blocked by Network.setBlockedURLs, urls without extension are not matched
+RESOURCE_TYPE_EXTENSIONS = {
+    'image': ['png', 'jpg', 'jpeg', 'gif', 'webp', 'svg', 'ico', 'bmp', 'avif'],
+    'media': ['mp4', 'webm', 'ogg', 'mp3', 'wav', 'm4a', 'm3u8', 'flv'],
+    'font': ['woff', 'woff2', 'ttf', 'otf', 'eot'],
+    'stylesheet': ['css'],
+}
+
+# resource types of Fetch domain, matched by type of request by asyncio backend
+FETCH_RESOURCE_TYPES = {
+    'image': 'Image',
+    'media': 'Media',
+    'font': 'Font',
+    'stylesheet': 'Stylesheet',
+    'script': 'Script',
+    'xhr': 'XHR',
+    'fetch': 'Fetch',
+    'websocket': 'WebSocket',
+    'eventsource': 'EventSource',
+    'manifest': 'Manifest',
+    'texttrack': 'TextTrack',
+    'ping': 'Ping',
+    'prefetch': 'Prefetch',
+    'other': 'Other',
+}
+
+# url patterns of common analytics and ad trackers, blocked as resource type `tracker`
+TRACKER_URLS = [
+    '*google-analytics.com/*',
+    '*googletagmanager.com/*',
+    '*doubleclick.net/*',
+    '*googlesyndication.com/*',
+    '*connect.facebook.net/*',
+    '*hotjar.com/*',
+    '*cdn.segment.com/*',
+    '*mixpanel.com/*',
+    '*scorecardresearch.com/*',
+    '*bat.bing.com/*',
+]
+
+# outerHTML of elements matching selector
+OUTER_HTML_SCRIPT = '''
+return Array.from(document.querySelectorAll(arguments[0]), element => element.outerHTML).join('\\n');
+'''
+
 
 class SeleniumMiddleware(object):
     """
@@ -61,13 +138,12 @@ class SeleniumMiddleware(object):
                          extra={'spider': spider})
     
     @classmethod
-    def from_crawler(cls, crawler):
+    def _init_settings(cls, settings):
         """
-        init the middleware
-        :param crawler:
+        init settings shared by all backends
+        :param settings:
         :return:
         """
-        settings = crawler.settings
         logging_level = settings.get('GERAPY_SELENIUM_LOGGING_LEVEL', GERAPY_SELENIUM_LOGGING_LEVEL)
         logging.getLogger('selenium.webdriver.remote.remote_connection').setLevel(logging_level)
         logging.getLogger('urllib3.connectionpool').setLevel(logging_level)
@@ -91,28 +167,220 @@ class SeleniumMiddleware(object):
                                             settings.get('DOWNLOAD_TIMEOUT', GERAPY_SELENIUM_DOWNLOAD_TIMEOUT))
         
         cls.screenshot = settings.get('GERAPY_SELENIUM_SCREENSHOT', GERAPY_SELENIUM_SCREENSHOT)
+        cls.screenshot_store = settings.get('GERAPY_SELENIUM_SCREENSHOT_STORE', GERAPY_SELENIUM_SCREENSHOT_STORE)
         cls.pretend = settings.get('GERAPY_SELENIUM_PRETEND', GERAPY_SELENIUM_PRETEND)
+        cls.ignore_resource_types = settings.getlist('GERAPY_SELENIUM_IGNORE_RESOURCE_TYPES',
+                                                     GERAPY_SELENIUM_IGNORE_RESOURCE_TYPES)
+        cls.blocked_urls = settings.getlist('GERAPY_SELENIUM_BLOCKED_URLS', GERAPY_SELENIUM_BLOCKED_URLS)
         cls.sleep = settings.get('GERAPY_SELENIUM_SLEEP', GERAPY_SELENIUM_SLEEP)
+        cls.wait_until = settings.get('GERAPY_SELENIUM_WAIT_UNTIL', GERAPY_SELENIUM_WAIT_UNTIL)
+        cls.wait_idle = settings.getfloat('GERAPY_SELENIUM_WAIT_IDLE', GERAPY_SELENIUM_WAIT_IDLE)
+        cls.wait_max = settings.get('GERAPY_SELENIUM_WAIT_MAX', GERAPY_SELENIUM_WAIT_MAX)
+        cls.http_first = settings.getbool('GERAPY_SELENIUM_HTTP_FIRST', GERAPY_SELENIUM_HTTP_FIRST)
+        cls.render_check = settings.get('GERAPY_SELENIUM_RENDER_CHECK', GERAPY_SELENIUM_RENDER_CHECK)
+        cls.http_first_min_samples = settings.getint('GERAPY_SELENIUM_HTTP_FIRST_MIN_SAMPLES',
+                                                     GERAPY_SELENIUM_HTTP_FIRST_MIN_SAMPLES)
+        cls.http_first_threshold = settings.getfloat('GERAPY_SELENIUM_HTTP_FIRST_THRESHOLD',
+                                                     GERAPY_SELENIUM_HTTP_FIRST_THRESHOLD)
+        cls.cache_enabled = settings.getbool('GERAPY_SELENIUM_CACHE_ENABLED', GERAPY_SELENIUM_CACHE_ENABLED)
+        cls.partial = settings.getbool('GERAPY_SELENIUM_PARTIAL', GERAPY_SELENIUM_PARTIAL)
+        cls.partial_status = settings.getint('GERAPY_SELENIUM_PARTIAL_STATUS', GERAPY_SELENIUM_PARTIAL_STATUS)
         cls.retry_enabled = settings.getbool('RETRY_ENABLED')
         cls.max_retry_times = settings.getint('RETRY_TIMES')
         cls.retry_http_codes = set(int(x) for x in settings.getlist('RETRY_HTTP_CODES'))
         cls.priority_adjust = settings.getint('RETRY_PRIORITY_ADJUST')
         
-        return cls()
+        # pool of long-lived browsers, defaults to the size of CONCURRENT_REQUESTS
+        cls.pool_size = settings.getint('GERAPY_SELENIUM_POOL_SIZE', GERAPY_SELENIUM_POOL_SIZE or 0) or \
+                        settings.getint('CONCURRENT_REQUESTS')
+        cls.browser_max_pages = settings.getint('GERAPY_SELENIUM_BROWSER_MAX_PAGES',
+                                                GERAPY_SELENIUM_BROWSER_MAX_PAGES)
+        cls.browser_max_age = settings.getfloat('GERAPY_SELENIUM_BROWSER_MAX_AGE', GERAPY_SELENIUM_BROWSER_MAX_AGE)
+        
+        # multiplex concurrent requests over tabs of one browser
+        cls.tabs_per_browser = max(settings.getint('GERAPY_SELENIUM_TABS_PER_BROWSER',
+                                                   GERAPY_SELENIUM_TABS_PER_BROWSER), 1)
+        # total browsers of all pools, idle browsers of least recently used pools are evicted
+        cls.max_browsers = settings.getint('GERAPY_SELENIUM_MAX_BROWSERS', GERAPY_SELENIUM_MAX_BROWSERS or 0) or \
+                           math.ceil(cls.pool_size / cls.tabs_per_browser)
+        
+        # dedicated workers for rendering, separated from reactor threadpool
+        cls.max_workers = settings.getint('GERAPY_SELENIUM_MAX_WORKERS', GERAPY_SELENIUM_MAX_WORKERS or 0) or \
+                          cls.pool_size
+        cls.max_queue_size = settings.getint('GERAPY_SELENIUM_MAX_QUEUE_SIZE', GERAPY_SELENIUM_MAX_QUEUE_SIZE)
+        
+        # shared chromedriver processes, 0 means every browser spawns its own chromedriver
+        cls.driver_services = settings.getint('GERAPY_SELENIUM_DRIVER_SERVICES', GERAPY_SELENIUM_DRIVER_SERVICES)
+        
+        # remote webdriver endpoints, list of urls or dict of url and weight, browsers are created on them if set
+        cls.remote_endpoints = settings.get('GERAPY_SELENIUM_REMOTE_ENDPOINTS', GERAPY_SELENIUM_REMOTE_ENDPOINTS)
+        cls.remote_check_interval = settings.getfloat('GERAPY_SELENIUM_REMOTE_CHECK_INTERVAL',
+                                                      GERAPY_SELENIUM_REMOTE_CHECK_INTERVAL)
+        cls.remote_check_timeout = settings.getfloat('GERAPY_SELENIUM_REMOTE_CHECK_TIMEOUT',
+                                                     GERAPY_SELENIUM_REMOTE_CHECK_TIMEOUT)
+        cls.remote_max_failures = settings.getint('GERAPY_SELENIUM_REMOTE_MAX_FAILURES',
+                                                  GERAPY_SELENIUM_REMOTE_MAX_FAILURES)
+        
+        # recycle browsers whose processes take more memory than this number of MB
+        cls.browser_max_rss = settings.getfloat('GERAPY_SELENIUM_BROWSER_MAX_RSS',
+                                                GERAPY_SELENIUM_BROWSER_MAX_RSS or 0)
+        cls.watchdog_interval = settings.getfloat('GERAPY_SELENIUM_WATCHDOG_INTERVAL',
+                                                  GERAPY_SELENIUM_WATCHDOG_INTERVAL)
+        cls.reaper = settings.getbool('GERAPY_SELENIUM_REAPER', GERAPY_SELENIUM_REAPER)
+        
+        # browsers launched when spider opened, one every interval, and optionally warmed up by visiting url
+        cls.prelaunch = settings.getint('GERAPY_SELENIUM_PRELAUNCH', GERAPY_SELENIUM_PRELAUNCH)
+        cls.prelaunch_interval = settings.getfloat('GERAPY_SELENIUM_PRELAUNCH_INTERVAL',
+                                                   GERAPY_SELENIUM_PRELAUNCH_INTERVAL)
+        cls.warmup_url = settings.get('GERAPY_SELENIUM_WARMUP_URL', GERAPY_SELENIUM_WARMUP_URL)
+        
+        # adapt number of requests of every domain rendered concurrently by render latency
+        cls.throttle_enabled = settings.getbool('GERAPY_SELENIUM_THROTTLE_ENABLED', GERAPY_SELENIUM_THROTTLE_ENABLED)
+        cls.throttle_target_latency = settings.getfloat('GERAPY_SELENIUM_THROTTLE_TARGET_LATENCY',
+                                                        GERAPY_SELENIUM_THROTTLE_TARGET_LATENCY)
+        cls.throttle_start_slots = settings.getint('GERAPY_SELENIUM_THROTTLE_START_SLOTS',
+                                                   GERAPY_SELENIUM_THROTTLE_START_SLOTS)
+        cls.throttle_min_slots = settings.getint('GERAPY_SELENIUM_THROTTLE_MIN_SLOTS',
+                                                 GERAPY_SELENIUM_THROTTLE_MIN_SLOTS)
+        cls.throttle_max_slots = settings.getint('GERAPY_SELENIUM_THROTTLE_MAX_SLOTS',
+                                                 GERAPY_SELENIUM_THROTTLE_MAX_SLOTS or 0) or cls.pool_size
+        
+        # launch browsers with performance log, so that network responses can be captured
+        cls.capture_enabled = settings.getbool('GERAPY_SELENIUM_CAPTURE_ENABLED', GERAPY_SELENIUM_CAPTURE_ENABLED)
+        
+        # profile directory cloned for every browser, optionally with caches of browsers written back
+        cls.profile_template = settings.get('GERAPY_SELENIUM_PROFILE_TEMPLATE', GERAPY_SELENIUM_PROFILE_TEMPLATE)
+        cls.profile_persist = settings.getbool('GERAPY_SELENIUM_PROFILE_PERSIST', GERAPY_SELENIUM_PROFILE_PERSIST)
     
-    def _process_request(self, request, spider):
+    @classmethod
+    def _create(cls, crawler):
         """
-        use pyppeteer to process spider
-        :param request:
-        :param spider:
+        create middleware with components shared by all backends
+        :param crawler:
+        :return:
+        """
+        settings = crawler.settings
+        middleware = cls()
+        middleware.crawler = crawler
+        middleware.stats = crawler.stats
+        middleware.cookies_middleware = None
+        middleware.cache = load_object(settings.get('GERAPY_SELENIUM_CACHE_STORAGE', GERAPY_SELENIUM_CACHE_STORAGE))(
+            settings) if cls.cache_enabled else None
+        middleware.screenshot_store = ScreenshotStore(cls.screenshot_store) if cls.screenshot_store else None
+        middleware.decider = RenderDecider(min_samples=cls.http_first_min_samples,
+                                           threshold=cls.http_first_threshold)
+        middleware.options_cache = {}
+        middleware.owner = owner_token()
+        middleware.phase_stats = PhaseStats(crawler.stats)
+        middleware.watchdog = None
+        middleware.throttle = RenderThrottle(cls.throttle_target_latency, cls.throttle_start_slots,
+                                             cls.throttle_min_slots, cls.throttle_max_slots,
+                                             crawler.stats) if cls.throttle_enabled else None
+        return middleware
+    
+    @classmethod
+    def from_crawler(cls, crawler):
+        """
+        init the middleware
+        :param crawler:
+        :return:
+        """
+        cls._init_settings(crawler.settings)
+        middleware = cls._create(crawler)
+        middleware.remotes = RemoteNodes(cls.remote_endpoints, max_failures=cls.remote_max_failures,
+                                         timeout=cls.remote_check_timeout, stats=crawler.stats) \
+            if cls.remote_endpoints else None
+        middleware.remote_check = None
+        # local chromedriver services are not needed if browsers are created on remote nodes
+        middleware.services = DriverServices(cls.driver_services, cls.executable_path) \
+            if cls.driver_services and not middleware.remotes else None
+        # pids of chromedriver spawned by browsers, only these are killed by reaper
+        middleware.driver_pids = set()
+        middleware.profiles = None
+        if cls.profile_template:
+            if middleware.remotes:
+                logger.warning('GERAPY_SELENIUM_PROFILE_TEMPLATE is ignored for browsers of remote nodes')
+            elif cls.tabs_per_browser > 1:
+                # tabs are opened in their own browser contexts, which keep caches in memory
+                logger.warning('GERAPY_SELENIUM_PROFILE_TEMPLATE is ignored when GERAPY_SELENIUM_TABS_PER_BROWSER '
+                               'is more than 1')
+            else:
+                middleware.profiles = ProfileTemplate(cls.profile_template, persist=cls.profile_persist)
+        middleware.warmup_url = cls.warmup_url
+        if cls.warmup_url and cls.tabs_per_browser > 1:
+            # tabs are opened in their own browser contexts, which don't share caches of warm-up page
+            logger.warning('GERAPY_SELENIUM_WARMUP_URL is ignored when GERAPY_SELENIUM_TABS_PER_BROWSER '
+                           'is more than 1')
+            middleware.warmup_url = None
+        middleware.threadpool = ThreadPool(minthreads=0, maxthreads=cls.max_workers, name='gerapy-selenium')
+        middleware.threadpool.start()
+        # requests beyond workers and queue wait here instead of piling up in threadpool
+        middleware.semaphore = defer.DeferredSemaphore(cls.max_workers + cls.max_queue_size)
+        middleware.pending = 0
+        from twisted.internet import reactor
+        reactor.addSystemEventTrigger('during', 'shutdown', middleware._stop_threadpool)
+        # browser pools keyed by configuration, sharing the limit of total browsers
+        middleware.pools = {}
+        # number of requests using every pool, pools without browsers and users are dropped
+        middleware.pool_users = defaultdict(int)
+        middleware.pools_lock = threading.Lock()
+        middleware.limiter = BrowserLimiter(cls.max_browsers, on_evict=middleware._on_evict)
+        crawler.signals.connect(middleware.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+    
+    def _install_scripts(self, browser, pretend=None):
+        """
+        inject pretend scripts to every page of browser
+        :param browser:
+        :param pretend: pretend as normal browser
+        :return:
+        """
+        if not pretend:
+            return
+        browser.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {
+            'source': PRETEND_SCRIPT
+        })
+    
+    @staticmethod
+    def _install_tracker(browser, tracked):
+        """
+        inject tracker script to pages of browser only when request waits for network or dom,
+        reused browser may keep tracker of last request
+        :param browser:
+        :param tracked: whether tracker is needed
+        :return:
+        """
+        _tracker = getattr(browser, 'tracker', None)
+        if tracked and not _tracker:
+            browser.tracker = browser.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {
+                'source': TRACKER_SCRIPT
+            }).get('identifier')
+        elif _tracker and not tracked:
+            browser.execute_cdp_cmd('Page.removeScriptToEvaluateOnNewDocument', {'identifier': _tracker})
+            browser.tracker = None
+    
+    def _launch_options(self, proxy=None, pretend=None, multiplex=False):
+        """
+        get launch args of browser, cached by configuration
+        :param proxy: proxy server of browser
+        :param pretend: pretend as normal browser
+        :param multiplex: browser will be driven by several tabs concurrently
         :return:
         """
+        key = (self.headless, proxy, bool(pretend), multiplex)
+        kwargs = self.options_cache.get(key)
+        if kwargs is not None:
+            return kwargs
+        
         kwargs = {}
         options = ChromeOptions()
         kwargs['options'] = options
+        # mark browser as launched by this middleware, so that it can be reaped if left behind
+        options.add_argument(owner_argument(self.owner))
         if self.headless:
             options.add_argument('--headless')
-        if self.pretend:
+        if pretend:
             options.add_experimental_option('excludeSwitches', ['enable-automation'])
             options.add_experimental_option('useAutomationExtension', False)
         if self.executable_path:
@@ -133,7 +401,145 @@ class SeleniumMiddleware(object):
             options.add_argument('--no-sandbox')
         if self.disable_setuid_sandbox:
             options.add_argument('--disable-setuid-sandbox')
+        if proxy:
+            options.add_argument('--proxy-server=' + proxy)
+        if multiplex:
+            # tabs wait for page load by themselves, so commands of other tabs are not blocked
+            options.set_capability('pageLoadStrategy', 'none')
+        if self.capture_enabled:
+            options.set_capability('goog:loggingPrefs', {PERFORMANCE_LOG: 'ALL'})
+        logger.debug('set options %s', options.arguments)
+        
+        self.options_cache[key] = kwargs
+        return kwargs
+    
+    def _launch_browser(self, proxy=None, pretend=None, multiplex=False):
+        """
+        launch a new browser
+        :param proxy: proxy server of browser
+        :param pretend: pretend as normal browser
+        :param multiplex: browser will be driven by several tabs concurrently
+        :return:
+        """
+        kwargs = self._launch_options(proxy, pretend, multiplex)
+        logger.debug('launching browser, proxy %s, pretend %s', proxy, pretend)
+        if proxy:
+            self.stats.inc_value(f'selenium/proxy/{self._proxy_name(proxy)}/browser_count')
+        start = time.time()
+        # every browser starts with its own clone of profile template
+        profile_dir = None
+        if self.profiles:
+            profile_dir = self.profiles.clone()
+            kwargs = dict(kwargs, options=copy.deepcopy(kwargs['options']))
+            kwargs['options'].add_argument(f'--user-data-dir={profile_dir}')
+        try:
+            if self.remotes:
+                browser = self.remotes.connect(kwargs['options'])
+            elif self.services:
+                browser = self.services.connect(kwargs['options'])
+            else:
+                browser = webdriver.Chrome(**kwargs)
+                self.driver_pids.add(browser.service.process.pid)
+        except Exception:
+            if profile_dir:
+                self.profiles.release(profile_dir)
+            raise
+        browser.profile_dir = profile_dir
+        browser.set_window_size(self.window_width, self.window_height)
+        self.phase_stats.record('launch', time.time() - start)
         
+        # scripts are kept by browser for all later pages
+        self._install_scripts(browser, pretend)
+        return browser
+    
+    def _teardown_browser(self, browser):
+        """
+        release profile of quit browser
+        :param browser: PooledBrowser
+        :return:
+        """
+        profile_dir = getattr(browser.driver, 'profile_dir', None)
+        if profile_dir:
+            self.profiles.release(profile_dir, browser.pages)
+    
+    @staticmethod
+    def _proxy_name(proxy):
+        """
+        get name of proxy used in stats, without credentials
+        :param proxy:
+        :return:
+        """
+        parse_result = urlparse(proxy if '://' in proxy else f'http://{proxy}')
+        return f'{parse_result.hostname}:{parse_result.port}' if parse_result.port else parse_result.hostname
+    
+    def _on_evict(self, pool):
+        """
+        callback when idle browser of pool is evicted for other pools
+        :param pool:
+        :return:
+        """
+        proxy, _ = pool.key
+        if proxy:
+            self.stats.inc_value(f'selenium/proxy/{self._proxy_name(proxy)}/evicted_count')
+        with self.pools_lock:
+            self._drop_pool(pool)
+    
+    def _get_pool(self, proxy, pretend):
+        """
+        get browser pool of configuration, browsers are launched with proxy and pretend scripts or not,
+        it must be given back by `_put_pool` after use
+        :param proxy: proxy server of browser
+        :param pretend: pretend as normal browser
+        :return:
+        """
+        key = (proxy or None, bool(pretend))
+        with self.pools_lock:
+            pool = self.pools.get(key)
+            if pool is None:
+                multiplex = self.tabs_per_browser > 1
+                pool = self.pools[key] = BrowserPool(partial(self._launch_browser, key[0], key[1], multiplex),
+                                                     size=math.ceil(self.pool_size / self.tabs_per_browser),
+                                                     max_pages=self.browser_max_pages,
+                                                     max_age=self.browser_max_age,
+                                                     tabs=self.tabs_per_browser,
+                                                     tab_setup=partial(self._install_scripts, pretend=key[1]),
+                                                     limiter=self.limiter,
+                                                     key=key,
+                                                     teardown=self._teardown_browser if self.profiles else None)
+            self.pool_users[key] += 1
+            return pool
+    
+    def _put_pool(self, pool):
+        """
+        stop using pool got by `_get_pool`
+        :param pool:
+        :return:
+        """
+        with self.pools_lock:
+            self.pool_users[pool.key] -= 1
+            self._drop_pool(pool)
+    
+    def _drop_pool(self, pool):
+        """
+        drop pool once its last browser is gone and no request uses it, so that pools of rotated
+        proxies don't pile up, must be called with pools_lock acquired
+        :param pool:
+        :return:
+        """
+        if self.pools.get(pool.key) is not pool or self.pool_users[pool.key] or not pool.empty:
+            return
+        logger.debug('dropping empty browser pool %s', pool.key)
+        del self.pools[pool.key]
+        del self.pool_users[pool.key]
+        self.limiter.forget(pool)
+    
+    def _process_request(self, request, spider):
+        """
+        use selenium to process spider
+        :param request:
+        :param spider:
+        :return:
+        """
         # get selenium meta
         selenium_meta = request.meta.get('selenium') or {}
         logger.debug('selenium_meta %s', selenium_meta)
@@ -142,126 +548,1515 @@ class SeleniumMiddleware(object):
         _proxy = request.meta.get('proxy')
         if selenium_meta.get('proxy') is not None:
             _proxy = selenium_meta.get('proxy')
-        if _proxy:
-            options.add_argument('--proxy-server=' + _proxy)
-        
-        browser = webdriver.Chrome(**kwargs)
-        browser.set_window_size(self.window_width, self.window_height)
         
-        # pretend as normal browser
         _pretend = self.pretend
         if selenium_meta.get('pretend') is not None:
             _pretend = selenium_meta.get('pretend')
-        if _pretend:
-            for script in PRETEND_SCRIPTS:
-                browser.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {
-                    'source': script
-                })
         
         _timeout = self.download_timeout
         if selenium_meta.get('timeout') is not None:
             _timeout = selenium_meta.get('timeout')
-        browser.set_page_load_timeout(_timeout)
         
+        # browsers are pooled by proxy, as proxy is a launch argument of browser
+        if _proxy:
+            self.stats.inc_value(f'selenium/proxy/{self._proxy_name(_proxy)}/request_count')
+        pool = self._get_pool(_proxy, _pretend)
+        timings = RenderTimings()
         try:
-            browser.get(request.url)
-        except TimeoutException:
-            browser.close()
+            with timings.phase('acquire'):
+                lease = pool.checkout(timeout=_timeout)
+        except TimeoutError:
+            logger.error('timeout waiting for a free browser for %s', request.url)
+            self.phase_stats.record_all(timings.finish())
+            self._put_pool(pool)
             return self._retry(request, 504, spider)
+        except Exception:
+            self._put_pool(pool)
+            raise
+        browser = lease.driver
+        lease.visit(request.url)
+        
+        discard = False
+        response = None
+        try:
+            response = self._render(browser, request, spider, selenium_meta, _timeout, timings)
+        except Exception:
+            # errors of page like unresolved host keep the warm browser, only dead session is discarded
+            discard = not lease.is_alive()
+            raise
+        finally:
+            logger.debug('release selenium')
+            pool.checkin(lease, discard=discard)
+            self._put_pool(pool)
+            self._record_timings(response, timings)
+        
+        # cache rendered response
+        self._store_cache(spider, request, response)
+        return response
+    
+    def _get_cookiejar(self, request):
+        """
+        get cookiejar of request from CookiesMiddleware
+        :param request:
+        :return:
+        """
+        if request.meta.get('dont_merge_cookies') or not self.cookies_middleware:
+            return None
+        return self.cookies_middleware.jars[request.meta.get('cookiejar')]
+    
+    def _get_cookies(self, request):
+        """
+        get cookies of request for Network.setCookies, from cookiejar, Cookie header and cookies of request
+        :param request:
+        :return:
+        """
+        url = request.url
+        cookies = {}
         
-        # set cookies
-        parse_result = urllib.parse.urlsplit(request.url)
-        domain = parse_result.hostname
-        _cookies = []
+        # cookies of cookiejar and Cookie header
+        headers = [to_unicode(header) for header in request.headers.getlist('Cookie')]
+        jar = self._get_cookiejar(request)
+        if jar is not None:
+            probe = Request(url)
+            jar.add_cookie_header(probe)
+            headers.extend(to_unicode(header) for header in probe.headers.getlist('Cookie'))
+        for header in headers:
+            for pair in header.split(';'):
+                name, sep, value = pair.strip().partition('=')
+                if sep:
+                    cookies[name] = {'name': name, 'value': value, 'url': url}
+        
+        # cookies of request, supports both dict and list of dict
         if isinstance(request.cookies, dict):
-            _cookies = [{'name': k, 'value': v, 'domain': domain}
-                        for k, v in request.cookies.items()]
+            for name, value in request.cookies.items():
+                cookies[name] = {'name': name, 'value': str(value), 'url': url}
+        else:
+            for cookie in request.cookies or []:
+                if not isinstance(cookie, dict) or 'name' not in cookie:
+                    continue
+                item = {'name': cookie['name'], 'value': str(cookie.get('value', ''))}
+                if cookie.get('domain'):
+                    item['domain'] = cookie['domain']
+                    item['path'] = cookie.get('path') or '/'
+                else:
+                    item['url'] = url
+                if cookie.get('secure') is not None:
+                    item['secure'] = bool(cookie['secure'])
+                cookies[cookie['name']] = item
+        return list(cookies.values())
+    
+    def _get_ignore_resource_types(self, selenium_meta):
+        """
+        get resource types not to load
+        :param selenium_meta:
+        :return:
+        """
+        if selenium_meta.get('ignore_resource_types') is not None:
+            return selenium_meta.get('ignore_resource_types')
+        return self.ignore_resource_types
+    
+    def _get_blocked_urls(self, selenium_meta, by_extension=True):
+        """
+        get url patterns to block, including trackers and extensions of ignored resource types
+        :param selenium_meta:
+        :param by_extension: block resource types by file extensions of urls
+        :return:
+        """
+        _ignore_resource_types = self._get_ignore_resource_types(selenium_meta)
+        _blocked_urls = self.blocked_urls
+        if selenium_meta.get('blocked_urls') is not None:
+            _blocked_urls = selenium_meta.get('blocked_urls')
+        _blocked_urls = list(_blocked_urls)
+        if 'tracker' in _ignore_resource_types:
+            _blocked_urls.extend(TRACKER_URLS)
+        if by_extension:
+            for resource_type in _ignore_resource_types:
+                for extension in RESOURCE_TYPE_EXTENSIONS.get(resource_type, []):
+                    _blocked_urls.extend([f'*.{extension}', f'*.{extension}?*'])
+        return _blocked_urls
+    
+    def _get_wait_until(self, selenium_meta, _timeout):
+        """
+        get wait strategies of request
+        :param selenium_meta:
+        :param _timeout:
+        :return: tuple of (conditions, idle seconds, max seconds)
+        """
+        _wait_until = self.wait_until
+        if selenium_meta.get('wait_until') is not None:
+            _wait_until = selenium_meta.get('wait_until')
+        _wait_idle, _wait_max = self.wait_idle, self.wait_max
+        if isinstance(_wait_until, dict):
+            _wait_idle = _wait_until.get('idle', _wait_idle)
+            _wait_max = _wait_until.get('max', _wait_max)
+            _wait_until = _wait_until.get('until')
+        if isinstance(_wait_until, str):
+            _wait_until = [_wait_until]
+        return _wait_until, _wait_idle, _wait_max if _wait_max is not None else _timeout
+    
+    def _get_sleep(self, selenium_meta, _wait_until):
+        """
+        get seconds to sleep, global sleep is replaced by wait strategies and scrolling
+        :param selenium_meta:
+        :param _wait_until:
+        :return:
+        """
+        _sleep = self.sleep if not _wait_until and not selenium_meta.get('scroll') else None
+        if selenium_meta.get('sleep') is not None:
+            _sleep = selenium_meta.get('sleep')
+        return _sleep
+    
+    def _get_screenshot(self, selenium_meta):
+        """
+        get screenshot options of request, None if no screenshot is needed
+        :param selenium_meta:
+        :return:
+        """
+        _screenshot = self.screenshot
+        if selenium_meta.get('screenshot') is not None:
+            _screenshot = selenium_meta.get('screenshot')
+        if not _screenshot:
+            return None
+        return _screenshot if isinstance(_screenshot, dict) else {}
+    
+    def _save_screenshot(self, spider, request, _screenshot, data):
+        """
+        write screenshot to store or keep it in memory
+        :param spider:
+        :param request:
+        :param _screenshot: screenshot options
+        :param data: base64 encoded image
+        :return: file path or BytesIO of image
+        """
+        if self.screenshot_store and _screenshot.get('store', True):
+            # keep only path of image
+            screenshot_result = self.screenshot_store.path(spider, request, _screenshot)
+            size = self.screenshot_store.persist(screenshot_result, data)
+            self.stats.inc_value('selenium/screenshot/stored_bytes', size)
+        else:
+            screenshot_result = BytesIO(base64.b64decode(data))
+        return screenshot_result
+    
+    def _get_partial(self, selenium_meta):
+        """
+        get if partial content is returned on timeout
+        :param selenium_meta:
+        :return:
+        """
+        if selenium_meta.get('partial') is not None:
+            return selenium_meta.get('partial')
+        return self.partial
+    
+    def _build_response(self, request, body, screenshot_result=None, waited=None, extracted=None, partial=None,
+                        actions=None, scrolls=None, captured=None, url=None):
+        """
+        build response of rendered page
+        :param request:
+        :param body:
+        :param screenshot_result:
+        :param waited: seconds waited by wait strategies
+        :param extracted: result of extract script
+        :param partial: phase which timed out if content is partial
+        :param actions: result of actions, dict of `results` and `error`
+        :param scrolls: number of scrolls
+        :param captured: list of captured network responses
+        :param url: url of page after redirects, url of request if not set
+        :return:
+        """
+        response = HtmlResponse(
+            url or request.url,
+            status=self.partial_status if partial else 200,
+            body=body,
+            encoding='utf-8',
+            request=request
+        )
+        if partial:
+            response.meta['selenium_partial'] = partial
+        if screenshot_result:
+            response.meta['screenshot'] = screenshot_result
+        if waited is not None:
+            response.meta['selenium_waited'] = waited
+        if extracted is not None:
+            response.meta['selenium_extracted'] = extracted
+        if scrolls is not None:
+            response.meta['selenium_scrolls'] = scrolls
+        if captured is not None:
+            response.meta['selenium_captured'] = captured
+        if actions is not None:
+            response.meta['selenium_actions'] = actions.get('results')
+            if actions.get('error'):
+                response.meta['selenium_actions_error'] = actions['error']
+        return response
+    
+    def _send_snapshot(self, request, spider, body, scrolls):
+        """
+        send intermediate content of scrolling page by signal
+        :param request:
+        :param spider:
+        :param body:
+        :param scrolls: number of scrolls
+        :return:
+        """
+        response = HtmlResponse(request.url, status=200, body=body, encoding='utf-8', request=request)
+        self.stats.inc_value('selenium/scroll/snapshot_count')
+        self.crawler.signals.send_catch_log(signal=scroll_snapshot, response=response, scrolls=scrolls,
+                                            spider=spider)
+    
+    def _snapshot(self, browser, request, spider, selenium_meta, scrolls):
+        """
+        send snapshot of page from render worker
+        :param browser:
+        :param request:
+        :param spider:
+        :param selenium_meta:
+        :param scrolls:
+        :return:
+        """
+        if selenium_meta.get('selector'):
+            body = browser.execute_script(OUTER_HTML_SCRIPT, selenium_meta.get('selector'))
+        else:
+            body = browser.page_source
+        from twisted.internet import reactor
+        reactor.callFromThread(self._send_snapshot, request, spider, body, scrolls)
+    
+    def _check_actions(self, request, result):
+        """
+        log error of actions
+        :param request:
+        :param result: result of actions
+        :return:
+        """
+        if result.get('error'):
+            logger.warning('error running actions of %s: %s', request.url, result['error'])
+            self.stats.inc_value('selenium/actions/error_count')
+    
+    def _get_capture(self, request, selenium_meta):
+        """
+        get capture of network responses matching patterns of request
+        :param request:
+        :param selenium_meta:
+        :return: ResponseCapture or None
+        """
+        if not selenium_meta.get('capture'):
+            return None
+        return ResponseCapture(selenium_meta.get('capture'))
+    
+    def _check_captured(self, request, _capture, complete):
+        """
+        log patterns not matched by any response while waiting
+        :param request:
+        :param _capture:
+        :param complete: whether every pattern is matched
+        :return:
+        """
+        if not complete:
+            logger.warning('responses of %s matching %s were not captured in time', request.url,
+                           [pattern.pattern for index, pattern in enumerate(_capture.patterns)
+                            if index not in _capture.matched])
+            self.stats.inc_value('selenium/capture/timeout_count')
+    
+    def _record_timings(self, response, timings):
+        """
+        push timings of phases to stats and attach them to rendered response
+        :param response: rendered response, retry request or None if failed
+        :param timings: RenderTimings
+        :return:
+        """
+        timings = timings.finish()
+        self.phase_stats.record_all(timings)
+        if isinstance(response, HtmlResponse):
+            response.meta['selenium_timings'] = timings
+    
+    @staticmethod
+    def _throttle_domain(request):
+        """
+        get domain of request whose render slots are throttled
+        :param request:
+        :return:
+        """
+        return urlparse(request.url).hostname or ''
+    
+    def _throttle_release(self, result, domain):
+        """
+        give back render slot of domain, slots are adjusted by render latency of response,
+        retry requests and failures are timeouts or errors
+        :param result: response, retry request or failure
+        :param domain:
+        :return: result
+        """
+        timings = result.meta.get('selenium_timings') if isinstance(result, Response) else None
+        if timings:
+            self.throttle.release(domain, timings['total'] - timings.get('acquire', 0))
         else:
-            for _cookie in _cookies:
-                if isinstance(_cookie, dict) and 'domain' not in _cookie.keys():
-                    _cookie['domain'] = domain
-        for _cookie in _cookies:
-            browser.add_cookie(_cookie)
+            self.throttle.release(domain, ok=isinstance(result, Response))
+        return result
+    
+    def _store_cache(self, spider, request, response):
+        """
+        cache rendered response
+        :param spider:
+        :param request:
+        :param response:
+        :return:
+        """
+        if not self.cache or not isinstance(response, HtmlResponse) or response.status != 200 or \
+                response.meta.get('selenium_partial') or response.meta.get('selenium_actions_error'):
+            return
+        try:
+            self.cache.store_response(spider, request, response)
+            self.stats.inc_value('selenium/cache/store_count')
+        except Exception:
+            logger.exception('error caching response of %s', request.url)
+    
+    def _render(self, browser, request, spider, selenium_meta, _timeout, timings):
+        """
+        render request using browser
+        :param browser:
+        :param request:
+        :param spider:
+        :param selenium_meta:
+        :param _timeout:
+        :param timings: RenderTimings of request
+        :return:
+        """
+        browser.set_page_load_timeout(_timeout)
+        
+        # block resources which are not needed
+        _blocked_urls = self._get_blocked_urls(selenium_meta)
+        # reused browser may keep blocked urls of last request
+        if _blocked_urls or getattr(browser, 'blocked_urls', None):
+            logger.debug('blocking urls %s', _blocked_urls)
+            with timings.phase('block'):
+                browser.execute_cdp_cmd('Network.enable', {})
+                browser.execute_cdp_cmd('Network.setBlockedURLs', {'urls': _blocked_urls})
+            browser.blocked_urls = _blocked_urls
+        
+        # set cookies before navigation, so that page is loaded only once
+        _cookies = self._get_cookies(request)
         if _cookies:
-            browser.refresh()
+            logger.debug('setting cookies %s', _cookies)
+            with timings.phase('cookies'):
+                browser.execute_cdp_cmd('Network.setCookies', {'cookies': _cookies})
+        
+        # capture network responses from performance log
+        _capture = self._get_capture(request, selenium_meta)
+        if _capture and self.capture_enabled:
+            # discard entries of earlier pages of reused browser
+            browser.get_log(PERFORMANCE_LOG)
+        elif _capture:
+            logger.warning('GERAPY_SELENIUM_CAPTURE_ENABLED is not set, responses of %s are not captured',
+                           request.url)
+            _capture = None
+        
+        # track network and dom of page for wait strategies
+        _wait_until, _wait_idle, _wait_max = self._get_wait_until(selenium_meta, _timeout)
+        self._install_tracker(browser, needs_tracker(_wait_until))
+        
+        # phase which timed out, page loading is stopped and its current dom is returned
+        _partial = None
+        try:
+            with timings.phase('navigate'):
+                browser.get(request.url)
+        except TimeoutException:
+            # stop loading either way, so that browser is healthy to be reused by retry
+            if not self._stop_loading(browser) or not self._get_partial(selenium_meta):
+                return self._retry(request, 504, spider)
+            logger.warning('timeout loading %s, returning partial content', request.url)
+            _partial = 'navigate'
+        
+        # wait for captured responses instead of dom, later waits are skipped once all of them arrived
+        _captured = False
+        if _capture and selenium_meta.get('capture_wait') and not _partial:
+            logger.debug('waiting for responses matching %s', selenium_meta.get('capture'))
+            with timings.phase('capture'):
+                _captured = wait_captured(browser, _capture, _timeout)
+            self._check_captured(request, _capture, _captured)
         
         # wait for dom loaded
-        if selenium_meta.get('wait_for'):
+        if selenium_meta.get('wait_for') and not _partial and not _captured:
             _wait_for = selenium_meta.get('wait_for')
             try:
                 logger.debug('waiting for %s', _wait_for)
-                WebDriverWait(browser, _timeout).until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, _wait_for))
-                )
+                with timings.phase('wait_for'):
+                    WebDriverWait(browser, _timeout).until(
+                        EC.presence_of_element_located((By.CSS_SELECTOR, _wait_for))
+                    )
             except TimeoutException:
                 logger.error('error waiting for %s of %s', _wait_for, request.url)
-                browser.close()
-                return self._retry(request, 504, spider)
+                if not self._stop_loading(browser) or not self._get_partial(selenium_meta):
+                    return self._retry(request, 504, spider)
+                _partial = 'wait_for'
         
         # evaluate script
-        if selenium_meta.get('script'):
+        if selenium_meta.get('script') and not _partial:
             _script = selenium_meta.get('script')
             logger.debug('evaluating %s', _script)
-            browser.execute(_script)
+            with timings.phase('script'):
+                self._evaluate(browser, _script)
+        
+        # run actions by one script in page
+        _actions = None
+        if selenium_meta.get('actions') and not _partial:
+            logger.debug('running actions %s', selenium_meta.get('actions'))
+            function, arguments = compile_actions(selenium_meta.get('actions'))
+            with timings.phase('actions'):
+                try:
+                    _actions = run_function(browser, function, (arguments, _timeout), _timeout)
+                except TimeoutException:
+                    _actions = {'results': [], 'error': f'timeout running actions in {_timeout}s'}
+                except WebDriverException as e:
+                    # like page navigated away by click
+                    _actions = {'results': [], 'error': e.msg}
+            self._check_actions(request, _actions)
+        
+        # scroll until page stops growing
+        _scrolls = None
+        if selenium_meta.get('scroll') and not _partial:
+            _scroll = scroll_options(selenium_meta.get('scroll'), _timeout)
+            logger.debug('scrolling using args %s', _scroll)
+            with timings.phase('scroll'):
+                try:
+                    _scrolls = scroll(browser, _scroll, partial(self._snapshot, browser, request, spider,
+                                                                selenium_meta))
+                except WebDriverException as e:
+                    logger.warning('error scrolling %s: %s', request.url, e.msg)
+            self.stats.inc_value('selenium/scroll/count', _scrolls or 0)
+        
+        # wait until page is ready
+        _waited = None
+        if _wait_until and not _partial and not _captured:
+            logger.debug('waiting until %s', _wait_until)
+            with timings.phase('wait_until'):
+                _waited, _ready = wait_until(browser, _wait_until, idle=_wait_idle, timeout=_wait_max)
+            if not _ready:
+                logger.warning('waiting until %s of %s exceeded %.1fs', _wait_until, request.url, _waited)
         
         # sleep
-        _sleep = self.sleep
-        if selenium_meta.get('sleep') is not None:
-            _sleep = selenium_meta.get('sleep')
-        if _sleep is not None:
+        _sleep = self._get_sleep(selenium_meta, _wait_until)
+        if _sleep is not None and not _partial and not _captured:
             logger.debug('sleep for %ss', _sleep)
-            time.sleep(_sleep)
+            with timings.phase('sleep'):
+                time.sleep(_sleep)
         
-        body = browser.page_source
+        # responses arrived until now
+        if _capture:
+            with timings.phase('capture'):
+                collect(browser, _capture)
+            self.stats.inc_value('selenium/capture/response_count', len(_capture.responses))
+        
+        # extract in browser instead of serializing the whole page
+        _extracted = None
+        with timings.phase('content'):
+            if selenium_meta.get('extract'):
+                logger.debug('extracting by %s', selenium_meta.get('extract'))
+                _extracted = browser.execute_script(selenium_meta.get('extract'))
+                body = b''
+            elif selenium_meta.get('selector'):
+                body = browser.execute_script(OUTER_HTML_SCRIPT, selenium_meta.get('selector'))
+            else:
+                body = browser.page_source
+            _url = browser.current_url
         
         # screenshot
-        _screenshot = self.screenshot
-        if selenium_meta.get('screenshot') is not None:
-            _screenshot = selenium_meta.get('screenshot')
+        _screenshot = self._get_screenshot(selenium_meta)
         screenshot_result = None
         if _screenshot is not None:
             logger.debug('taking screenshot using args %s', _screenshot)
-            if 'selector' in _screenshot:
-                screenshot_result = browser.find_element_by_css_selector(_screenshot['selector']).screenshot_as_png
-            elif 'xpath' in _screenshot:
-                screenshot_result = browser.find_element_by_xpath(_screenshot['xpath']).screenshot_as_png
-            else:
-                screenshot_result = browser.get_screenshot_as_png()
-            if isinstance(screenshot_result, bytes):
-                screenshot_result = BytesIO(screenshot_result)
+            with timings.phase('screenshot'):
+                data = capture(browser, _screenshot)
+                screenshot_result = self._save_screenshot(spider, request, _screenshot, data)
+            del data
         
-        # close page and browser
-        logger.debug('close selenium')
-        browser.close()
-        
-        response = HtmlResponse(
-            request.url,
-            status=200,
-            body=body,
-            encoding='utf-8',
-            request=request
-        )
-        if screenshot_result:
-            response.meta['screenshot'] = screenshot_result
-        return response
+        return self._build_response(request, body, screenshot_result, _waited, _extracted, _partial, _actions,
+                                    _scrolls, _capture.responses if _capture else None, _url)
     
-    def process_request(self, request, spider):
+    @staticmethod
+    def _evaluate(browser, script):
         """
-        process request using pyppeteer
+        evaluate expression in page, call it if it's a function, like `() => { ... }`,
+        the same as `script` of asyncio backend
+        :param browser:
+        :param script:
+        :return:
+        """
+        result = browser.execute_cdp_cmd('Runtime.evaluate', {'expression': script, 'awaitPromise': True})
+        if result.get('exceptionDetails'):
+            raise WebDriverException(result['exceptionDetails'].get('text'))
+        if result['result'].get('type') == 'function':
+            browser.execute_cdp_cmd('Runtime.callFunctionOn', {
+                'functionDeclaration': 'function () { return this() }',
+                'objectId': result['result']['objectId'],
+                'awaitPromise': True,
+            })
+    
+    @staticmethod
+    def _stop_loading(browser):
+        """
+        stop loading page after timeout
+        :param browser:
+        :return: True if stopped
+        """
+        try:
+            browser.execute_script('window.stop()')
+            return True
+        except Exception:
+            logger.debug('error stopping loading', exc_info=True)
+            return False
+    
+    def _defer(self, func, *args, **kwargs):
+        """
+        run blocking job like rendering, launching browsers or scanning processes in render workers,
+        so that reactor threadpool is left for dns resolving
+        :param func:
+        :param args:
+        :param kwargs:
+        :return: deferred of result
+        """
+        from twisted.internet import reactor
+        return deferToThreadPool(reactor, self.threadpool, func, *args, **kwargs)
+    
+    def _submit(self, request, spider):
+        """
+        submit request to render workers
         :param request:
         :param spider:
         :return:
         """
-        logger.debug('processing request %s', request)
-        return deferToThread(self._process_request, request, spider)
-        # return self._process_request(request, spider)
-    
-    def _spider_closed(self):
-        pass
+        self.pending += 1
+        queue_size = max(self.pending - self.max_workers, 0)
+        self.stats.set_value('selenium/queue/size', queue_size)
+        self.stats.max_value('selenium/queue/max_size', queue_size)
+        
+        def _done(result):
+            self.pending -= 1
+            self.stats.set_value('selenium/queue/size', max(self.pending - self.max_workers, 0))
+            return result
+        
+        d = self._defer(self._process_request, request, spider)
+        return d.addBoth(_done)
     
-    def spider_closed(self):
+    def _skip_render(self, request, spider):
+        """
+        check if request can be processed without rendering
+        :param request:
+        :param spider:
+        :return: tuple of (skipped, result of process_request)
+        """
+        # use cached rendered response before any browser acquired
+        if self.cache and request.meta.get('selenium_fallback') != 'http':
+            response = self.cache.retrieve_response(spider, request)
+            if response is not None:
+                logger.debug('using cached response of %s', request.url)
+                self.stats.inc_value('selenium/cache/hit_count')
+                response.meta['selenium_cached'] = True
+                return True, response
+            self.stats.inc_value('selenium/cache/miss_count')
+        
+        # fetch by scrapy downloader first, render only if static html is not enough
+        fallback = request.meta.get('selenium_fallback')
+        if fallback is None and self._http_first(request):
+            if self.decider.should_try_http(request.url):
+                logger.debug('fetching %s by http first', request.url)
+                self.stats.inc_value('selenium/http_first/attempt_count')
+                request.meta['selenium_fallback'] = 'http'
+                return True, None
+            self.stats.inc_value('selenium/http_first/skipped_count')
+        elif fallback == 'http':
+            return True, None
+        return False, None
+    
+    def process_request(self, request, spider):
+        """
+        process request using selenium
+        :param request:
+        :param spider:
+        :return:
+        """
+        logger.debug('processing request %s', request)
+        skipped, result = self._skip_render(request, spider)
+        if skipped:
+            return result
+        
+        if not self.semaphore.tokens:
+            # workers and queue are full, request waits for a free slot
+            self.stats.inc_value('selenium/backpressure/count')
+            self.stats.max_value('selenium/backpressure/max_waiting', len(self.semaphore.waiting) + 1)
+        if not self.throttle:
+            return self.semaphore.run(self._submit, request, spider)
+        
+        # wait for a render slot of domain before taking a worker
+        domain = self._throttle_domain(request)
+        d = defer.Deferred()
+        if self.throttle.acquire(domain, partial(d.callback, None)):
+            d.callback(None)
+        d.addCallback(lambda _: self.semaphore.run(self._submit, request, spider))
+        d.addBoth(self._throttle_release, domain)
+        return d
+    
+    def _http_first(self, request):
+        """
+        check if request should be fetched by http first
+        :param request:
+        :return:
+        """
+        selenium_meta = request.meta.get('selenium') or {}
+        if selenium_meta.get('http_first') is not None:
+            return selenium_meta.get('http_first')
+        return self.http_first
+    
+    def _static_sufficient(self, request, response, spider):
+        """
+        check if static html fetched by http contains the needed content
+        :param request:
+        :param response:
+        :param spider:
+        :return:
+        """
+        if response.status != 200:
+            return False
+        selenium_meta = request.meta.get('selenium') or {}
+        _render_check = self.render_check
+        if selenium_meta.get('render_check') is not None:
+            _render_check = selenium_meta.get('render_check')
+        if _render_check:
+            if isinstance(_render_check, str):
+                _render_check = getattr(spider, _render_check)
+            return bool(_render_check(response))
+        _wait_for = selenium_meta.get('wait_for')
+        if _wait_for:
+            return isinstance(response, TextResponse) and bool(response.css(_wait_for))
+        return True
+    
+    def process_response(self, request, response, spider):
+        """
+        render request if static html fetched by http is not enough
+        :param request:
+        :param response:
+        :param spider:
+        :return:
+        """
+        if request.meta.get('selenium_fallback') != 'http':
+            return response
+        sufficient = self._static_sufficient(request, response, spider)
+        self.decider.record(request.url, sufficient)
+        if sufficient:
+            logger.debug('static html of %s is sufficient', request.url)
+            self.stats.inc_value('selenium/http_first/static_count')
+            return response
+        logger.debug('static html of %s is not sufficient, rendering', request.url)
+        return self._render_fallback(request)
+    
+    def process_exception(self, request, exception, spider):
+        """
+        render request if it failed to be fetched by http, like blocked connection
+        :param request:
+        :param exception:
+        :param spider:
+        :return:
+        """
+        if request.meta.get('selenium_fallback') != 'http':
+            return None
+        self.decider.record(request.url, False)
+        logger.debug('error fetching %s by http: %r, rendering', request.url, exception)
+        self.stats.inc_value('selenium/http_first/error_count')
+        return self._render_fallback(request)
+    
+    def _render_fallback(self, request):
+        """
+        get request to be rendered instead of fetched by http
+        :param request:
+        :return:
+        """
+        self.stats.inc_value('selenium/http_first/render_count')
+        render_request = request.replace(dont_filter=True)
+        render_request.meta['selenium_fallback'] = 'render'
+        return render_request
+    
+    def _open_spider(self, spider):
+        """
+        open cache and find CookiesMiddleware to get cookies of cookiejar
+        :param spider:
+        :return:
+        """
+        if self.cache:
+            self.cache.open_spider(spider)
+        for middleware in self.crawler.engine.downloader.middleware.middlewares:
+            if isinstance(middleware, CookiesMiddleware):
+                self.cookies_middleware = middleware
+                break
+    
+    def _driver_pids(self):
+        """
+        get pids of chromedriver launched by this middleware, spawned by browsers or services
+        :return:
+        """
+        return self.driver_pids | self.services.pids if self.services else self.driver_pids
+    
+    def _reap(self, orphans_only=True):
+        """
+        kill leftover browsers, of crashed crawls if `orphans_only`, otherwise of this crawl too
+        :param orphans_only:
+        :return:
+        """
+        if not self.reaper:
+            return
+        killed = reap(None if orphans_only else self.owner, self._driver_pids())
+        if killed:
+            self.stats.inc_value('selenium/reaper/killed_count', killed)
+    
+    def _over_memory(self, rss):
+        """
+        check if memory of browser exceeds limit
+        :param rss: bytes of browser processes
+        :return:
+        """
+        if rss is None:
+            return False
+        rss = rss / 1024 / 1024
+        self.stats.max_value('selenium/watchdog/max_rss', round(rss, 1))
+        if rss <= self.browser_max_rss:
+            return False
+        logger.warning('recycling browser using %.1fMB of memory, over limit %sMB', rss, self.browser_max_rss)
+        self.stats.inc_value('selenium/watchdog/recycled_count')
+        return True
+    
+    def _check_memory(self):
+        """
+        recycle browsers over memory limit
+        :return:
+        """
+        with self.pools_lock:
+            pools = list(self.pools.values())
+        for pool in pools:
+            for browser in pool.browsers():
+                if not browser.dead and self._over_memory(tree_rss(browser.pid)):
+                    pool.recycle(browser)
+            with self.pools_lock:
+                self._drop_pool(pool)
+    
+    def _watch(self):
+        """
+        check memory of browsers in worker thread
+        :return:
+        """
+        return self._defer(self._check_memory)
+    
+    def _start_watchdog(self):
+        """
+        check memory of browsers periodically if limit is set
+        :return:
+        """
+        if not self.browser_max_rss:
+            return
+        if psutil is None:
+            logger.warning('psutil is not installed, GERAPY_SELENIUM_BROWSER_MAX_RSS is ignored')
+            return
+        self.watchdog = LoopingCall(self._watch)
+        d = self.watchdog.start(self.watchdog_interval, now=False)
+        d.addErrback(lambda failure: logger.error('memory watchdog stopped: %s', failure.getErrorMessage()))
+    
+    def _stop_watchdog(self):
+        """
+        stop checking memory of browsers
+        :return:
+        """
+        if self.watchdog is not None and self.watchdog.running:
+            self.watchdog.stop()
+    
+    def _start_remote_check(self):
+        """
+        check health of remote nodes periodically
+        :return:
+        """
+        if not self.remotes or not self.remote_check_interval:
+            return
+        self.remote_check = LoopingCall(self._defer, self.remotes.check)
+        d = self.remote_check.start(self.remote_check_interval, now=False)
+        d.addErrback(lambda failure: logger.error('health check of remote nodes stopped: %s',
+                                                  failure.getErrorMessage()))
+    
+    def _stop_remote_check(self):
+        """
+        stop checking health of remote nodes
+        :return:
+        """
+        if self.remote_check is not None and self.remote_check.running:
+            self.remote_check.stop()
+    
+    def _spider_opened(self):
+        """
+        reap browsers left by crashed crawls, start chromedriver services and check remote nodes
+        :return:
+        """
+        self._reap()
+        if self.services:
+            self.services.start()
+        if self.remotes:
+            self.remotes.check()
+    
+    def _warm_up(self, browser):
+        """
+        visit warm-up url, so that later pages of its site load from warm caches
+        :param browser:
+        :return:
+        """
+        start = time.time()
+        browser.set_page_load_timeout(self.download_timeout)
+        browser.get(self.warmup_url)
+        self.phase_stats.record('warmup', time.time() - start)
+    
+    def _prelaunch_browser(self):
+        """
+        launch an idle browser of default configuration
+        :return:
+        """
+        pool = self._get_pool(None, self.pretend)
+        try:
+            if pool.prelaunch(self._warm_up if self.warmup_url else None):
+                self.stats.inc_value('selenium/prelaunch/count')
+        except Exception as e:
+            logger.warning('error prelaunching browser: %s', e)
+            self.stats.inc_value('selenium/prelaunch/error_count')
+        finally:
+            self._put_pool(pool)
+    
+    def _prelaunch(self, _=None):
+        """
+        launch browsers of default configuration ahead of requests, staggered by interval
+        so that they don't compete for cpu, fires when all of them are ready
+        :return:
+        """
+        if not self.prelaunch:
+            return
+        from twisted.internet import reactor
+        logger.debug('prelaunching %s browsers', self.prelaunch)
+        return defer.DeferredList([
+            deferLater(reactor, index * self.prelaunch_interval, self._defer, self._prelaunch_browser)
+            for index in range(self.prelaunch)
+        ])
+    
+    def spider_opened(self, spider):
+        """
+        callback when spider opened
+        :param spider:
+        :return:
+        """
+        self._open_spider(spider)
+        self._start_watchdog()
+        self._start_remote_check()
+        d = self._defer(self._spider_opened)
+        d.addCallback(self._prelaunch)
+        return d
+    
+    def _spider_closed(self):
+        """
+        quit all browsers in pool, stop chromedriver services and reap browsers left behind
+        :return:
+        """
+        logger.debug('closing browser pools')
+        with self.pools_lock:
+            pools = list(self.pools.values())
+        for pool in pools:
+            pool.close()
+        if self.services:
+            self.services.stop()
+        self._reap(orphans_only=False)
+    
+    def _stop_threadpool(self):
+        """
+        stop render workers
+        :return:
+        """
+        if self.threadpool.started and not self.threadpool.joined:
+            self.threadpool.stop()
+    
+    def spider_closed(self, spider):
+        """
+        callback when spider closed
+        :param spider:
+        :return:
+        """
+        if self.cache:
+            self.cache.close_spider(spider)
+        self._stop_watchdog()
+        self._stop_remote_check()
+        d = self._defer(self._spider_closed)
+        d.addBoth(lambda _: self._stop_threadpool())
+        return d
+
+
+class AsyncSeleniumMiddleware(SeleniumMiddleware):
+    """
+    Downloader middleware for asyncio reactor, which drives chrome over devtools protocol
+    from the event loop, without a thread for every request
+    """
+    
+    @classmethod
+    def from_crawler(cls, crawler):
+        """
+        init the middleware
+        :param crawler:
+        :return:
+        """
+        settings = crawler.settings
+        if not is_asyncio_reactor_installed():
+            raise NotConfigured('AsyncSeleniumMiddleware requires asyncio reactor, set TWISTED_REACTOR to '
+                                'twisted.internet.asyncioreactor.AsyncioSelectorReactor')
+        if aiohttp is None:
+            raise NotConfigured('AsyncSeleniumMiddleware requires aiohttp, install it by `pip install aiohttp`')
+        cls._init_settings(settings)
+        cls.chrome_path = settings.get('GERAPY_SELENIUM_CHROME_PATH', GERAPY_SELENIUM_CHROME_PATH)
+        if cls.remote_endpoints:
+            logger.warning('GERAPY_SELENIUM_REMOTE_ENDPOINTS is not supported by AsyncSeleniumMiddleware, '
+                           'browsers are launched locally')
+        if cls.profile_template:
+            # pages are opened in their own browser contexts, which keep caches in memory
+            logger.warning('GERAPY_SELENIUM_PROFILE_TEMPLATE is not supported by AsyncSeleniumMiddleware')
+        if cls.warmup_url:
+            # pages are opened in their own browser contexts, which don't share caches of warm-up page
+            logger.warning('GERAPY_SELENIUM_WARMUP_URL is not supported by AsyncSeleniumMiddleware')
+        
+        middleware = cls._create(crawler)
+        # browsers keyed by configuration, sharing the limit of total browsers
+        middleware.browsers = defaultdict(list)
+        middleware.launching = 0
+        middleware.condition = asyncio.Condition()
+        crawler.signals.connect(middleware.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+    
+    def _driver_pids(self):
+        """
+        chrome is launched without chromedriver
+        :return:
+        """
+        return set()
+    
+    def _usable(self, browser):
+        """
+        check if browser can open one more page
+        :param browser:
+        :return:
+        """
+        return browser.alive and browser.active < self.tabs_per_browser and not self._expired(browser)
+    
+    def _expired(self, browser):
+        """
+        check if browser should be recycled
+        :param browser:
+        :return:
+        """
+        return browser.dead or (self.browser_max_pages and browser.pages >= self.browser_max_pages) or \
+               (self.browser_max_age and browser.age >= self.browser_max_age)
+    
+    def _remove_browser(self, key, browser):
+        """
+        remove browser of configuration, configurations without browsers are dropped, so that
+        configurations of rotated proxies don't pile up, must be called with condition acquired
+        :param key:
+        :param browser:
+        :return:
+        """
+        browsers = self.browsers[key]
+        browsers.remove(browser)
+        if not browsers:
+            del self.browsers[key]
+    
+    def _evict(self, key):
+        """
+        remove least recently used idle browser of other configurations
+        :param key:
+        :return: evicted browser or None
+        """
+        idle = [(browser.last_used, other, browser) for other, browsers in self.browsers.items() if other != key
+                for browser in browsers if not browser.active]
+        if not idle:
+            return None
+        _, other, browser = min(idle, key=lambda item: item[0])
+        self._remove_browser(other, browser)
+        if other[0]:
+            self.stats.inc_value(f'selenium/proxy/{self._proxy_name(other[0])}/evicted_count')
+        return browser
+    
+    async def _acquire_browser(self, key, timeout):
+        """
+        get browser of configuration with a free tab, launch one if limit of total browsers is not reached
+        :param key: tuple of proxy and pretend
+        :param timeout: seconds to wait for a free browser
+        :return:
+        """
+        deadline = time.time() + timeout
+        waiting = False
+        async with self.condition:
+            while True:
+                browsers = [browser for browser in self.browsers.get(key, []) if self._usable(browser)]
+                if browsers:
+                    browser = min(browsers, key=lambda item: item.active)
+                    browser.active += 1
+                    browser.last_used = time.time()
+                    return browser
+                total = self.launching + sum(len(browsers) for browsers in self.browsers.values())
+                evicted = self._evict(key) if total >= self.max_browsers else None
+                if evicted is not None:
+                    asyncio.ensure_future(evicted.close())
+                    total -= 1
+                if total < self.max_browsers:
+                    self.launching += 1
+                    break
+                if not waiting:
+                    waiting = True
+                    self.stats.inc_value('selenium/backpressure/count')
+                await asyncio.wait_for(self.condition.wait(), max(deadline - time.time(), 0))
+        
+        return await self._launch(key, timeout)
+    
+    async def _launch(self, key, timeout, idle=False):
+        """
+        launch browser of configuration, a slot of `launching` must be reserved by caller
+        :param key: tuple of proxy and pretend
+        :param timeout: seconds to wait for browser to launch
+        :param idle: browser is idle after launched, otherwise a page of it is taken by caller
+        :return:
+        """
+        proxy, pretend = key
+        try:
+            logger.debug('launching browser, proxy %s, pretend %s', proxy, pretend)
+            args = self._launch_options(proxy, pretend)['options'].arguments
+            start = time.time()
+            browser = await Browser.launch(self.chrome_path, args, timeout=timeout)
+            self.phase_stats.record('launch', time.time() - start)
+        except BaseException:
+            async with self.condition:
+                self.launching -= 1
+                self.condition.notify_all()
+            raise
+        if proxy:
+            self.stats.inc_value(f'selenium/proxy/{self._proxy_name(proxy)}/browser_count')
+        async with self.condition:
+            self.launching -= 1
+            browser.active = 0 if idle else 1
+            self.browsers[key].append(browser)
+            self.condition.notify_all()
+        return browser
+    
+    async def _release_browser(self, key, browser):
+        """
+        release tab of browser, close browser if it's dead or expired
+        :param key:
+        :param browser:
+        :return:
+        """
+        async with self.condition:
+            browser.active -= 1
+            browser.last_used = time.time()
+            retire = not browser.alive or (not browser.active and self._expired(browser))
+            if retire and browser in self.browsers.get(key, []):
+                self._remove_browser(key, browser)
+            self.condition.notify_all()
+        if retire and not browser.active:
+            await browser.close()
+    
+    async def _process_request_async(self, request, spider):
+        """
+        use a page of browser to process request
+        :param request:
+        :param spider:
+        :return:
+        """
+        selenium_meta = request.meta.get('selenium') or {}
+        logger.debug('selenium_meta %s', selenium_meta)
+        
+        _proxy = request.meta.get('proxy')
+        if selenium_meta.get('proxy') is not None:
+            _proxy = selenium_meta.get('proxy')
+        _pretend = self.pretend
+        if selenium_meta.get('pretend') is not None:
+            _pretend = selenium_meta.get('pretend')
+        _timeout = self.download_timeout
+        if selenium_meta.get('timeout') is not None:
+            _timeout = selenium_meta.get('timeout')
+        
+        if _proxy:
+            self.stats.inc_value(f'selenium/proxy/{self._proxy_name(_proxy)}/request_count')
+        key = (_proxy or None, bool(_pretend))
+        timings = RenderTimings()
+        try:
+            with timings.phase('acquire'):
+                browser = await self._acquire_browser(key, _timeout)
+        except asyncio.TimeoutError:
+            logger.error('timeout waiting for a free browser for %s', request.url)
+            self.phase_stats.record_all(timings.finish())
+            return self._retry(request, 504, spider)
+        
+        page = None
+        response = None
+        try:
+            with timings.phase('acquire'):
+                # page is new for every request, tracker is only injected when waited for
+                scripts = [PRETEND_SCRIPT] if _pretend else []
+                if needs_tracker(self._get_wait_until(selenium_meta, _timeout)[0]):
+                    scripts.append(TRACKER_SCRIPT)
+                page = await browser.new_page(''.join(scripts))
+            response = await self._render_async(page, request, spider, selenium_meta, _timeout, timings)
+        finally:
+            if page is not None:
+                await page.close()
+            await self._release_browser(key, browser)
+            self._record_timings(response, timings)
+        
+        # cache rendered response, file io is done out of event loop
+        await asyncio.get_event_loop().run_in_executor(None, self._store_cache, spider, request, response)
+        return response
+    
+    async def _render_async(self, page, request, spider, selenium_meta, _timeout, timings):
+        """
+        render request using page
+        :param page:
+        :param request:
+        :param spider:
+        :param selenium_meta:
+        :param _timeout:
+        :param timings: RenderTimings of request
+        :return:
+        """
+        # block resources which are not needed, resource types are matched by type of request
+        _blocked_urls = self._get_blocked_urls(selenium_meta, by_extension=False)
+        if _blocked_urls:
+            logger.debug('blocking urls %s', _blocked_urls)
+            with timings.phase('block'):
+                await page.send('Network.enable')
+                await page.send('Network.setBlockedURLs', {'urls': _blocked_urls})
+        _resource_types = [FETCH_RESOURCE_TYPES[resource_type] for resource_type in
+                           self._get_ignore_resource_types(selenium_meta) if resource_type in FETCH_RESOURCE_TYPES]
+        if _resource_types:
+            logger.debug('blocking resource types %s', _resource_types)
+            with timings.phase('block'):
+                page.on('Fetch.requestPaused',
+                        lambda method, params: asyncio.ensure_future(self._fail_request(page, params['requestId'])))
+                await page.send('Fetch.enable', {'patterns': [
+                    {'urlPattern': '*', 'resourceType': resource_type, 'requestStage': 'Request'}
+                    for resource_type in _resource_types
+                ]})
+        
+        # set cookies before navigation
+        _cookies = self._get_cookies(request)
+        if _cookies:
+            logger.debug('setting cookies %s', _cookies)
+            with timings.phase('cookies'):
+                await page.send('Network.setCookies', {'cookies': _cookies})
+        
+        # capture network responses from events of page
+        _capture = self._get_capture(request, selenium_meta)
+        if _capture:
+            for event in ('Network.responseReceived', 'Network.loadingFinished', 'Network.loadingFailed'):
+                page.on(event, _capture.feed)
+            await page.send('Network.enable')
+        _capture_wait = _capture and selenium_meta.get('capture_wait')
+        
+        # phase which timed out, page loading is stopped and its current dom is returned
+        _partial = None
+        _captured = False
+        try:
+            with timings.phase('navigate'):
+                if _capture_wait:
+                    _captured = await self._navigate_captured(page, request.url, _capture, _timeout)
+                else:
+                    await page.navigate(request.url, _timeout)
+        except asyncio.TimeoutError:
+            if not self._get_partial(selenium_meta) or not await self._stop_loading_async(page):
+                return self._retry(request, 504, spider)
+            logger.warning('timeout loading %s, returning partial content', request.url)
+            _partial = 'navigate'
+        
+        # wait for captured responses instead of dom, later waits are skipped once all of them arrived
+        if _capture_wait and not _partial:
+            if not _captured:
+                logger.debug('waiting for responses matching %s', selenium_meta.get('capture'))
+                with timings.phase('capture'):
+                    _captured = await wait_captured_async(page, _capture, _timeout)
+            self._check_captured(request, _capture, _captured)
+        
+        # wait for dom loaded
+        if selenium_meta.get('wait_for') and not _partial and not _captured:
+            _wait_for = selenium_meta.get('wait_for')
+            try:
+                logger.debug('waiting for %s', _wait_for)
+                with timings.phase('wait_for'):
+                    await page.wait_for_selector(_wait_for, _timeout)
+            except asyncio.TimeoutError:
+                logger.error('error waiting for %s of %s', _wait_for, request.url)
+                if not self._get_partial(selenium_meta) or not await self._stop_loading_async(page):
+                    return self._retry(request, 504, spider)
+                _partial = 'wait_for'
+        
+        # evaluate script
+        if selenium_meta.get('script') and not _partial:
+            _script = selenium_meta.get('script')
+            logger.debug('evaluating %s', _script)
+            with timings.phase('script'):
+                await page.evaluate(_script)
+        
+        # run actions by one script in page
+        _actions = None
+        if selenium_meta.get('actions') and not _partial:
+            logger.debug('running actions %s', selenium_meta.get('actions'))
+            source, arguments = page_script(selenium_meta.get('actions'))
+            with timings.phase('actions'):
+                try:
+                    _actions = await asyncio.wait_for(page.execute_script(source, arguments, _timeout), _timeout)
+                except asyncio.TimeoutError:
+                    _actions = {'results': [], 'error': f'timeout running actions in {_timeout}s'}
+                except CDPError as e:
+                    # like page navigated away by click
+                    _actions = {'results': [], 'error': str(e)}
+            self._check_actions(request, _actions)
+        
+        # scroll until page stops growing
+        _scrolls = None
+        if selenium_meta.get('scroll') and not _partial:
+            _scroll = scroll_options(selenium_meta.get('scroll'), _timeout)
+            logger.debug('scrolling using args %s', _scroll)
+            with timings.phase('scroll'):
+                try:
+                    _scrolls = await scroll_async(page, _scroll, partial(self._snapshot_async, page, request, spider,
+                                                                         selenium_meta))
+                except CDPError as e:
+                    logger.warning('error scrolling %s: %s', request.url, e)
+            self.stats.inc_value('selenium/scroll/count', _scrolls or 0)
+        
+        # wait until page is ready
+        _wait_until, _wait_idle, _wait_max = self._get_wait_until(selenium_meta, _timeout)
+        _waited = None
+        if _wait_until and not _partial and not _captured:
+            logger.debug('waiting until %s', _wait_until)
+            with timings.phase('wait_until'):
+                _waited, _ready = await wait_until_async(page, _wait_until, idle=_wait_idle, timeout=_wait_max)
+            if not _ready:
+                logger.warning('waiting until %s of %s exceeded %.1fs', _wait_until, request.url, _waited)
+        
+        # sleep
+        _sleep = self._get_sleep(selenium_meta, _wait_until)
+        if _sleep is not None and not _partial and not _captured:
+            logger.debug('sleep for %ss', _sleep)
+            with timings.phase('sleep'):
+                await asyncio.sleep(_sleep)
+        
+        # responses arrived until now
+        if _capture:
+            with timings.phase('capture'):
+                await collect_async(page, _capture)
+            self.stats.inc_value('selenium/capture/response_count', len(_capture.responses))
+        
+        # extract in browser instead of serializing the whole page
+        _extracted = None
+        with timings.phase('content'):
+            if selenium_meta.get('extract'):
+                logger.debug('extracting by %s', selenium_meta.get('extract'))
+                _extracted = await page.execute_script(selenium_meta.get('extract'))
+                body = b''
+            elif selenium_meta.get('selector'):
+                body = await page.execute_script(OUTER_HTML_SCRIPT, selenium_meta.get('selector'))
+            else:
+                body = await page.content()
+            _url = await page.url()
+        
+        # screenshot, image is decoded and written out of event loop
+        _screenshot = self._get_screenshot(selenium_meta)
+        screenshot_result = None
+        if _screenshot is not None:
+            logger.debug('taking screenshot using args %s', _screenshot)
+            with timings.phase('screenshot'):
+                data = await capture_async(page, _screenshot)
+                screenshot_result = await asyncio.get_event_loop().run_in_executor(
+                    None, self._save_screenshot, spider, request, _screenshot, data)
+            del data
+        
+        return self._build_response(request, body, screenshot_result, _waited, _extracted, _partial, _actions,
+                                    _scrolls, _capture.responses if _capture else None, _url)
+    
+    @staticmethod
+    async def _fail_request(page, request_id):
+        """
+        fail request paused by Fetch domain, which is of ignored resource type
+        :param page:
+        :param request_id:
+        :return:
+        """
+        try:
+            await page.send('Fetch.failRequest', {'requestId': request_id, 'errorReason': 'BlockedByClient'})
+        except CDPError as e:
+            # like page closed meanwhile
+            logger.debug('error blocking request %s: %s', request_id, e)
+    
+    async def _navigate_captured(self, page, url, _capture, _timeout):
+        """
+        navigate to url, loading is stopped as soon as every pattern of capture is matched
+        :param page:
+        :param url:
+        :param _capture: ResponseCapture
+        :param _timeout:
+        :return: whether every pattern is matched before page loaded
+        """
+        navigation = asyncio.ensure_future(page.navigate(url, _timeout))
+        captured = asyncio.ensure_future(wait_captured_async(page, _capture, _timeout))
+        try:
+            await asyncio.wait([navigation, captured], return_when=asyncio.FIRST_COMPLETED)
+            if captured.done() and captured.result():
+                navigation.cancel()
+                await asyncio.gather(navigation, return_exceptions=True)
+                await self._stop_loading_async(page)
+                return True
+            await navigation
+            return False
+        finally:
+            navigation.cancel()
+            captured.cancel()
+    
+    async def _snapshot_async(self, page, request, spider, selenium_meta, scrolls):
+        """
+        send snapshot of page
+        :param page:
+        :param request:
+        :param spider:
+        :param selenium_meta:
+        :param scrolls:
+        :return:
+        """
+        if selenium_meta.get('selector'):
+            body = await page.execute_script(OUTER_HTML_SCRIPT, selenium_meta.get('selector'))
+        else:
+            body = await page.content()
+        self._send_snapshot(request, spider, body, scrolls)
+    
+    @staticmethod
+    async def _stop_loading_async(page):
+        """
+        stop loading page after timeout
+        :param page:
+        :return: True if stopped
+        """
+        try:
+            await page.execute_script('window.stop()')
+            return True
+        except Exception:
+            logger.debug('error stopping loading', exc_info=True)
+            return False
+    
+    async def process_request(self, request, spider):
+        """
+        process request using page of browser
+        :param request:
+        :param spider:
+        :return:
+        """
+        logger.debug('processing request %s', request)
+        skipped, result = self._skip_render(request, spider)
+        if skipped:
+            return result
+        if not self.throttle:
+            return await self._process_request_async(request, spider)
+        
+        # wait for a render slot of domain before taking a browser
+        domain = self._throttle_domain(request)
+        granted = asyncio.get_event_loop().create_future()
+        if not self.throttle.acquire(domain, partial(self._throttle_grant, granted, domain)):
+            await granted
+        result = None
+        try:
+            result = await self._process_request_async(request, spider)
+        finally:
+            self._throttle_release(result, domain)
+        return result
+    
+    def _throttle_grant(self, granted, domain):
+        """
+        wake up request waiting for render slot, give the slot back if request was cancelled
+        :param granted: future of waiting request
+        :param domain:
+        :return:
+        """
+        if granted.done():
+            self.throttle.release(domain)
+        else:
+            granted.set_result(None)
+    
+    async def _check_memory_async(self):
+        """
+        recycle browsers over memory limit, idle ones are closed now and busy ones when released
+        :return:
+        """
+        closing = []
+        async with self.condition:
+            for key, browsers in list(self.browsers.items()):
+                for browser in list(browsers):
+                    if browser.dead or not self._over_memory(tree_rss(browser.process.pid)):
+                        continue
+                    browser.dead = True
+                    if not browser.active:
+                        self._remove_browser(key, browser)
+                        closing.append(browser)
+            self.condition.notify_all()
+        await asyncio.gather(*[browser.close() for browser in closing], return_exceptions=True)
+    
+    def _watch(self):
+        """
+        check memory of browsers in event loop
+        :return:
+        """
+        return deferred_from_coro(self._check_memory_async())
+    
+    async def _prelaunch_browser_async(self, key, delay):
+        """
+        launch an idle browser after delay, skipped if limit of total browsers is reached
+        :param key:
+        :param delay:
+        :return:
+        """
+        await asyncio.sleep(delay)
+        async with self.condition:
+            total = self.launching + sum(len(browsers) for browsers in self.browsers.values())
+            if total >= self.max_browsers:
+                return
+            self.launching += 1
+        try:
+            await self._launch(key, self.download_timeout, idle=True)
+            self.stats.inc_value('selenium/prelaunch/count')
+        except Exception as e:
+            logger.warning('error prelaunching browser: %s', e)
+            self.stats.inc_value('selenium/prelaunch/error_count')
+    
+    async def spider_opened(self, spider):
+        """
+        callback when spider opened
+        :param spider:
+        :return:
+        """
+        self._open_spider(spider)
+        self._start_watchdog()
+        await asyncio.get_event_loop().run_in_executor(None, self._reap)
+        key = (None, bool(self.pretend))
+        await asyncio.gather(*[self._prelaunch_browser_async(key, index * self.prelaunch_interval)
+                               for index in range(self.prelaunch)])
+    
+    async def _close_browsers(self):
+        """
+        close all browsers
+        :return:
+        """
+        logger.debug('closing browsers')
+        async with self.condition:
+            browsers = [browser for browsers in self.browsers.values() for browser in browsers]
+            self.browsers.clear()
+        await asyncio.gather(*[browser.close() for browser in browsers], return_exceptions=True)
+    
+    async def spider_closed(self, spider):
         """
         callback when spider closed
+        :param spider:
         :return:
         """
-        return deferToThread(self._spider_closed)
+        if self.cache:
+            self.cache.close_spider(spider)
+        self._stop_watchdog()
+        await self._close_browsers()
+        await asyncio.get_event_loop().run_in_executor(None, partial(self._reap, orphans_only=False))
@@ -0,0 +1,60 @@
+import re
+from collections import defaultdict
+from urllib.parse import urlparse
+
+
+class RenderDecider(object):
+    """
+    Learn for every domain and path pattern whether static html is enough,
+    so that browser is only used where it pays off
+    """
+
+    def __init__(self, min_samples=5, threshold=0.5, explore_interval=20):
+        """
+        :param min_samples: number of http attempts before deciding
+        :param threshold: min ratio of sufficient static html to keep trying http first
+        :param explore_interval: still try http every this number of requests after deciding to render
+        """
+        self.min_samples = min_samples
+        self.threshold = threshold
+        self.explore_interval = explore_interval
+        # key => [number of sufficient static html, number of http attempts]
+        self.samples = defaultdict(lambda: [0, 0])
+        self.skipped = defaultdict(int)
+
+    @staticmethod
+    def key(url):
+        """
+        get domain and path pattern of url, like `example.com/detail`
+        :param url:
+        :return:
+        """
+        parse_result = urlparse(url)
+        segments = [re.sub(r'\d+', '0', segment) for segment in parse_result.path.split('/') if segment]
+        return '/'.join([parse_result.hostname or ''] + segments[:1])
+
+    def should_try_http(self, url):
+        """
+        decide whether to fetch url by http first
+        :param url:
+        :return:
+        """
+        key = self.key(url)
+        sufficient, attempts = self.samples[key]
+        if attempts < self.min_samples or sufficient >= attempts * self.threshold:
+            return True
+        # explore sometimes in case the site changed
+        self.skipped[key] += 1
+        return self.skipped[key] % self.explore_interval == 0
+
+    def record(self, url, sufficient):
+        """
+        record result of http attempt
+        :param url:
+        :param sufficient: static html is enough
+        :return:
+        """
+        samples = self.samples[self.key(url)]
+        samples[1] += 1
+        if sufficient:
+            samples[0] += 1
@@ -0,0 +1,750 @@
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from urllib.parse import urlparse
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.remote.webelement import WebElement
+from gerapy_selenium.capture import PERFORMANCE_LOG, parse_log_entry
+from gerapy_selenium.watchdog import find_browser_pid, kill_tree
+
+logger = logging.getLogger('gerapy.selenium')
+
+
+class PooledBrowser(object):
+    """
+    Long-lived browser managed by BrowserPool
+    """
+
+    def __init__(self, driver):
+        """
+        :param driver: selenium webdriver instance
+        """
+        self.driver = driver
+        self.created_at = time.time()
+        self.pages = 0
+        self.in_use = 0
+        self.dead = False
+        # webdriver session can only drive one window at a time
+        self.lock = threading.RLock()
+        self.main_handle = None
+        self.current_handle = None
+        # entries of performance log read by a tab but belonging to other tabs, keyed by handle
+        self.performance_logs = defaultdict(list)
+        # origins visited since last reset, their storage is cleared by reset
+        self.origins = set()
+        self._pid = None
+
+    @property
+    def pid(self):
+        """
+        pid of chrome process, None if psutil is not installed or browser is remote
+        :return:
+        """
+        if self._pid is None:
+            self._pid = find_browser_pid(self.driver)
+        return self._pid
+
+    @property
+    def age(self):
+        """
+        seconds since the browser was launched
+        :return:
+        """
+        return time.time() - self.created_at
+
+    def is_alive(self):
+        """
+        check if browser session still responds
+        :return:
+        """
+        try:
+            with self.lock:
+                self.driver.execute_script('return 1')
+            return True
+        except Exception:
+            return False
+
+    def visit(self, url):
+        """
+        record origin of url to be visited, so that its storage is cleared by reset
+        even if page redirected to another origin
+        :param url:
+        :return:
+        """
+        parse_result = urlparse(url)
+        self.origins.add(f'{parse_result.scheme}://{parse_result.netloc.rpartition("@")[2]}')
+
+    def _frame_origins(self):
+        """
+        get origins of all frames of current page, like iframes of other sites
+        :return:
+        """
+        origins = set()
+        nodes = [self.driver.execute_cdp_cmd('Page.getFrameTree', {}).get('frameTree')]
+        while nodes:
+            node = nodes.pop()
+            if not node:
+                continue
+            origins.add(node['frame'].get('securityOrigin'))
+            nodes.extend(node.get('childFrames', []))
+        return origins
+
+    def reset(self):
+        """
+        reset browser state so that the next request starts clean
+        :return:
+        """
+        origins = self.origins | self._frame_origins()
+        self.origins = set()
+        self.driver.get('about:blank')
+        self.driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+        for origin in sorted(origin for origin in origins if origin and origin.startswith(('http://', 'https://'))):
+            self.driver.execute_cdp_cmd('Storage.clearDataForOrigin', {
+                'origin': origin,
+                'storageTypes': 'local_storage,indexeddb,websql,service_workers,cache_storage'
+            })
+
+    def open_tab(self):
+        """
+        open a new tab in its own browser context, so cookies and storage are isolated
+        :return: PooledTab
+        """
+        with self.lock:
+            if self.main_handle is None:
+                self.main_handle = self.current_handle = self.driver.current_window_handle
+            context_id = self.driver.execute_cdp_cmd('Target.createBrowserContext', {})['browserContextId']
+            handle = self.driver.execute_cdp_cmd('Target.createTarget', {
+                'url': 'about:blank',
+                'browserContextId': context_id
+            })['targetId']
+        return PooledTab(self, handle, context_id)
+
+    def quit(self):
+        """
+        quit browser session and driver, kill chrome if it's left behind
+        :return:
+        """
+        pid = self.pid
+        try:
+            self.driver.quit()
+        except Exception:
+            logger.debug('error quitting browser', exc_info=True)
+        if kill_tree(pid):
+            logger.debug('killed processes of browser %s left after quit', pid)
+
+
+class PooledTab(object):
+    """
+    Tab of a PooledBrowser, checked out to render a single request
+    """
+
+    def __init__(self, browser, handle, context_id):
+        """
+        :param browser: PooledBrowser the tab belongs to
+        :param handle: window handle of tab
+        :param context_id: browser context of tab
+        """
+        self.browser = browser
+        self.handle = handle
+        self.context_id = context_id
+        self.driver = TabDriver(self)
+
+    def is_alive(self):
+        """
+        check if session of browser still responds
+        :return:
+        """
+        return self.browser.is_alive()
+
+    def visit(self, url):
+        """
+        storage of tab is disposed with its browser context, no need to record origins
+        :param url:
+        :return:
+        """
+
+    def call(self, func, *args, **kwargs):
+        """
+        run webdriver command against this tab
+        :param func:
+        :param args:
+        :param kwargs:
+        :return:
+        """
+        with self.browser.lock:
+            if self.browser.current_handle != self.handle:
+                self.browser.driver.switch_to.window(self.handle)
+                self.browser.current_handle = self.handle
+            return func(*args, **kwargs)
+
+    def close(self):
+        """
+        close tab and dispose its browser context
+        :return:
+        """
+        browser = self.browser
+        with browser.lock:
+            browser.driver.execute_cdp_cmd('Target.closeTarget', {'targetId': self.handle})
+            browser.driver.execute_cdp_cmd('Target.disposeBrowserContext', {'browserContextId': self.context_id})
+            if browser.current_handle == self.handle:
+                browser.driver.switch_to.window(browser.main_handle)
+                browser.current_handle = browser.main_handle
+            browser.performance_logs.pop(self.handle, None)
+
+
+class TabDriver(object):
+    """
+    Webdriver proxy which runs every command against one tab, so that tabs of
+    a browser can be driven by several threads concurrently
+    """
+
+    def __init__(self, tab):
+        """
+        :param tab: PooledTab
+        """
+        self._tab = tab
+        self._page_load_timeout = None
+
+    def _wrap(self, result):
+        """
+        wrap elements so that their commands also run against this tab
+        :param result:
+        :return:
+        """
+        if isinstance(result, WebElement):
+            return TabElement(self._tab, result)
+        if isinstance(result, list):
+            return [self._wrap(item) for item in result]
+        return result
+
+    def __getattr__(self, name):
+        driver = self._tab.browser.driver
+        if isinstance(getattr(type(driver), name, None), property):
+            return self._wrap(self._tab.call(getattr, driver, name))
+        value = getattr(driver, name)
+        if not callable(value):
+            return value
+
+        def method(*args, **kwargs):
+            return self._wrap(self._tab.call(value, *args, **kwargs))
+
+        return method
+
+    def get_log(self, log_type):
+        """
+        get log of this tab, performance log of browser is shared by tabs, so entries
+        of other tabs are kept until they read it
+        :param log_type:
+        :return:
+        """
+        browser = self._tab.browser
+        with browser.lock:
+            entries = browser.driver.get_log(log_type)
+            if log_type != PERFORMANCE_LOG:
+                return entries
+            for entry in entries:
+                webview = parse_log_entry(entry)[0]
+                if webview:
+                    browser.performance_logs[webview].append(entry)
+            return browser.performance_logs.pop(self._tab.handle, [])
+
+    def set_page_load_timeout(self, timeout):
+        """
+        page load is waited by polling, so the timeout is kept here
+        :param timeout:
+        :return:
+        """
+        self._page_load_timeout = timeout
+
+    def _wait_loaded(self):
+        """
+        poll document state without holding the browser lock while loading
+        :return:
+        """
+        deadline = time.time() + self._page_load_timeout if self._page_load_timeout is not None else None
+        while True:
+            state = self.execute_script('return window.__gerapyStale ? "stale" : document.readyState')
+            if state == 'complete':
+                return
+            if deadline is not None and time.time() > deadline:
+                raise TimeoutException('timeout loading page of tab %s' % self._tab.handle)
+            time.sleep(0.1)
+
+    def get(self, url):
+        """
+        navigate tab to url and wait for it to load
+        :param url:
+        :return:
+        """
+        self.execute_script('window.__gerapyStale = true')
+        self.execute_cdp_cmd('Page.navigate', {'url': url})
+        self._wait_loaded()
+
+    def refresh(self):
+        """
+        reload tab and wait for it to load
+        :return:
+        """
+        self.execute_script('window.__gerapyStale = true')
+        self.execute_cdp_cmd('Page.reload', {})
+        self._wait_loaded()
+
+
+class TabElement(object):
+    """
+    WebElement proxy which runs every command against the tab it belongs to
+    """
+
+    def __init__(self, tab, element):
+        """
+        :param tab: PooledTab
+        :param element: WebElement
+        """
+        self._tab = tab
+        self._element = element
+
+    def __getattr__(self, name):
+        element = self._element
+        if isinstance(getattr(type(element), name, None), property):
+            return self._tab.call(getattr, element, name)
+        value = getattr(element, name)
+        if not callable(value):
+            return value
+
+        def method(*args, **kwargs):
+            return self._tab.call(value, *args, **kwargs)
+
+        return method
+
+
+class BrowserPool(object):
+    """
+    Pool of long-lived browsers with checkout/checkin semantics
+    """
+
+    def __init__(self, factory, size, max_pages=None, max_age=None, tabs=1, tab_setup=None, limiter=None,
+                 key=None, teardown=None):
+        """
+        :param factory: callable to launch a new webdriver
+        :param size: max number of browsers
+        :param max_pages: recycle browser after rendering this number of pages
+        :param max_age: recycle browser after this number of seconds
+        :param tabs: number of concurrent tabs of each browser
+        :param tab_setup: callable to set up the driver of a new tab
+        :param limiter: BrowserLimiter shared by pools to limit total number of browsers
+        :param key: configuration key of pool
+        :param teardown: callable with PooledBrowser called after it quit, like to remove its profile
+        """
+        self.key = key
+        self.limiter = limiter
+        self.factory = factory
+        self.size = size
+        self.max_pages = max_pages
+        self.max_age = max_age
+        self.tabs = tabs
+        self.tab_setup = tab_setup
+        self.teardown = teardown
+        self._browsers = []
+        self._total = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def _expired(self, browser):
+        """
+        check if browser should be recycled
+        :param browser:
+        :return:
+        """
+        if browser.dead:
+            return True
+        if self.max_pages and browser.pages >= self.max_pages:
+            return True
+        if self.max_age and browser.age >= self.max_age:
+            return True
+        return False
+
+    def _remove(self, browser):
+        """
+        remove browser from pool, must be called with condition acquired
+        :param browser:
+        :return:
+        """
+        self._browsers.remove(browser)
+        self._total -= 1
+        self._condition.notify_all()
+
+    def dispose(self, browser):
+        """
+        quit removed browser and tear it down
+        :param browser:
+        :return:
+        """
+        browser.quit()
+        if self.teardown:
+            try:
+                self.teardown(browser)
+            except Exception:
+                logger.exception('error tearing down browser')
+
+    def _retire(self, browsers):
+        """
+        quit removed browsers and give back their slots, must be called without condition acquired
+        :param browsers:
+        :return:
+        """
+        for browser in browsers:
+            logger.debug('recycling browser after %s pages, %.1fs', browser.pages, browser.age)
+            self.dispose(browser)
+            if self.limiter:
+                self.limiter.release()
+
+    @property
+    def empty(self):
+        """
+        pool has no browsers
+        :return:
+        """
+        return not self._total
+
+    def browsers(self):
+        """
+        snapshot of browsers in pool
+        :return:
+        """
+        with self._condition:
+            return list(self._browsers)
+
+    def recycle(self, browser):
+        """
+        stop using browser, quit it now if idle or when its last tab is checked in
+        :param browser:
+        :return:
+        """
+        with self._condition:
+            if browser not in self._browsers:
+                return
+            browser.dead = True
+            remove = not browser.in_use
+            if remove:
+                self._remove(browser)
+        if remove:
+            self._retire([browser])
+
+    def has_idle(self):
+        """
+        pool has a browser with free tab
+        :return:
+        """
+        with self._condition:
+            return any(browser.in_use < self.tabs and not self._expired(browser) for browser in self._browsers)
+
+    def evict_idle(self):
+        """
+        remove least recently used idle browser, its slot of limiter is taken over by caller
+        :return: removed PooledBrowser or None
+        """
+        with self._condition:
+            for browser in self._browsers:
+                if not browser.in_use:
+                    self._remove(browser)
+                    return browser
+
+    def _available(self, expired):
+        """
+        find least loaded browser which has a free tab, most recently used first,
+        must be called with condition acquired
+        :param expired: list to collect idle expired browsers
+        :return:
+        """
+        available = None
+        for browser in reversed(self._browsers[:]):
+            if self._expired(browser):
+                if not browser.in_use:
+                    self._remove(browser)
+                    expired.append(browser)
+                continue
+            if browser.in_use < self.tabs and (available is None or browser.in_use < available.in_use):
+                available = browser
+        return available
+
+    def checkout(self, timeout=None):
+        """
+        get a browser (or a tab of browser) from pool, launch a new one if pool is not full
+        :param timeout: seconds to wait for a free browser
+        :return: PooledBrowser or PooledTab, which has a `driver` attribute
+        """
+        deadline = time.time() + timeout if timeout is not None else None
+        if self.limiter:
+            self.limiter.touch(self)
+        while True:
+            browser, expired = None, []
+            try:
+                with self._condition:
+                    while True:
+                        if self._closed:
+                            raise RuntimeError('browser pool is closed')
+                        browser = self._available(expired)
+                        if browser is not None or self._total < self.size:
+                            break
+                        remaining = deadline - time.time() if deadline is not None else None
+                        if remaining is not None and remaining <= 0:
+                            raise TimeoutError('timeout waiting for a free browser')
+                        self._condition.wait(remaining)
+                    if browser is not None:
+                        browser.in_use += 1
+                    else:
+                        self._total += 1
+            finally:
+                self._retire(expired)
+
+            if browser is None:
+                # acquire a slot from limiter, which may evict browsers of other pools
+                if self.limiter:
+                    try:
+                        acquired = self.limiter.acquire(self, deadline)
+                    except Exception:
+                        self._unreserve()
+                        raise
+                    if not acquired:
+                        # a browser of this pool became free meanwhile
+                        self._unreserve()
+                        continue
+                # launch a new browser with the reserved slot
+                try:
+                    browser = PooledBrowser(self.factory())
+                except Exception:
+                    self._unreserve()
+                    if self.limiter:
+                        self.limiter.release()
+                    raise
+                browser.in_use = 1
+                with self._condition:
+                    self._browsers.append(browser)
+            elif browser.in_use == 1 and not browser.is_alive():
+                # check health of browser which was idle
+                self._release(browser, discard=True)
+                continue
+
+            if self.tabs <= 1:
+                return browser
+            try:
+                tab = browser.open_tab()
+                if self.tab_setup:
+                    self.tab_setup(tab.driver)
+                return tab
+            except Exception:
+                self._release(browser, discard=True)
+                raise
+
+    def prelaunch(self, setup=None):
+        """
+        launch an idle browser ahead of requests, skipped if pool or limiter is full
+        :param setup: callable to warm up the driver of new browser
+        :return: True if launched
+        """
+        with self._condition:
+            if self._closed or self._total >= self.size:
+                return False
+            self._total += 1
+        if self.limiter and not self.limiter.try_acquire():
+            self._unreserve()
+            return False
+        try:
+            browser = PooledBrowser(self.factory())
+        except Exception:
+            self._unreserve()
+            if self.limiter:
+                self.limiter.release()
+            raise
+        if setup:
+            try:
+                setup(browser.driver)
+                browser.reset()
+            except Exception:
+                logger.debug('error warming up browser', exc_info=True)
+        with self._condition:
+            self._browsers.append(browser)
+            closed = self._closed
+            if closed:
+                self._remove(browser)
+            else:
+                self._condition.notify_all()
+        if closed:
+            self._retire([browser])
+            return False
+        if self.limiter:
+            self.limiter.notify()
+        return True
+
+    def _unreserve(self):
+        """
+        give back reserved slot of a browser which was not launched
+        :return:
+        """
+        with self._condition:
+            self._total -= 1
+            self._condition.notify_all()
+
+    def _release(self, browser, discard=False):
+        """
+        release a slot of browser, quit browser if it's not used anymore
+        :param browser:
+        :param discard: stop using this browser
+        :return:
+        """
+        with self._condition:
+            browser.in_use -= 1
+            if discard:
+                browser.dead = True
+            remove = not browser.in_use and (self._closed or self._expired(browser))
+            if remove:
+                self._remove(browser)
+            else:
+                # move to the end so that recently used browser is reused first
+                self._browsers.remove(browser)
+                self._browsers.append(browser)
+                self._condition.notify_all()
+        if remove:
+            self._retire([browser])
+        elif self.limiter:
+            # browser may be evicted by other pools now
+            self.limiter.notify()
+
+    def checkin(self, lease, discard=False):
+        """
+        return browser (or tab) to pool
+        :param lease: PooledBrowser or PooledTab
+        :param discard: quit browser instead of returning it
+        :return:
+        """
+        if isinstance(lease, PooledTab):
+            browser = lease.browser
+            try:
+                lease.close()
+            except Exception:
+                logger.debug('error closing tab', exc_info=True)
+                discard = True
+        else:
+            browser = lease
+        # tabs of one browser are checked in concurrently
+        with self._condition:
+            browser.pages += 1
+        if browser is lease and not discard and not self._closed and not self._expired(browser):
+            try:
+                browser.reset()
+            except Exception:
+                logger.debug('error resetting browser', exc_info=True)
+                discard = True
+        self._release(browser, discard=discard)
+
+    def close(self):
+        """
+        quit all idle browsers, checked out browsers will be quit when checked in
+        :return:
+        """
+        with self._condition:
+            self._closed = True
+            browsers = [browser for browser in self._browsers if not browser.in_use]
+            for browser in browsers:
+                self._remove(browser)
+        self._retire(browsers)
+
+
+class BrowserLimiter(object):
+    """
+    Limit total number of browsers across pools, idle browsers of least recently
+    used pools are evicted to make room for other pools
+    """
+
+    def __init__(self, size, on_evict=None):
+        """
+        :param size: max number of browsers of all pools
+        :param on_evict: callback with pool whose browser is evicted
+        """
+        self.size = size
+        self.on_evict = on_evict
+        self._total = 0
+        self._pools = OrderedDict()
+        self._condition = threading.Condition()
+
+    def touch(self, pool):
+        """
+        mark pool as recently used
+        :param pool:
+        :return:
+        """
+        with self._condition:
+            self._pools[pool] = True
+            self._pools.move_to_end(pool)
+
+    def forget(self, pool):
+        """
+        stop tracking pool
+        :param pool:
+        :return:
+        """
+        with self._condition:
+            self._pools.pop(pool, None)
+
+    def acquire(self, pool, deadline=None):
+        """
+        acquire a slot for a new browser of pool
+        :param pool: BrowserPool which launches the browser
+        :param deadline: time to give up waiting
+        :return: False if pool itself got a free browser meanwhile
+        """
+        while True:
+            evicted = None
+            with self._condition:
+                if self._total < self.size:
+                    self._total += 1
+                    return True
+                if pool.has_idle():
+                    return False
+                for other in list(self._pools):
+                    if other is pool:
+                        continue
+                    evicted = other.evict_idle()
+                    if evicted is not None:
+                        break
+                if evicted is None:
+                    remaining = deadline - time.time() if deadline is not None else None
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError('timeout waiting for a free browser')
+                    self._condition.wait(remaining)
+                    continue
+            # slot of evicted browser is taken over
+            logger.debug('evicted idle browser of pool %s for pool %s', other.key, pool.key)
+            other.dispose(evicted)
+            if self.on_evict:
+                self.on_evict(other)
+            return True
+
+    def try_acquire(self):
+        """
+        acquire a free slot without waiting or evicting
+        :return: True if acquired
+        """
+        with self._condition:
+            if self._total < self.size:
+                self._total += 1
+                return True
+            return False
+
+    def release(self):
+        """
+        give back slot of a quit browser
+        :return:
+        """
+        with self._condition:
+            self._total -= 1
+            self._condition.notify_all()
+
+    def notify(self):
+        """
+        wake up waiters since a browser became idle
+        :return:
+        """
+        with self._condition:
+            self._condition.notify_all()
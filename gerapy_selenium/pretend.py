@@ -77,3 +77,6 @@ SCRIPTS = [
     SET_PERMISSION,
     SET_WEBGL,
 ]
+
+# all scripts in one bundle, every script is isolated so that one failure does not break others
+SCRIPT = '\n'.join(f'(() => {{\n  try {{\n{script}\n  }} catch (e) {{}}\n}})();' for script in SCRIPTS)
@@ -0,0 +1,143 @@
+import logging
+import os
+import shutil
+import tempfile
+import threading
+
+logger = logging.getLogger('gerapy.selenium')
+
+# files of running chrome, which must not be cloned into a new profile
+LOCK_FILES = ('SingletonLock', 'SingletonSocket', 'SingletonCookie', 'lockfile')
+
+# prefix of directories staged in template while persisting caches
+STAGING_PREFIX = '.gerapy-selenium-'
+
+# directories of http cache and compiled scripts, written back to template if persisted
+CACHE_DIRS = (os.path.join('Default', 'Cache'), os.path.join('Default', 'Code Cache'))
+
+
+def _copy_file(src, dst):
+    """
+    copy file by copy_file_range if available, which shares blocks copy-on-write on filesystems
+    supporting reflinks like btrfs and xfs, so that clones of large caches are cheap
+    :param src:
+    :param dst:
+    :return:
+    """
+    copy_file_range = getattr(os, 'copy_file_range', None)
+    if copy_file_range is not None:
+        try:
+            with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+                remaining = os.fstat(fsrc.fileno()).st_size
+                while remaining > 0:
+                    copied = copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                    if not copied:
+                        break
+                    remaining -= copied
+            if not remaining:
+                shutil.copystat(src, dst)
+                return
+        except OSError:
+            logger.debug('error copying %s by copy_file_range', src, exc_info=True)
+    shutil.copy2(src, dst)
+
+
+def clone_tree(src, dst):
+    """
+    copy directory tree into dst, lock files and staged directories are skipped,
+    so are files vanished while copying
+    :param src:
+    :param dst: created if not exists
+    :return:
+    """
+    for root, dirs, files in os.walk(src):
+        dirs[:] = [name for name in dirs if not name.startswith(STAGING_PREFIX)]
+        target = os.path.join(dst, os.path.relpath(root, src))
+        os.makedirs(target, exist_ok=True)
+        for name in files:
+            if name in LOCK_FILES:
+                continue
+            try:
+                _copy_file(os.path.join(root, name), os.path.join(target, name))
+            except OSError:
+                logger.debug('error copying %s', os.path.join(root, name), exc_info=True)
+
+
+class ProfileTemplate(object):
+    """
+    Profile directory cloned for every browser, so that browsers start with a warm http cache
+    instead of downloading the same scripts, styles and fonts again
+    """
+
+    def __init__(self, path, persist=False):
+        """
+        :param path: directory of template, created if not exists
+        :param persist: write caches of browsers back to template when they quit, so that
+                later browsers and crawls start with them
+        """
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.persist = persist
+        os.makedirs(self.path, exist_ok=True)
+        # template is not cloned while its caches are being replaced
+        self._lock = threading.Lock()
+        # pages rendered by browser whose caches were persisted last
+        self._persisted_pages = 0
+        # browsers quit concurrently persist one by one, so that caches of a busier browser are
+        # never overwritten by a less busy one checked before it
+        self._persist_lock = threading.Lock()
+
+    def clone(self):
+        """
+        clone template to a new profile directory
+        :return: path of profile
+        """
+        profile_dir = tempfile.mkdtemp(prefix='gerapy-selenium-')
+        with self._lock:
+            clone_tree(self.path, profile_dir)
+        logger.debug('cloned profile template %s to %s', self.path, profile_dir)
+        return profile_dir
+
+    def _save(self, profile_dir):
+        """
+        replace caches of template with caches of profile
+        :param profile_dir:
+        :return:
+        """
+        for name in CACHE_DIRS:
+            source = os.path.join(profile_dir, name)
+            if not os.path.isdir(source):
+                continue
+            target = os.path.join(self.path, name)
+            # copy beside template first, so that template is swapped in a moment
+            parent = os.path.dirname(target)
+            os.makedirs(parent, exist_ok=True)
+            staging = tempfile.mkdtemp(prefix=STAGING_PREFIX, dir=parent)
+            clone_tree(source, staging)
+            with self._lock:
+                previous = None
+                if os.path.exists(target):
+                    previous = staging + '.previous'
+                    os.rename(target, previous)
+                os.rename(staging, target)
+            if previous:
+                shutil.rmtree(previous, ignore_errors=True)
+
+    def release(self, profile_dir, pages=0):
+        """
+        remove profile of quit browser, its caches are written back to template first if persisted
+        and it rendered at least as many pages as the browser persisted last
+        :param profile_dir:
+        :param pages: number of pages rendered by browser
+        :return:
+        """
+        try:
+            if self.persist and pages:
+                with self._persist_lock:
+                    if pages >= self._persisted_pages:
+                        self._persisted_pages = pages
+                        self._save(profile_dir)
+                        logger.debug('persisted caches of profile %s to template %s', profile_dir, self.path)
+        except OSError:
+            logger.warning('error persisting caches of profile %s to template', profile_dir, exc_info=True)
+        finally:
+            shutil.rmtree(profile_dir, ignore_errors=True)
@@ -0,0 +1,201 @@
+import json
+import logging
+import threading
+from urllib.parse import urlparse
+from urllib.request import urlopen
+from selenium.webdriver.chrome.remote_connection import ChromeRemoteConnection
+from gerapy_selenium.service import ServiceDriver
+
+logger = logging.getLogger('gerapy.selenium')
+
+
+class RemoteDriver(ServiceDriver):
+    """
+    Chrome session created on a remote node, which gives back its slot when quit
+    """
+
+    node = None
+
+    def quit(self):
+        """
+        quit session and release slot of node
+        :return:
+        """
+        try:
+            super().quit()
+        finally:
+            if self.node is not None:
+                self.node.release()
+                self.node = None
+
+
+class RemoteNode(object):
+    """
+    Remote WebDriver endpoint, like Selenium Grid or a standalone chromedriver
+    """
+
+    def __init__(self, url, weight=1):
+        """
+        :param url: url of endpoint, like `http://127.0.0.1:4444`
+        :param weight: relative capacity of node
+        """
+        self.url = url.rstrip('/')
+        self.weight = weight
+        self.sessions = 0
+        self.failures = 0
+        self.down = False
+        self._lock = threading.Lock()
+
+    @property
+    def name(self):
+        """
+        name of node used in stats
+        :return:
+        """
+        return urlparse(self.url).netloc
+
+    @property
+    def load(self):
+        """
+        sessions per weight
+        :return:
+        """
+        return self.sessions / self.weight
+
+    def release(self):
+        """
+        release slot of a quit session
+        :return:
+        """
+        with self._lock:
+            self.sessions -= 1
+
+
+class RemoteNodes(object):
+    """
+    Create browser sessions on remote nodes, least loaded node by weight is chosen,
+    nodes failing health checks or session creation are removed until they recover
+    """
+
+    def __init__(self, endpoints, max_failures=3, timeout=5, stats=None):
+        """
+        :param endpoints: list of urls, or dict of url and weight
+        :param max_failures: consecutive failures before node is removed
+        :param timeout: seconds of health check
+        :param stats: crawler stats
+        """
+        if isinstance(endpoints, dict):
+            self.nodes = [RemoteNode(url, weight) for url, weight in endpoints.items()]
+        else:
+            self.nodes = [RemoteNode(url) for url in endpoints]
+        self.max_failures = max_failures
+        self.timeout = timeout
+        self.stats = stats
+        self._lock = threading.Lock()
+
+    def _candidates(self):
+        """
+        healthy nodes, least loaded first
+        :return:
+        """
+        with self._lock:
+            return sorted([node for node in self.nodes if not node.down], key=lambda node: node.load)
+
+    def _succeeded(self, node):
+        """
+        reset failures of node, add it back if it was removed
+        :param node:
+        :return:
+        """
+        with self._lock:
+            node.failures = 0
+            if node.down:
+                node.down = False
+                logger.warning('remote node %s recovered', node.url)
+
+    def _failed(self, node, reason):
+        """
+        count failure of node, remove it after too many consecutive failures
+        :param node:
+        :param reason:
+        :return:
+        """
+        if self.stats:
+            self.stats.inc_value(f'selenium/remote/{node.name}/failure_count')
+        with self._lock:
+            node.failures += 1
+            if node.failures >= self.max_failures and not node.down:
+                node.down = True
+                logger.warning('removed remote node %s after %s failures: %s', node.url, node.failures, reason)
+
+    def connect(self, options):
+        """
+        create a browser session on least loaded node, other nodes are tried if it fails
+        :param options: ChromeOptions
+        :return: RemoteDriver
+        """
+        error = None
+        candidates = self._candidates()
+        if not candidates:
+            # removed nodes are probed again, so that they recover without periodic checks
+            self._probe_down()
+            candidates = self._candidates()
+        for node in candidates:
+            with node._lock:
+                node.sessions += 1
+            try:
+                executor = ChromeRemoteConnection(node.url, keep_alive=True)
+                driver = RemoteDriver(command_executor=executor, options=options)
+            except Exception as e:
+                node.release()
+                self._failed(node, e)
+                error = e
+                continue
+            driver.node = node
+            self._succeeded(node)
+            if self.stats:
+                self.stats.inc_value(f'selenium/remote/{node.name}/session_count')
+            return driver
+        if error is None:
+            raise RuntimeError('no healthy remote node to create browser session')
+        raise RuntimeError(f'no healthy remote node to create browser session, last error: {error}')
+
+    def _healthy(self, node):
+        """
+        check status of node
+        :param node:
+        :return:
+        """
+        try:
+            with urlopen(f'{node.url}/status', timeout=self.timeout) as response:
+                value = json.loads(response.read()).get('value') or {}
+            return value.get('ready', True), value.get('message')
+        except Exception as e:
+            return False, e
+
+    def _probe_down(self):
+        """
+        check health of removed nodes, healthy ones are added back
+        :return:
+        """
+        with self._lock:
+            nodes = [node for node in self.nodes if node.down]
+        for node in nodes:
+            healthy, reason = self._healthy(node)
+            if healthy:
+                self._succeeded(node)
+            else:
+                logger.debug('remote node %s is still unhealthy: %s', node.url, reason)
+
+    def check(self):
+        """
+        check health of all nodes, nodes are removed or added back by result
+        :return:
+        """
+        for node in list(self.nodes):
+            healthy, reason = self._healthy(node)
+            if healthy:
+                self._succeeded(node)
+            else:
+                logger.debug('remote node %s is unhealthy: %s', node.url, reason)
+                self._failed(node, reason)
@@ -1,4 +1,5 @@
 from scrapy import Request
+from gerapy_selenium.actions import compile_actions
 import copy
 
 
@@ -8,8 +9,10 @@ class SeleniumRequest(Request):
     """
     
     def __init__(self, url, callback=None, wait_for=None, script=None, proxy=None,
-                 sleep=None, timeout=None, pretend=None, screenshot=None, meta=None, *args,
-                 **kwargs):
+                 sleep=None, timeout=None, pretend=None, screenshot=None, ignore_resource_types=None,
+                 blocked_urls=None, wait_until=None, http_first=None, render_check=None, selector=None,
+                 extract=None, partial=None, actions=None, scroll=None, capture=None,
+                 capture_wait=None, meta=None, *args, **kwargs):
         """
         :param url: request url
         :param callback: callback
@@ -19,9 +22,31 @@ class SeleniumRequest(Request):
         :param sleep: time to sleep after loaded, override `GERAPY_SELENIUM_SLEEP`
         :param timeout: load timeout, override `GERAPY_SELENIUM_DOWNLOAD_TIMEOUT`
         :param pretend: pretend as normal browser, override `GERAPY_SELENIUM_PRETEND`
-        :param screenshot: ignored resource types, see
-                https://miyakogi.github.io/pyppeteer/_modules/pyppeteer/page.html#Page.screenshot,
-                override `GERAPY_SELENIUM_SCREENSHOT`
+        :param screenshot: screenshot options, `True` or dict of `type`, `quality`, `clip`, `scale`,
+                `fullPage`, `selector`, `xpath` and `store`, override `GERAPY_SELENIUM_SCREENSHOT`
+        :param ignore_resource_types: resource types not to load, like `['image', 'font']`,
+                override `GERAPY_SELENIUM_IGNORE_RESOURCE_TYPES`
+        :param blocked_urls: url patterns not to load, like `['*.google-analytics.com/*']`,
+                override `GERAPY_SELENIUM_BLOCKED_URLS`
+        :param wait_until: wait until page is ready, one or list of `load`, `domcontentloaded`, `networkidle`,
+                `domquiet`, also supports dict like `{'until': 'networkidle', 'idle': 0.5, 'max': 10}`,
+                override `GERAPY_SELENIUM_WAIT_UNTIL`
+        :param http_first: fetch by scrapy downloader first, override `GERAPY_SELENIUM_HTTP_FIRST`
+        :param render_check: name of spider method to check if static response is enough,
+                override `GERAPY_SELENIUM_RENDER_CHECK`
+        :param selector: return only outerHTML of elements matching css selector as body
+        :param extract: script returning data to extract, result is saved to `response.meta['selenium_extracted']`
+                and body is left empty
+        :param partial: return current dom on timeout instead of retrying, override `GERAPY_SELENIUM_PARTIAL`
+        :param actions: list of actions run in page by one script after loaded, like
+                `[{'action': 'click', 'selector': '.more'}, {'action': 'wait_for', 'selector': '.item'}]`,
+                results of `evaluate` actions are saved to `response.meta['selenium_actions']`
+        :param scroll: scroll until page stops growing, `True` or dict of `items`, `max_scrolls`, `max_time`,
+                `idle` and `snapshot`
+        :param capture: regex or list of regex of urls, network responses matching them are saved to
+                `response.meta['selenium_captured']`
+        :param capture_wait: end render as soon as every pattern of `capture` is matched by a response,
+                instead of waiting for dom
         :param args:
         :param kwargs:
         """
@@ -37,6 +62,27 @@ class SeleniumRequest(Request):
         self.timeout = selenium_meta.get('timeout') if selenium_meta.get('timeout') is not None else timeout
         self.screenshot = selenium_meta.get('screenshot') if selenium_meta.get(
             'screenshot') is not None else screenshot
+        self.ignore_resource_types = selenium_meta.get('ignore_resource_types') if selenium_meta.get(
+            'ignore_resource_types') is not None else ignore_resource_types
+        self.blocked_urls = selenium_meta.get('blocked_urls') if selenium_meta.get(
+            'blocked_urls') is not None else blocked_urls
+        self.wait_until = selenium_meta.get('wait_until') if selenium_meta.get(
+            'wait_until') is not None else wait_until
+        self.http_first = selenium_meta.get('http_first') if selenium_meta.get(
+            'http_first') is not None else http_first
+        self.render_check = selenium_meta.get('render_check') if selenium_meta.get(
+            'render_check') is not None else render_check
+        self.selector = selenium_meta.get('selector') if selenium_meta.get('selector') is not None else selector
+        self.extract = selenium_meta.get('extract') if selenium_meta.get('extract') is not None else extract
+        self.partial = selenium_meta.get('partial') if selenium_meta.get('partial') is not None else partial
+        self.actions = selenium_meta.get('actions') if selenium_meta.get('actions') is not None else actions
+        if self.actions:
+            # validate actions early
+            compile_actions(self.actions)
+        self.scroll = selenium_meta.get('scroll') if selenium_meta.get('scroll') is not None else scroll
+        self.capture = selenium_meta.get('capture') if selenium_meta.get('capture') is not None else capture
+        self.capture_wait = selenium_meta.get('capture_wait') if selenium_meta.get(
+            'capture_wait') is not None else capture_wait
         
         selenium_meta = meta.setdefault('selenium', {})
         selenium_meta['wait_for'] = self.wait_for
@@ -46,5 +92,17 @@ class SeleniumRequest(Request):
         selenium_meta['pretend'] = self.pretend
         selenium_meta['timeout'] = self.timeout
         selenium_meta['screenshot'] = self.screenshot
+        selenium_meta['ignore_resource_types'] = self.ignore_resource_types
+        selenium_meta['blocked_urls'] = self.blocked_urls
+        selenium_meta['wait_until'] = self.wait_until
+        selenium_meta['http_first'] = self.http_first
+        selenium_meta['render_check'] = self.render_check
+        selenium_meta['selector'] = self.selector
+        selenium_meta['extract'] = self.extract
+        selenium_meta['partial'] = self.partial
+        selenium_meta['actions'] = self.actions
+        selenium_meta['scroll'] = self.scroll
+        selenium_meta['capture'] = self.capture
+        selenium_meta['capture_wait'] = self.capture_wait
         
         super().__init__(url, callback, meta=meta, *args, **kwargs)
@@ -0,0 +1,173 @@
+import base64
+import hashlib
+import json
+import logging
+import os
+import threading
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+from gerapy_selenium.cache import request_fingerprint
+
+logger = logging.getLogger('gerapy.selenium')
+
+FORMATS = ('png', 'jpeg', 'webp')
+EXTENSIONS = {'png': 'png', 'jpeg': 'jpg', 'webp': 'webp'}
+
+# size of base64 chunk decoded at a time, multiple of 4
+CHUNK_SIZE = 4 * 64 * 1024
+
+# bounding rect of element found by css selector or xpath, relative to document
+RECT_SCRIPT = '''
+const [selector, xpath] = arguments;
+const element = selector ? document.querySelector(selector) :
+  document.evaluate(xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+if (!element) return null;
+const rect = element.getBoundingClientRect();
+return {x: rect.left + window.scrollX, y: rect.top + window.scrollY, width: rect.width, height: rect.height};
+'''
+
+VIEWPORT_SCRIPT = 'return [window.innerWidth, window.innerHeight]'
+
+
+def _build_params(options, clip=None, viewport=None):
+    """
+    build params of Page.captureScreenshot
+    :param options: screenshot options
+    :param clip: area to capture, found by element or full page
+    :param viewport: width and height of viewport, needed to scale without clip
+    :return:
+    """
+    image_type = options.get('type', 'png')
+    if image_type not in FORMATS:
+        raise ValueError(f'unknown screenshot type {image_type}, should be one of {FORMATS}')
+    params = {'format': image_type}
+    if options.get('quality') is not None and image_type != 'png':
+        params['quality'] = int(options['quality'])
+    clip = clip or options.get('clip')
+    if clip:
+        params['clip'] = {'x': clip['x'], 'y': clip['y'], 'width': clip['width'], 'height': clip['height'],
+                          'scale': options.get('scale', clip.get('scale', 1))}
+        params['captureBeyondViewport'] = True
+    elif viewport:
+        width, height = viewport
+        params['clip'] = {'x': 0, 'y': 0, 'width': width, 'height': height, 'scale': options['scale']}
+    return params
+
+
+def _full_page_clip(metrics):
+    """
+    get clip of whole page from result of Page.getLayoutMetrics
+    :param metrics:
+    :return:
+    """
+    size = metrics.get('cssContentSize') or metrics['contentSize']
+    return {'x': 0, 'y': 0, 'width': size['width'], 'height': size['height']}
+
+
+def _check_clip(clip, options):
+    """
+    check element of screenshot is found
+    :param clip: bounding rect of element
+    :param options:
+    :return:
+    """
+    if not clip:
+        raise ValueError(f'element of screenshot not found by {options}')
+    return clip
+
+
+def capture_params(browser, options):
+    """
+    get params of Page.captureScreenshot from screenshot options
+    :param browser: webdriver
+    :param options: dict of type, quality, clip, scale, fullPage, selector and xpath
+    :return:
+    """
+    clip, viewport = None, None
+    if options.get('selector') or options.get('xpath'):
+        clip = _check_clip(browser.execute_script(RECT_SCRIPT, options.get('selector'), options.get('xpath')),
+                           options)
+    elif options.get('fullPage'):
+        clip = _full_page_clip(browser.execute_cdp_cmd('Page.getLayoutMetrics', {}))
+    elif options.get('scale') is not None and not options.get('clip'):
+        viewport = browser.execute_script(VIEWPORT_SCRIPT)
+    return _build_params(options, clip, viewport)
+
+
+def capture(browser, options):
+    """
+    capture screenshot by Page.captureScreenshot
+    :param browser: webdriver
+    :param options: screenshot options
+    :return: base64 encoded image
+    """
+    params = capture_params(browser, options)
+    logger.debug('capturing screenshot using params %s', params)
+    return browser.execute_cdp_cmd('Page.captureScreenshot', params)['data']
+
+
+async def capture_async(page, options):
+    """
+    capture screenshot of page of asyncio backend
+    :param page: gerapy_selenium.cdp.Page
+    :param options: screenshot options
+    :return: base64 encoded image
+    """
+    clip, viewport = None, None
+    if options.get('selector') or options.get('xpath'):
+        clip = _check_clip(await page.execute_script(RECT_SCRIPT, options.get('selector'), options.get('xpath')),
+                           options)
+    elif options.get('fullPage'):
+        clip = _full_page_clip(await page.send('Page.getLayoutMetrics'))
+    elif options.get('scale') is not None and not options.get('clip'):
+        viewport = await page.execute_script(VIEWPORT_SCRIPT)
+    params = _build_params(options, clip, viewport)
+    logger.debug('capturing screenshot using params %s', params)
+    return (await page.send('Page.captureScreenshot', params))['data']
+
+
+class ScreenshotStore(object):
+    """
+    Write screenshots to a local directory, so that only their paths are kept in memory
+    """
+
+    def __init__(self, uri):
+        """
+        :param uri: directory path or file:// uri
+        """
+        if '://' in uri:
+            parse_result = urlparse(uri)
+            if parse_result.scheme != 'file':
+                raise ValueError(f'unsupported screenshot store {uri}, only local path is supported')
+            uri = url2pathname(parse_result.path)
+        self.basedir = os.path.abspath(uri)
+
+    def path(self, spider, request, options):
+        """
+        get file path of screenshot of request, named by fingerprint of request and screenshot options,
+        so that screenshots of the same url with different options are kept apart
+        :param spider:
+        :param request:
+        :param options: screenshot options
+        :return:
+        """
+        name = hashlib.sha1(request_fingerprint(request).encode())
+        name.update(json.dumps(options, sort_keys=True, default=str).encode())
+        name = name.hexdigest()
+        return os.path.join(self.basedir, spider.name, name[:2], f'{name}.{EXTENSIONS[options.get("type", "png")]}')
+
+    def persist(self, path, data):
+        """
+        decode base64 data to file chunk by chunk
+        :param path:
+        :param data: base64 encoded image
+        :return: number of bytes written
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        size = 0
+        temp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'wb') as f:
+            for start in range(0, len(data), CHUNK_SIZE):
+                size += f.write(base64.b64decode(data[start:start + CHUNK_SIZE]))
+        os.replace(temp_path, path)
+        return size
@@ -0,0 +1,108 @@
+import logging
+import time
+from gerapy_selenium.actions import PAGE_SCRIPT, run_function
+
+logger = logging.getLogger('gerapy.selenium')
+
+# scroll to bottom and wait until number of items or height of document grows, or idle timeout
+SCROLL_FUNCTION = '''async function (selector, idle) {
+  const measure = () => selector ? document.querySelectorAll(selector).length : document.scrollingElement.scrollHeight;
+  const before = measure();
+  window.scrollTo(0, document.scrollingElement.scrollHeight);
+  const deadline = Date.now() + idle * 1000;
+  while (measure() === before && Date.now() < deadline) {
+    await new Promise(resolve => setTimeout(resolve, 100));
+  }
+  return {before: before, after: measure()};
+}'''
+
+DEFAULT_OPTIONS = {
+    # css selector of items to count, height of document is measured if not set
+    'items': None,
+    # max number of scrolls
+    'max_scrolls': 20,
+    # max seconds of scrolling, defaults to timeout of request
+    'max_time': None,
+    # seconds to wait for page to grow after every scroll
+    'idle': 1,
+    # send a snapshot every this number of scrolls, 0 means no snapshot
+    'snapshot': 0,
+}
+
+
+def scroll_options(scroll, timeout):
+    """
+    get scroll options of request
+    :param scroll: `True` or dict of options
+    :param timeout: timeout of request
+    :return:
+    """
+    options = dict(DEFAULT_OPTIONS)
+    if isinstance(scroll, dict):
+        unknown = set(scroll) - set(DEFAULT_OPTIONS)
+        if unknown:
+            raise ValueError(f'unknown scroll options {", ".join(sorted(unknown))}')
+        options.update(scroll)
+    if options['max_time'] is None:
+        options['max_time'] = timeout
+    return options
+
+
+def _grew(result, scrolls, options, snapshot):
+    """
+    handle result of a scroll
+    :param result: result of SCROLL_FUNCTION
+    :param scrolls: number of scrolls
+    :param options:
+    :param snapshot: callable with number of scrolls
+    :return: whether page grew
+    """
+    if result.get('error'):
+        logger.warning('error scrolling: %s', result['error'])
+        return False
+    if result['after'] == result['before']:
+        return False
+    if snapshot and options['snapshot'] and scrolls % options['snapshot'] == 0:
+        snapshot(scrolls)
+    return True
+
+
+def scroll(browser, options, snapshot=None):
+    """
+    scroll to bottom until page stops growing
+    :param browser: webdriver
+    :param options: result of scroll_options
+    :param snapshot: callable with number of scrolls, called every `snapshot` scrolls
+    :return: number of scrolls
+    """
+    deadline = time.time() + options['max_time']
+    scrolls = 0
+    while scrolls < options['max_scrolls'] and time.time() < deadline:
+        result = run_function(browser, SCROLL_FUNCTION, (options['items'], options['idle']),
+                              options['idle'] + options['max_time'])
+        scrolls += 1
+        if not _grew(result, scrolls, options, snapshot):
+            break
+    return scrolls
+
+
+async def scroll_async(page, options, snapshot=None):
+    """
+    scroll to bottom until page stops growing, for page of asyncio backend
+    :param page: gerapy_selenium.cdp.Page
+    :param options: result of scroll_options
+    :param snapshot: coroutine function with number of scrolls, awaited every `snapshot` scrolls
+    :return: number of scrolls
+    """
+    script = PAGE_SCRIPT % SCROLL_FUNCTION
+    deadline = time.time() + options['max_time']
+    scrolls = 0
+    snapshots = []
+    while scrolls < options['max_scrolls'] and time.time() < deadline:
+        result = await page.execute_script(script, options['items'], options['idle'])
+        scrolls += 1
+        if not _grew(result, scrolls, options, snapshots.append if snapshot else None):
+            break
+        while snapshots:
+            await snapshot(snapshots.pop())
+    return scrolls
@@ -0,0 +1,142 @@
+import itertools
+import logging
+import threading
+from selenium import webdriver
+from selenium.webdriver import ChromeOptions
+from selenium.webdriver.chrome.remote_connection import ChromeRemoteConnection
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.remote.command import Command
+
+try:
+    from selenium.webdriver.common.driver_finder import DriverFinder
+except ImportError:
+    # selenium without selenium manager, chromedriver is found in PATH
+    DriverFinder = None
+
+logger = logging.getLogger('gerapy.selenium')
+
+
+class ServiceDriver(webdriver.Remote):
+    """
+    Chrome session created against a shared chromedriver service
+    """
+
+    def execute_cdp_cmd(self, cmd, cmd_args):
+        """
+        execute chrome devtools protocol command
+        :param cmd: command name
+        :param cmd_args: command args
+        :return:
+        """
+        return self.execute('executeCdpCommand', {'cmd': cmd, 'params': cmd_args})['value']
+
+    def get_log(self, log_type):
+        """
+        get log of session, like performance log
+        :param log_type: type of log
+        :return:
+        """
+        return self.execute(Command.GET_LOG, {'type': log_type})['value']
+
+
+class DriverServices(object):
+    """
+    Long-running chromedriver processes shared by all browsers
+    """
+
+    def __init__(self, count, executable_path=None):
+        """
+        :param count: number of chromedriver processes
+        :param executable_path: path of chromedriver
+        """
+        self.count = count
+        self.executable_path = executable_path
+        self.driver_path = None
+        self.browser_path = None
+        self._services = []
+        # pids of chromedriver processes started, including restarted ones
+        self.pids = set()
+        self._cycle = None
+        self._lock = threading.Lock()
+
+    def _find_paths(self):
+        """
+        find chromedriver and chrome like webdriver.Chrome does, by selenium manager if
+        chromedriver is not in PATH
+        :return: tuple of driver path and browser path
+        """
+        if self.executable_path:
+            return self.executable_path, None
+        if DriverFinder is None or not hasattr(DriverFinder, 'get_driver_path'):
+            return 'chromedriver', None
+        service = Service()
+        finder = DriverFinder(service, ChromeOptions())
+        return service.env_path() or finder.get_driver_path(), finder.get_browser_path() or None
+
+    def _create_service(self):
+        """
+        start a new chromedriver process
+        :return:
+        """
+        service = Service(self.driver_path)
+        service.start()
+        self.pids.add(service.process.pid)
+        logger.debug('started chromedriver service at %s', service.service_url)
+        return service
+
+    def start(self):
+        """
+        start chromedriver processes
+        :return:
+        """
+        with self._lock:
+            if self._services:
+                return
+            if self.driver_path is None:
+                self.driver_path, self.browser_path = self._find_paths()
+            self._services = [self._create_service() for _ in range(self.count)]
+            self._cycle = itertools.cycle(range(self.count))
+
+    def _next_service(self):
+        """
+        get next service in round robin, restart it if its process died
+        :return:
+        """
+        self.start()
+        with self._lock:
+            index = next(self._cycle)
+            service = self._services[index]
+            if not service.is_connectable():
+                logger.warning('chromedriver service at %s is down, restarting', service.service_url)
+                try:
+                    service.stop()
+                except Exception:
+                    logger.debug('error stopping chromedriver service', exc_info=True)
+                service = self._services[index] = self._create_service()
+            return service
+
+    def connect(self, options):
+        """
+        create a new browser session over a keep-alive connection to service
+        :param options: ChromeOptions
+        :return: ServiceDriver
+        """
+        service = self._next_service()
+        if self.browser_path and not options.binary_location:
+            # chrome downloaded by selenium manager
+            options.binary_location = self.browser_path
+        executor = ChromeRemoteConnection(service.service_url, keep_alive=True)
+        return ServiceDriver(command_executor=executor, options=options)
+
+    def stop(self):
+        """
+        stop all chromedriver processes
+        :return:
+        """
+        with self._lock:
+            services, self._services = self._services, []
+        for service in services:
+            try:
+                service.stop()
+            except Exception:
+                logger.debug('error stopping chromedriver service', exc_info=True)
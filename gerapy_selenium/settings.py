@@ -25,6 +25,103 @@ GERAPY_SELENIUM_DISABLE_SETUID_SANDBOX = True
 GERAPY_SELENIUM_DISABLE_GPU = True
 
 GERAPY_SELENIUM_SCREENSHOT = None
+# directory to write screenshots to, only paths are kept in meta if set
+GERAPY_SELENIUM_SCREENSHOT_STORE = None
+# resource types not to load, like image, media, font, stylesheet
+GERAPY_SELENIUM_IGNORE_RESOURCE_TYPES = []
+# url patterns not to load, wildcard `*` is supported
+GERAPY_SELENIUM_BLOCKED_URLS = []
 GERAPY_SELENIUM_SLEEP = 1
 
+# wait strategies after page loaded, one or list of load, domcontentloaded, networkidle, domquiet,
+# global sleep is skipped if it's set
+GERAPY_SELENIUM_WAIT_UNTIL = None
+# seconds without network activity or dom mutation to be considered idle
+GERAPY_SELENIUM_WAIT_IDLE = 0.5
+# max seconds to wait, defaults to download timeout
+GERAPY_SELENIUM_WAIT_MAX = None
 
+# browser pool, size defaults to CONCURRENT_REQUESTS
+GERAPY_SELENIUM_POOL_SIZE = None
+# recycle browser after rendering this number of pages
+GERAPY_SELENIUM_BROWSER_MAX_PAGES = 100
+# recycle browser after this number of seconds
+GERAPY_SELENIUM_BROWSER_MAX_AGE = 600
+# number of concurrent requests rendered by tabs of one browser
+GERAPY_SELENIUM_TABS_PER_BROWSER = 1
+# total browsers of all pools keyed by proxy, defaults to browsers of one pool
+GERAPY_SELENIUM_MAX_BROWSERS = None
+
+# number of render workers, defaults to the size of browser pool
+GERAPY_SELENIUM_MAX_WORKERS = None
+# number of requests waiting for a free worker before further requests are held back
+GERAPY_SELENIUM_MAX_QUEUE_SIZE = 0
+
+# number of shared chromedriver processes, 0 means every browser spawns its own chromedriver
+GERAPY_SELENIUM_DRIVER_SERVICES = 1
+
+# remote webdriver endpoints like selenium grid or chromedriver urls, list of urls or dict of url and weight
+GERAPY_SELENIUM_REMOTE_ENDPOINTS = None
+# seconds between health checks of remote nodes, 0 means no periodic check
+GERAPY_SELENIUM_REMOTE_CHECK_INTERVAL = 30
+# seconds of a health check request
+GERAPY_SELENIUM_REMOTE_CHECK_TIMEOUT = 5
+# consecutive failed health checks or session creations before a remote node is removed
+GERAPY_SELENIUM_REMOTE_MAX_FAILURES = 3
+
+# fetch by scrapy downloader first, render only if static html is not enough
+GERAPY_SELENIUM_HTTP_FIRST = False
+# name of spider method or callable to check if static response is enough, defaults to matching `wait_for`
+GERAPY_SELENIUM_RENDER_CHECK = None
+# number of http attempts of a domain and path pattern before deciding
+GERAPY_SELENIUM_HTTP_FIRST_MIN_SAMPLES = 5
+# min ratio of sufficient static html to keep fetching a domain and path pattern by http first
+GERAPY_SELENIUM_HTTP_FIRST_THRESHOLD = 0.5
+
+# cache of rendered responses
+GERAPY_SELENIUM_CACHE_ENABLED = False
+GERAPY_SELENIUM_CACHE_DIR = 'selenium-cache'
+GERAPY_SELENIUM_CACHE_STORAGE = 'gerapy_selenium.cache.FilesystemCacheStorage'
+# seconds before cached response expires, 0 means never
+GERAPY_SELENIUM_CACHE_EXPIRATION_SECS = 0
+GERAPY_SELENIUM_CACHE_GZIP = True
+
+# chrome executable of asyncio backend, found in PATH if not set
+GERAPY_SELENIUM_CHROME_PATH = None
+
+# recycle browsers whose processes take more memory than this number of MB, requires psutil
+GERAPY_SELENIUM_BROWSER_MAX_RSS = None
+# seconds between memory checks of browsers
+GERAPY_SELENIUM_WATCHDOG_INTERVAL = 30
+# kill browsers left behind by this crawl when spider closed and by crashed crawls when spider opened
+GERAPY_SELENIUM_REAPER = True
+
+# number of browsers launched when spider opened, before requests come
+GERAPY_SELENIUM_PRELAUNCH = 0
+# seconds between prelaunching browsers
+GERAPY_SELENIUM_PRELAUNCH_INTERVAL = 0.5
+# url visited by prelaunched browsers to warm up caches
+GERAPY_SELENIUM_WARMUP_URL = None
+
+# adapt number of requests of every domain rendered concurrently by render latency
+GERAPY_SELENIUM_THROTTLE_ENABLED = False
+# seconds of rendering a page, domains rendered slower get fewer slots
+GERAPY_SELENIUM_THROTTLE_TARGET_LATENCY = 10
+GERAPY_SELENIUM_THROTTLE_START_SLOTS = 2
+GERAPY_SELENIUM_THROTTLE_MIN_SLOTS = 1
+# max slots of a domain, defaults to the size of browser pool
+GERAPY_SELENIUM_THROTTLE_MAX_SLOTS = None
+
+# return current dom when loading or waiting for element timed out, instead of retrying
+GERAPY_SELENIUM_PARTIAL = False
+# status of response with partial content
+GERAPY_SELENIUM_PARTIAL_STATUS = 200
+
+# launch browsers with performance log, so that requests can capture network responses, only needed by
+# the default middleware
+GERAPY_SELENIUM_CAPTURE_ENABLED = False
+
+# profile directory cloned for every browser, so that browsers start with its warm http cache
+GERAPY_SELENIUM_PROFILE_TEMPLATE = None
+# write caches of browsers back to profile template when they quit, so that later crawls start with them
+GERAPY_SELENIUM_PROFILE_PERSIST = False
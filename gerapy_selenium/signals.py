@@ -0,0 +1,2 @@
+# sent with intermediate response of a scrolling page, with args `response`, `scrolls` and `spider`
+scroll_snapshot = object()
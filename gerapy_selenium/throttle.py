@@ -0,0 +1,117 @@
+import logging
+import math
+from collections import deque
+
+logger = logging.getLogger('gerapy.selenium')
+
+
+class DomainSlot(object):
+    """
+    Render slots of a domain
+    """
+
+    def __init__(self, limit):
+        """
+        :param limit: number of requests of domain rendered concurrently, float to adjust smoothly
+        """
+        self.limit = limit
+        self.active = 0
+        self.latency = None
+        self.waiters = deque()
+
+
+class RenderThrottle(object):
+    """
+    Adapt number of requests of every domain rendered concurrently by render latency like AutoThrottle,
+    so that slow domains don't hold all browsers: slots of a domain grow while its pages are rendered
+    faster than target latency, shrink when slower, and are halved on timeouts or errors
+    """
+
+    def __init__(self, target_latency, start_slots, min_slots, max_slots, stats=None):
+        """
+        :param target_latency: seconds of rendering a page which is considered as healthy
+        :param start_slots: initial slots of a domain
+        :param min_slots: min slots of a domain
+        :param max_slots: max slots of a domain
+        :param stats: crawler stats
+        """
+        self.target_latency = target_latency
+        self.min_slots = min_slots
+        self.max_slots = max(max_slots, min_slots)
+        self.start_slots = min(max(start_slots, min_slots), self.max_slots)
+        self.stats = stats
+        self.slots = {}
+        self.waiting = 0
+
+    def _slot(self, domain):
+        slot = self.slots.get(domain)
+        if slot is None:
+            slot = self.slots[domain] = DomainSlot(self.start_slots)
+        return slot
+
+    def limit(self, domain):
+        """
+        get number of slots of domain
+        :param domain:
+        :return:
+        """
+        return max(self.min_slots, math.floor(self._slot(domain).limit))
+
+    def acquire(self, domain, waiter):
+        """
+        take a slot of domain, or queue waiter if all slots are taken
+        :param domain:
+        :param waiter: callable called without args when slot is granted later
+        :return: True if slot is taken now
+        """
+        slot = self._slot(domain)
+        if slot.active < self.limit(domain):
+            slot.active += 1
+            return True
+        slot.waiters.append(waiter)
+        self.waiting += 1
+        if self.stats:
+            self.stats.inc_value('selenium/throttle/delayed_count')
+            self.stats.max_value('selenium/throttle/max_waiting', self.waiting)
+        return False
+
+    def _adjust(self, domain, slot, latency, ok):
+        """
+        adjust slots by outcome of a render
+        :param domain:
+        :param slot:
+        :param latency: seconds of rendering
+        :param ok: False if render timed out or failed
+        :return:
+        """
+        previous = self.limit(domain)
+        if not ok:
+            limit = slot.limit / 2
+            if self.stats:
+                self.stats.inc_value('selenium/throttle/backoff_count')
+        else:
+            slot.latency = latency if slot.latency is None else (slot.latency + latency) / 2
+            # move half way towards slots which keep latency at target, grow by at most one slot a time
+            desired = slot.limit * self.target_latency / max(slot.latency, 0.001)
+            limit = (slot.limit + min(desired, slot.limit + 1)) / 2
+        slot.limit = min(max(limit, self.min_slots), self.max_slots)
+        current = self.limit(domain)
+        if current != previous:
+            logger.debug('render slots of %s: %s => %s, latency %s', domain, previous, current, slot.latency)
+
+    def release(self, domain, latency=None, ok=True):
+        """
+        give back slot of domain and wake up waiters
+        :param domain:
+        :param latency: seconds of rendering, None if not measured
+        :param ok: False if render timed out or failed
+        :return:
+        """
+        slot = self._slot(domain)
+        slot.active -= 1
+        if latency is not None or not ok:
+            self._adjust(domain, slot, latency, ok)
+        while slot.waiters and slot.active < self.limit(domain):
+            slot.active += 1
+            self.waiting -= 1
+            slot.waiters.popleft()()
@@ -0,0 +1,122 @@
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+PERCENTILES = (50, 95, 99)
+
+
+class Histogram(object):
+    """
+    Latency histogram of exponential buckets, percentiles are estimated by upper bound of buckets
+    """
+
+    def __init__(self, start=0.001, factor=1.1, size=160):
+        """
+        :param start: upper bound of first bucket in seconds
+        :param factor: ratio of upper bounds of adjacent buckets, which is the max error of percentiles
+        :param size: number of buckets, last bucket is about 4 hours with default args
+        """
+        self.bounds = [start * factor ** index for index in range(size)]
+        self.counts = [0] * (size + 1)
+        self.count = 0
+        self.max = 0
+
+    def add(self, value):
+        """
+        add a sample
+        :param value: seconds
+        :return:
+        """
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def percentile(self, percent):
+        """
+        estimate percentile of samples
+        :param percent: like 95
+        :return: seconds
+        """
+        target = max(math.ceil(self.count * percent / 100), 1)
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= target:
+                return min(self.bounds[index], self.max) if index < len(self.bounds) else self.max
+        return self.max
+
+
+class RenderTimings(object):
+    """
+    Seconds spent in every phase of rendering one request
+    """
+
+    def __init__(self):
+        self.start = time.time()
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name):
+        """
+        time a phase, phases entered several times are summed
+        :param name:
+        :return:
+        """
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0) + time.time() - start
+
+    def finish(self):
+        """
+        get timings of all phases and total
+        :return:
+        """
+        self.phases['total'] = time.time() - self.start
+        return dict(self.phases)
+
+
+class PhaseStats(object):
+    """
+    Push count, total, max and percentiles of every phase to crawler stats
+    """
+
+    def __init__(self, stats, prefix='selenium/timing'):
+        """
+        :param stats: crawler stats
+        :param prefix: prefix of stats keys
+        """
+        self.stats = stats
+        self.prefix = prefix
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def record(self, name, elapsed):
+        """
+        record seconds of a phase
+        :param name:
+        :param elapsed:
+        :return:
+        """
+        with self.lock:
+            histogram = self.histograms.setdefault(name, Histogram())
+            histogram.add(elapsed)
+            percentiles = {percent: histogram.percentile(percent) for percent in PERCENTILES}
+        key = f'{self.prefix}/{name}'
+        self.stats.inc_value(f'{key}/count')
+        self.stats.inc_value(f'{key}/total', elapsed)
+        self.stats.max_value(f'{key}/max', elapsed)
+        for percent, value in percentiles.items():
+            self.stats.set_value(f'{key}/p{percent}', value)
+
+    def record_all(self, timings):
+        """
+        record timings of a request
+        :param timings: dict of phase and seconds
+        :return:
+        """
+        for name, elapsed in timings.items():
+            self.record(name, elapsed)
@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger('gerapy.selenium')
+
+# track in-flight xhr/fetch requests and dom mutations of page, registered on every new document
+TRACKER_SCRIPT = '''
+(() => {
+  const state = window.__gerapyTracker = {inflight: 0, lastActivity: Date.now(), lastMutation: Date.now()};
+  const touch = () => { state.lastActivity = Date.now() };
+  const send = XMLHttpRequest.prototype.send;
+  XMLHttpRequest.prototype.send = function () {
+    state.inflight++;
+    touch();
+    this.addEventListener('loadend', () => { state.inflight--; touch() });
+    return send.apply(this, arguments);
+  };
+  if (window.fetch) {
+    const fetch = window.fetch;
+    window.fetch = function () {
+      state.inflight++;
+      touch();
+      return fetch.apply(this, arguments).finally(() => { state.inflight--; touch() });
+    };
+  }
+  new MutationObserver(() => { state.lastMutation = Date.now() }).observe(document, {
+    childList: true, subtree: true, attributes: true, characterData: true
+  });
+})();
+'''
+
+STATE_SCRIPT = '''
+const state = window.__gerapyTracker;
+const now = Date.now();
+return {
+  readyState: document.readyState,
+  inflight: state ? state.inflight : 0,
+  resources: performance.getEntriesByType('resource').length,
+  sinceActivity: state ? (now - state.lastActivity) / 1000 : null,
+  sinceMutation: state ? (now - state.lastMutation) / 1000 : null
+};
+'''
+
+LOAD = 'load'
+DOM_CONTENT_LOADED = 'domcontentloaded'
+NETWORK_IDLE = 'networkidle'
+DOM_QUIET = 'domquiet'
+WAIT_UNTIL_CHOICES = (LOAD, DOM_CONTENT_LOADED, NETWORK_IDLE, DOM_QUIET)
+# conditions which need TRACKER_SCRIPT in page
+TRACKED_CHOICES = (NETWORK_IDLE, DOM_QUIET)
+
+
+def needs_tracker(conditions):
+    """
+    check if any of conditions needs TRACKER_SCRIPT in page
+    :param conditions: list of WAIT_UNTIL_CHOICES
+    :return:
+    """
+    return any(condition in TRACKED_CHOICES for condition in conditions or ())
+
+
+def _ready(condition, state, idle, resources_idle):
+    """
+    check if condition is satisfied by state of page
+    :param condition: one of WAIT_UNTIL_CHOICES
+    :param state: result of STATE_SCRIPT
+    :param idle: seconds without activity
+    :param resources_idle: seconds since number of loaded resources changed
+    :return:
+    """
+    if condition == DOM_CONTENT_LOADED:
+        return state['readyState'] in ('interactive', 'complete')
+    if condition == LOAD:
+        return state['readyState'] == 'complete'
+    if condition == NETWORK_IDLE:
+        since_activity = state['sinceActivity']
+        return state['readyState'] == 'complete' and not state['inflight'] and resources_idle >= idle and \
+               (since_activity is None or since_activity >= idle)
+    if condition == DOM_QUIET:
+        since_mutation = state['sinceMutation']
+        return since_mutation is None or since_mutation >= idle
+    raise ValueError(f'unknown wait condition {condition}, should be one of {WAIT_UNTIL_CHOICES}')
+
+
+def wait_until(browser, conditions, idle=0.5, timeout=10, interval=0.1):
+    """
+    wait until all conditions are satisfied or timeout
+    :param browser: webdriver
+    :param conditions: list of WAIT_UNTIL_CHOICES
+    :param idle: seconds without network activity or dom mutation to be considered idle
+    :param timeout: max seconds to wait
+    :param interval: seconds between polls
+    :return: tuple of (seconds waited, whether conditions were satisfied)
+    """
+    start = time.time()
+    resources, resources_changed = None, start
+    while True:
+        state = browser.execute_script(STATE_SCRIPT)
+        now = time.time()
+        if state['resources'] != resources:
+            resources, resources_changed = state['resources'], now
+        if all(_ready(condition, state, idle, now - resources_changed) for condition in conditions):
+            return now - start, True
+        if now - start >= timeout:
+            return now - start, False
+        time.sleep(interval)
+
+
+async def wait_until_async(page, conditions, idle=0.5, timeout=10, interval=0.1):
+    """
+    wait until all conditions are satisfied or timeout, for page of asyncio backend
+    :param page: gerapy_selenium.cdp.Page
+    :param conditions: list of WAIT_UNTIL_CHOICES
+    :param idle: seconds without network activity or dom mutation to be considered idle
+    :param timeout: max seconds to wait
+    :param interval: seconds between polls
+    :return: tuple of (seconds waited, whether conditions were satisfied)
+    """
+    start = time.time()
+    resources, resources_changed = None, start
+    while True:
+        state = await page.execute_script(STATE_SCRIPT)
+        now = time.time()
+        if state['resources'] != resources:
+            resources, resources_changed = state['resources'], now
+        if all(_ready(condition, state, idle, now - resources_changed) for condition in conditions):
+            return now - start, True
+        if now - start >= timeout:
+            return now - start, False
+        await asyncio.sleep(interval)
@@ -0,0 +1,151 @@
+import logging
+import os
+import uuid
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger('gerapy.selenium')
+
+# switch added to chrome launched by this process, so that leftover browsers can be found
+OWNER_SWITCH = '--gerapy-selenium-owner'
+
+
+def owner_token():
+    """
+    token marking browsers of one middleware, pid of process and a random part, so that
+    crawls running in the same process are told apart
+    :return:
+    """
+    return f'{os.getpid()}.{uuid.uuid4().hex}'
+
+
+def owner_argument(token):
+    """
+    launch argument marking chrome as owned by token
+    :param token: owner token of middleware
+    :return:
+    """
+    return f'{OWNER_SWITCH}={token}'
+
+
+def _owner(cmdline):
+    """
+    get owner token and pid from command line of chrome, None if not launched by gerapy-selenium
+    :param cmdline:
+    :return: tuple of token and pid
+    """
+    for argument in cmdline or []:
+        if argument.startswith(OWNER_SWITCH + '='):
+            token = argument.split('=', 1)[1]
+            try:
+                return token, int(token.split('.', 1)[0])
+            except ValueError:
+                return None
+    return None
+
+
+def find_browser_pid(driver):
+    """
+    find pid of main chrome process of webdriver session by its profile directory
+    :param driver: webdriver
+    :return: pid or None if not found or psutil not installed
+    """
+    if psutil is None:
+        return None
+    capabilities = getattr(driver, 'capabilities', None) or {}
+    user_data_dir = (capabilities.get('chrome') or {}).get('userDataDir')
+    if not user_data_dir:
+        return None
+    argument = f'--user-data-dir={user_data_dir}'
+    for process in psutil.process_iter(['pid', 'cmdline']):
+        cmdline = process.info['cmdline'] or []
+        # child processes of chrome have --type switch
+        if argument in cmdline and not any(item.startswith('--type=') for item in cmdline):
+            return process.info['pid']
+    return None
+
+
+def tree_rss(pid):
+    """
+    get total rss of process and its children in bytes
+    :param pid:
+    :return: rss or None if process not found
+    """
+    if psutil is None or not pid:
+        return None
+    try:
+        root = psutil.Process(pid)
+        processes = [root] + root.children(recursive=True)
+    except psutil.NoSuchProcess:
+        return None
+    rss = 0
+    for process in processes:
+        try:
+            rss += process.memory_info().rss
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    return rss
+
+
+def kill_tree(pid, timeout=3):
+    """
+    kill process and its children
+    :param pid:
+    :param timeout: seconds to wait for processes to exit
+    :return: number of killed processes
+    """
+    if psutil is None or not pid:
+        return 0
+    try:
+        root = psutil.Process(pid)
+        processes = root.children(recursive=True) + [root]
+    except psutil.NoSuchProcess:
+        return 0
+    for process in processes:
+        try:
+            process.kill()
+        except psutil.NoSuchProcess:
+            pass
+    psutil.wait_procs(processes, timeout=timeout)
+    return len(processes)
+
+
+def reap(token=None, drivers=()):
+    """
+    kill leftover chrome launched by gerapy-selenium, and the chromedriver which launched it
+    :param token: owner token of middleware, browsers marked by it are killed too, otherwise only
+        browsers whose owner process has exited
+    :param drivers: pids of chromedriver launched by middleware, other chromedriver like of remote
+        nodes on this host are never killed
+    :return: number of killed processes
+    """
+    if psutil is None:
+        logger.debug('psutil is not installed, skip reaping browsers')
+        return 0
+    pid = os.getpid()
+    killed = 0
+    for process in psutil.process_iter(['pid', 'cmdline']):
+        cmdline = process.info['cmdline'] or []
+        owner = _owner(cmdline)
+        if owner is None or any(item.startswith('--type=') for item in cmdline):
+            continue
+        owner_token, owner_pid = owner
+        if owner_token != token and (owner_pid == pid or psutil.pid_exists(owner_pid)):
+            continue
+        try:
+            parent = process.parent()
+            ours = parent is not None and parent.pid in drivers
+            # session of this crawl on a remote node of this host, quit by its own chromedriver
+            if owner_token == token and not ours and parent is not None and 'chromedriver' in parent.name():
+                continue
+        except psutil.NoSuchProcess:
+            continue
+        killed += kill_tree(process.info['pid'])
+        if ours:
+            killed += kill_tree(parent.pid)
+    if killed:
+        logger.info('reaped %s leftover browser processes', killed)
+    return killed
@@ -106,6 +106,10 @@ setup(
     url=URL,
     packages=find_packages(exclude=('tests',)),
     install_requires=REQUIRED,
+    extras_require={
+        'asyncio': ['aiohttp'],
+        'watchdog': ['psutil'],
+    },
     include_package_data=True,
     license='MIT',
     classifiers=[
@@ -0,0 +1,29 @@
+class FakeDriver(object):
+    """
+    Webdriver standing in for chrome, records quit
+    """
+
+    def __init__(self, alive=True, error=None):
+        self.alive = alive
+        self.error = error
+        self.quitted = False
+        self.urls = []
+
+    def set_page_load_timeout(self, timeout):
+        pass
+
+    def execute_script(self, script, *args):
+        if not self.alive:
+            raise RuntimeError('session is dead')
+        return None
+
+    def execute_cdp_cmd(self, cmd, cmd_args):
+        return {}
+
+    def get(self, url):
+        self.urls.append(url)
+        if self.error and url != 'about:blank':
+            raise self.error
+
+    def quit(self):
+        self.quitted = True
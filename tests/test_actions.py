@@ -0,0 +1,73 @@
+import pytest
+from selenium.common.exceptions import TimeoutException
+from gerapy_selenium.actions import compile_actions, page_script, run_function
+from gerapy_selenium.pool import TabDriver
+
+
+class PollingDriver(TabDriver):
+
+    def __init__(self, states):
+        self.states = list(states)
+        self.scripts = []
+
+    def execute_script(self, script, *args):
+        self.scripts.append(args)
+        if len(self.scripts) == 1:
+            return None
+        return self.states.pop(0) if len(self.states) > 1 else self.states[0]
+
+
+def test_run_function_polls_result():
+    driver = PollingDriver([{'done': False}, {'done': False}, {'done': True, 'result': {'results': [1]}}])
+    assert run_function(driver, 'async function () {}', ([], 10), 10, interval=0) == {'results': [1]}
+    key = driver.scripts[0][2]
+    assert all(args == (key,) for args in driver.scripts[1:])
+    assert len(driver.scripts) == 4
+
+
+class AsyncDriver(object):
+
+    def __init__(self, result):
+        self.result = result
+        self.calls = []
+
+    def set_script_timeout(self, timeout):
+        self.calls.append(('timeout', timeout))
+
+    def execute_async_script(self, script, *args):
+        self.calls.append(('script', args))
+        return self.result
+
+
+def test_run_function_exclusive_browser():
+    driver = AsyncDriver({'results': [1]})
+    assert run_function(driver, 'async function () {}', ([], 10), 10) == {'results': [1]}
+    assert driver.calls == [('timeout', 10), ('script', ([], 10))]
+
+
+def test_run_function_timeout():
+    driver = PollingDriver([{'done': False}])
+    with pytest.raises(TimeoutException):
+        run_function(driver, 'async function () {}', ([], 10), 0.05, interval=0.01)
+
+
+def test_compile_actions():
+    function, arguments = compile_actions([
+        {'action': 'click', 'selector': '.more'},
+        {'action': 'evaluate', 'script': 'return document.title'},
+        {'action': 'evaluate', 'script': 'return 1'},
+    ])
+    assert arguments == [
+        {'action': 'click', 'selector': '.more'},
+        {'action': 'evaluate', 'script': 0},
+        {'action': 'evaluate', 'script': 1},
+    ]
+    assert 'async function () {\nreturn document.title\n}, async function () {\nreturn 1\n}' in function
+    assert page_script([{'action': 'scroll'}])[0].startswith('return (async function (actions, timeout)')
+
+
+def test_compile_actions_validates():
+    with pytest.raises(ValueError, match='unknown action'):
+        compile_actions([{'action': 'hover'}])
+    with pytest.raises(ValueError, match='type of action 0 requires text'):
+        compile_actions([{'action': 'type', 'selector': 'input'}])
@@ -0,0 +1,92 @@
+import time
+from io import BytesIO
+import pytest
+from scrapy import Spider
+from scrapy.http import HtmlResponse
+from scrapy.settings import Settings
+from scrapy.utils.test import get_crawler
+from gerapy_selenium import SeleniumRequest
+from gerapy_selenium.cache import DbmCacheStorage, FilesystemCacheStorage, request_fingerprint
+from gerapy_selenium.downloadermiddlewares import SeleniumMiddleware
+
+
+class CacheSpider(Spider):
+    name = 'cache'
+
+
+def test_middleware_with_default_cache_settings(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    crawler = get_crawler(CacheSpider, {'GERAPY_SELENIUM_CACHE_ENABLED': True})
+    middleware = SeleniumMiddleware.from_crawler(crawler)
+    try:
+        assert isinstance(middleware.cache, FilesystemCacheStorage)
+        assert middleware.cache.cachedir.endswith('selenium-cache')
+        assert middleware.cache.use_gzip
+        assert middleware.cache.expiration_secs == 0
+    finally:
+        middleware._stop_threadpool()
+
+
+def test_rendered_url_after_redirect_cached(tmp_path):
+    crawler = get_crawler(CacheSpider, {'GERAPY_SELENIUM_CACHE_ENABLED': True,
+                                        'GERAPY_SELENIUM_CACHE_DIR': str(tmp_path)})
+    middleware = SeleniumMiddleware.from_crawler(crawler)
+    spider = CacheSpider()
+    middleware.cache.open_spider(spider)
+    try:
+        request = SeleniumRequest('http://example.com/old')
+        response = middleware._build_response(request, '<html></html>', url='https://example.com/new')
+        assert response.url == 'https://example.com/new'
+        middleware._store_cache(spider, request, response)
+        assert middleware.cache.retrieve_response(spider, request.copy()).url == 'https://example.com/new'
+    finally:
+        middleware.cache.close_spider(spider)
+        middleware._stop_threadpool()
+
+
+def test_fingerprint_ignores_fields_not_affecting_content():
+    request = SeleniumRequest('https://example.com/?b=2&a=1', wait_for='.item')
+    assert request_fingerprint(request) == request_fingerprint(
+        SeleniumRequest('https://example.com/?a=1&b=2', wait_for='.item', proxy='http://127.0.0.1:8888',
+                        timeout=10))
+    assert request_fingerprint(request) != request_fingerprint(SeleniumRequest('https://example.com/?a=1&b=2'))
+    assert request_fingerprint(request) != request_fingerprint(
+        SeleniumRequest('https://example.com/?a=1&b=2', wait_for='.item', screenshot=True))
+
+
+@pytest.mark.parametrize('storage', [FilesystemCacheStorage, DbmCacheStorage])
+@pytest.mark.parametrize('use_gzip', [True, False])
+def test_storage_round_trip(tmp_path, storage, use_gzip):
+    settings = Settings({'GERAPY_SELENIUM_CACHE_DIR': str(tmp_path), 'GERAPY_SELENIUM_CACHE_GZIP': use_gzip})
+    spider = CacheSpider()
+    cache = storage(settings)
+    cache.open_spider(spider)
+    try:
+        request = SeleniumRequest('https://example.com', screenshot=True, extract='return 1')
+        assert cache.retrieve_response(spider, request) is None
+        response = HtmlResponse(request.url, body=b'<html>cached</html>', encoding='utf-8', request=request)
+        response.meta['screenshot'] = BytesIO(b'image')
+        response.meta['selenium_extracted'] = {'title': 'cached'}
+        cache.store_response(spider, request, response)
+
+        cached = cache.retrieve_response(spider, request.copy())
+        assert cached.url == response.url
+        assert cached.status == 200
+        assert cached.body == response.body
+        assert cached.meta['screenshot'].getvalue() == b'image'
+        assert cached.meta['selenium_extracted'] == {'title': 'cached'}
+        assert cache.retrieve_response(spider, SeleniumRequest('https://example.com')) is None
+    finally:
+        cache.close_spider(spider)
+
+
+def test_storage_expiration(tmp_path, monkeypatch):
+    settings = Settings({'GERAPY_SELENIUM_CACHE_DIR': str(tmp_path), 'GERAPY_SELENIUM_CACHE_EXPIRATION_SECS': 10})
+    spider = CacheSpider()
+    cache = FilesystemCacheStorage(settings)
+    request = SeleniumRequest('https://example.com')
+    cache.store_response(spider, request, HtmlResponse(request.url, body=b'<html></html>', request=request))
+    assert cache.retrieve_response(spider, request) is not None
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 20)
+    assert cache.retrieve_response(spider, request) is None
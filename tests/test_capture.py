@@ -0,0 +1,47 @@
+import base64
+import json
+from gerapy_selenium.capture import ResponseCapture, parse_log_entry
+
+
+def response_received(request_id, url):
+    return 'Network.responseReceived', {
+        'requestId': request_id,
+        'type': 'XHR',
+        'response': {'url': url, 'status': 200, 'headers': {}, 'mimeType': 'application/json'},
+    }
+
+
+def test_capture_matching_responses():
+    capture = ResponseCapture([r'/api/items', r'/api/facets'])
+    capture.feed(*response_received('1', 'https://example.com/api/items?page=1'))
+    capture.feed(*response_received('2', 'https://example.com/logo.png'))
+    capture.feed('Network.loadingFinished', {'requestId': '1'})
+    capture.feed('Network.loadingFinished', {'requestId': '2'})
+    assert capture.pop_finished() == ['1']
+    assert capture.pop_finished() == []
+    capture.add_body('1', {'body': base64.b64encode(b'{"items": [1]}').decode(), 'base64Encoded': True})
+    assert capture.responses[0]['data'] == {'items': [1]}
+    assert capture.responses[0]['type'] == 'XHR'
+    assert not capture.complete
+
+
+def test_capture_complete_and_errors():
+    capture = ResponseCapture(r'/api/search')
+    capture.feed(*response_received('1', 'https://example.com/api/search'))
+    capture.feed('Network.loadingFailed', {'requestId': '1'})
+    assert not capture.requests
+    capture.feed(*response_received('2', 'https://example.com/api/search'))
+    capture.feed('Network.loadingFinished', {'requestId': '2'})
+    capture.pop_finished()
+    capture.add_body('2', error=RuntimeError('evicted'))
+    assert capture.responses == [{
+        'url': 'https://example.com/api/search', 'status': 200, 'headers': {}, 'mime_type': 'application/json',
+        'type': 'XHR', 'body': None, 'data': None, 'error': 'evicted',
+    }]
+    assert capture.complete
+
+
+def test_parse_log_entry():
+    entry = {'message': json.dumps({'webview': 'tab', 'message': {'method': 'Network.loadingFinished',
+                                                                  'params': {'requestId': '1'}}})}
+    assert parse_log_entry(entry) == ('tab', 'Network.loadingFinished', {'requestId': '1'})
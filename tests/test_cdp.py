@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+
+from gerapy_selenium.cdp import Page
+
+
+class HangingConnection(object):
+    """
+    connection of a browser which never answers navigation
+    """
+
+    def __init__(self):
+        self.listeners = []
+
+    def wait_event(self, method, session_id=None):
+        future = asyncio.get_event_loop().create_future()
+        self.listeners.append(future)
+        return future
+
+    async def send(self, method, params=None, session_id=None):
+        await asyncio.Event().wait()
+
+
+class FakeBrowser(object):
+
+    def __init__(self, connection):
+        self.connection = connection
+
+
+def test_navigate_timeout_covers_command():
+    connection = HangingConnection()
+    page = Page(FakeBrowser(connection), 'session', 'target', 'context')
+
+    async def navigate():
+        task = asyncio.ensure_future(page.navigate('http://example.com', timeout=0.1))
+        done, _ = await asyncio.wait({task}, timeout=5)
+        assert done, 'navigate hung on unanswered command'
+        return task.result()
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(navigate())
+    assert all(future.cancelled() for future in connection.listeners)
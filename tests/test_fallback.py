@@ -0,0 +1,33 @@
+from gerapy_selenium.fallback import RenderDecider
+
+
+def test_key_by_domain_and_first_path_segment():
+    assert RenderDecider.key('https://example.com/detail/123?page=1') == 'example.com/detail'
+    assert RenderDecider.key('https://example.com/item42/a') == 'example.com/item0'
+    assert RenderDecider.key('https://example.com') == 'example.com'
+
+
+def test_try_http_until_enough_samples():
+    decider = RenderDecider(min_samples=3, threshold=0.5)
+    for _ in range(2):
+        assert decider.should_try_http('https://example.com/detail/1')
+        decider.record('https://example.com/detail/1', False)
+    assert decider.should_try_http('https://example.com/detail/1')
+    decider.record('https://example.com/detail/1', False)
+    assert not decider.should_try_http('https://example.com/detail/2')
+    # other patterns are decided separately
+    assert decider.should_try_http('https://example.com/list/1')
+
+
+def test_keep_http_when_static_is_sufficient():
+    decider = RenderDecider(min_samples=2, threshold=0.5)
+    for sufficient in (True, False, True):
+        decider.record('https://example.com/detail/1', sufficient)
+    assert decider.should_try_http('https://example.com/detail/2')
+
+
+def test_explore_after_deciding_to_render():
+    decider = RenderDecider(min_samples=1, explore_interval=3)
+    decider.record('https://example.com/detail/1', False)
+    results = [decider.should_try_http('https://example.com/detail/1') for _ in range(6)]
+    assert results == [False, False, True, False, False, True]
@@ -0,0 +1,248 @@
+import threading
+import pytest
+from scrapy import Spider
+from scrapy.downloadermiddlewares.cookies import CookiesMiddleware
+from scrapy.http import HtmlResponse
+from scrapy.utils.test import get_crawler
+from selenium.common.exceptions import WebDriverException
+from gerapy_selenium import SeleniumRequest
+from gerapy_selenium.downloadermiddlewares import SeleniumMiddleware
+from tests.fakes import FakeDriver
+
+
+class PoolSpider(Spider):
+    name = 'pool'
+
+
+def create_middleware(settings=None, driver=FakeDriver):
+    crawler = get_crawler(PoolSpider, dict({'GERAPY_SELENIUM_DRIVER_SERVICES': 0}, **(settings or {})))
+    middleware = SeleniumMiddleware.from_crawler(crawler)
+    middleware._launch_browser = lambda *args: driver()
+    return middleware
+
+
+def test_pool_dropped_after_last_browser_evicted():
+    middleware = create_middleware({'GERAPY_SELENIUM_MAX_BROWSERS': 1})
+    try:
+        first = middleware._get_pool('http://127.0.0.1:8001', True)
+        first.checkin(first.checkout(timeout=1))
+        middleware._put_pool(first)
+        assert list(middleware.pools) == [('http://127.0.0.1:8001', True)]
+
+        second = middleware._get_pool('http://127.0.0.1:8002', True)
+        lease = second.checkout(timeout=1)
+        assert list(middleware.pools) == [('http://127.0.0.1:8002', True)]
+        assert first not in middleware.limiter._pools
+        second.checkin(lease)
+        middleware._put_pool(second)
+        # idle browser is kept for later requests
+        assert middleware.pools[('http://127.0.0.1:8002', True)] is second
+    finally:
+        middleware._stop_threadpool()
+
+
+def test_pool_in_use_is_kept():
+    middleware = create_middleware()
+    try:
+        pool = middleware._get_pool(None, True)
+        other = middleware._get_pool(None, True)
+        assert pool is other
+        middleware._put_pool(pool)
+        assert middleware.pools[(None, True)] is pool
+        middleware._put_pool(other)
+        assert not middleware.pools
+    finally:
+        middleware._stop_threadpool()
+
+
+def test_page_error_keeps_browser():
+    driver = FakeDriver(error=WebDriverException('net::ERR_NAME_NOT_RESOLVED'))
+    middleware = create_middleware(driver=lambda: driver)
+    spider = PoolSpider()
+    try:
+        with pytest.raises(WebDriverException):
+            middleware._process_request(SeleniumRequest('http://unresolved.test'), spider)
+        assert not driver.quitted
+        assert len(middleware.pools[(None, True)].browsers()) == 1
+    finally:
+        middleware._stop_threadpool()
+
+
+def test_dead_session_discards_browser():
+    driver = FakeDriver(error=WebDriverException('session deleted'))
+    middleware = create_middleware(driver=lambda: driver)
+    spider = PoolSpider()
+    original = driver.get
+
+    def get(url):
+        driver.alive = False
+        original(url)
+
+    driver.get = get
+    try:
+        with pytest.raises(WebDriverException):
+            middleware._process_request(SeleniumRequest('http://crashed.test'), spider)
+        assert driver.quitted
+        assert not middleware.pools
+    finally:
+        middleware._stop_threadpool()
+
+
+class EvaluateDriver(object):
+
+    def __init__(self, result):
+        self.result = result
+        self.commands = []
+
+    def execute_cdp_cmd(self, cmd, cmd_args):
+        self.commands.append(cmd)
+        return self.result if cmd == 'Runtime.evaluate' else {}
+
+
+def test_evaluate_calls_function():
+    driver = EvaluateDriver({'result': {'type': 'function', 'objectId': '1'}})
+    SeleniumMiddleware._evaluate(driver, '() => { console.log(document) }')
+    assert driver.commands == ['Runtime.evaluate', 'Runtime.callFunctionOn']
+    driver = EvaluateDriver({'result': {'type': 'undefined'}})
+    SeleniumMiddleware._evaluate(driver, 'console.log(document)')
+    assert driver.commands == ['Runtime.evaluate']
+
+
+def test_evaluate_raises_exception_of_page():
+    driver = EvaluateDriver({'result': {}, 'exceptionDetails': {'text': 'Uncaught'}})
+    with pytest.raises(WebDriverException):
+        SeleniumMiddleware._evaluate(driver, 'throw new Error()')
+
+
+class ScriptDriver(EvaluateDriver):
+
+    def execute_cdp_cmd(self, cmd, cmd_args):
+        self.commands.append(cmd)
+        return self.result
+
+
+def test_tracker_installed_only_when_waited():
+    driver = ScriptDriver({'identifier': '1'})
+    SeleniumMiddleware._install_tracker(driver, False)
+    assert driver.commands == []
+    SeleniumMiddleware._install_tracker(driver, True)
+    SeleniumMiddleware._install_tracker(driver, True)
+    assert driver.commands == ['Page.addScriptToEvaluateOnNewDocument']
+    SeleniumMiddleware._install_tracker(driver, False)
+    assert driver.commands[-1] == 'Page.removeScriptToEvaluateOnNewDocument'
+    assert driver.tracker is None
+
+
+def test_blocked_urls_of_resource_types():
+    middleware = create_middleware({'GERAPY_SELENIUM_BLOCKED_URLS': ['*.ads.test/*']})
+    try:
+        meta = {'ignore_resource_types': ['image', 'tracker']}
+        blocked = middleware._get_blocked_urls(meta)
+        assert '*.ads.test/*' in blocked
+        assert '*.png' in blocked and '*.png?*' in blocked
+        assert '*google-analytics.com/*' in blocked
+        blocked = middleware._get_blocked_urls(meta, by_extension=False)
+        assert '*.png' not in blocked
+        assert '*google-analytics.com/*' in blocked
+        assert middleware._get_blocked_urls({}) == ['*.ads.test/*']
+    finally:
+        middleware._stop_threadpool()
+
+
+def test_cookies_of_header_and_request():
+    middleware = create_middleware()
+    try:
+        request = SeleniumRequest('https://example.com/page', headers={'Cookie': 'session=1; theme=dark'},
+                                  cookies={'theme': 'light', 'lang': 'en'})
+        cookies = sorted(middleware._get_cookies(request), key=lambda cookie: cookie['name'])
+        assert cookies == [
+            {'name': 'lang', 'value': 'en', 'url': 'https://example.com/page'},
+            {'name': 'session', 'value': '1', 'url': 'https://example.com/page'},
+            {'name': 'theme', 'value': 'light', 'url': 'https://example.com/page'},
+        ]
+        request = SeleniumRequest('https://example.com/page', cookies=[
+            {'name': 'a', 'value': 1, 'domain': '.example.com', 'secure': True},
+            {'name': 'b', 'value': 'x'},
+            {'value': 'unnamed'},
+        ])
+        assert middleware._get_cookies(request) == [
+            {'name': 'a', 'value': '1', 'domain': '.example.com', 'path': '/', 'secure': True},
+            {'name': 'b', 'value': 'x', 'url': 'https://example.com/page'},
+        ]
+    finally:
+        middleware._stop_threadpool()
+
+
+def test_cookies_of_cookiejar():
+    middleware = create_middleware()
+    try:
+        middleware.cookies_middleware = CookiesMiddleware()
+        request = SeleniumRequest('https://example.com/login')
+        response = HtmlResponse('https://example.com/login', headers={'Set-Cookie': 'token=abc; Path=/'},
+                                request=request)
+        middleware.cookies_middleware.jars[None].extract_cookies(response, request)
+        assert middleware._get_cookies(SeleniumRequest('https://example.com/page')) == [
+            {'name': 'token', 'value': 'abc', 'url': 'https://example.com/page'},
+        ]
+        assert middleware._get_cookies(SeleniumRequest('https://example.com/page',
+                                                       meta={'dont_merge_cookies': True})) == []
+    finally:
+        middleware._stop_threadpool()
+
+
+def run_in_thread(middleware, name, call):
+    """
+    replace method of middleware by one recording its thread, then trigger it by call
+    """
+    threads = []
+    done = threading.Event()
+
+    def record(*args, **kwargs):
+        threads.append(threading.current_thread().name)
+        done.set()
+
+    setattr(middleware, name, record)
+    call()
+    assert done.wait(5)
+    return threads[0]
+
+
+def test_blocking_jobs_run_in_render_workers():
+    middleware = create_middleware()
+    spider = PoolSpider()
+    try:
+        assert 'gerapy-selenium' in run_in_thread(middleware, '_check_memory', middleware._watch)
+        middleware._open_spider = lambda spider: None
+        assert 'gerapy-selenium' in run_in_thread(middleware, '_spider_opened',
+                                                  lambda: middleware.spider_opened(spider))
+        assert 'gerapy-selenium' in run_in_thread(middleware, '_spider_closed',
+                                                  lambda: middleware.spider_closed(spider))
+    finally:
+        middleware._stop_threadpool()
+
+
+def test_render_in_render_workers():
+    middleware = create_middleware({'GERAPY_SELENIUM_MAX_WORKERS': 2})
+    try:
+        assert middleware.threadpool.max == 2
+        request = SeleniumRequest('https://example.com')
+        thread = run_in_thread(middleware, '_process_request',
+                               lambda: middleware._submit(request, PoolSpider()))
+        assert 'gerapy-selenium' in thread
+        assert middleware.pending == 1
+    finally:
+        middleware._stop_threadpool()
+
+
+def test_http_first_error_rendered():
+    middleware = create_middleware({'GERAPY_SELENIUM_HTTP_FIRST': True})
+    try:
+        request = SeleniumRequest('https://example.com/detail/1')
+        request.meta['selenium_fallback'] = 'http'
+        render_request = middleware.process_exception(request, ConnectionRefusedError(), PoolSpider())
+        assert render_request.meta['selenium_fallback'] == 'render'
+        assert render_request.dont_filter
+        assert middleware.stats.get_value('selenium/http_first/error_count') == 1
+        assert middleware.process_exception(render_request, ConnectionRefusedError(), PoolSpider()) is None
+    finally:
+        middleware._stop_threadpool()
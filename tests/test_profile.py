@@ -0,0 +1,20 @@
+import threading
+from gerapy_selenium.profile import ProfileTemplate
+
+
+def test_release_persists_busiest_browser_one_by_one(tmp_path):
+    template = ProfileTemplate(str(tmp_path / 'template'), persist=True)
+    saved = []
+
+    def save(profile_dir):
+        assert template._persist_lock.locked()
+        saved.append(profile_dir)
+
+    template._save = save
+    threads = [threading.Thread(target=template.release, args=(template.clone(), pages))
+               for pages in (3, 5, 1)]
+    for thread in threads:
+        thread.start()
+        thread.join()
+    assert len(saved) == 2
+    assert template._persisted_pages == 5
@@ -0,0 +1,28 @@
+from gerapy_selenium.remote import RemoteNodes
+
+
+def test_least_loaded_node_by_weight():
+    nodes = RemoteNodes({'http://a:4444': 1, 'http://b:4444': 4})
+    first, second = nodes.nodes
+    first.sessions, second.sessions = 1, 2
+    assert nodes._candidates() == [second, first]
+
+
+def test_node_removed_after_failures():
+    nodes = RemoteNodes(['http://a:4444'], max_failures=2)
+    node = nodes.nodes[0]
+    nodes._failed(node, 'refused')
+    assert not node.down
+    nodes._failed(node, 'refused')
+    assert node.down
+    assert nodes._candidates() == []
+
+
+def test_down_nodes_probed_when_none_left(monkeypatch):
+    nodes = RemoteNodes(['http://a:4444'], max_failures=1)
+    node = nodes.nodes[0]
+    nodes._failed(node, 'refused')
+    monkeypatch.setattr(nodes, '_healthy', lambda node: (True, None))
+    nodes._probe_down()
+    assert not node.down
+    assert nodes._candidates() == [node]
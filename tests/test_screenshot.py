@@ -0,0 +1,19 @@
+from scrapy import Spider
+from gerapy_selenium import SeleniumRequest
+from gerapy_selenium.screenshot import ScreenshotStore
+
+
+class ScreenshotSpider(Spider):
+    name = 'screenshot'
+
+
+def test_path_differs_by_options(tmp_path):
+    store = ScreenshotStore(str(tmp_path))
+    spider = ScreenshotSpider()
+    viewport = SeleniumRequest('https://example.com', screenshot=True)
+    clipped = SeleniumRequest('https://example.com', screenshot={'clip': {'x': 0, 'y': 0, 'width': 10, 'height': 10}})
+    assert store.path(spider, viewport, {}) != store.path(spider, clipped, clipped.meta['selenium']['screenshot'])
+    assert store.path(spider, viewport, {}) != store.path(spider, viewport, {'type': 'jpeg'})
+    assert store.path(spider, viewport, {'type': 'jpeg'}).endswith('.jpg')
+    assert store.path(spider, viewport, {}) == store.path(spider, viewport.copy(), {})
+    assert store.path(spider, viewport, {}).startswith(str(tmp_path / 'screenshot'))
@@ -0,0 +1,20 @@
+import pytest
+from gerapy_selenium.scroll import DEFAULT_OPTIONS, scroll_options
+
+
+def test_scroll_options_defaults():
+    options = scroll_options(True, 30)
+    assert options == dict(DEFAULT_OPTIONS, max_time=30)
+
+
+def test_scroll_options_override():
+    options = scroll_options({'items': '.item', 'max_scrolls': 5, 'max_time': 10}, 30)
+    assert options['items'] == '.item'
+    assert options['max_scrolls'] == 5
+    assert options['max_time'] == 10
+    assert options['idle'] == DEFAULT_OPTIONS['idle']
+
+
+def test_scroll_options_unknown():
+    with pytest.raises(ValueError, match='unknown scroll options delay'):
+        scroll_options({'delay': 1}, 30)
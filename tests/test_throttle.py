@@ -0,0 +1,37 @@
+from gerapy_selenium.throttle import RenderThrottle
+
+
+def test_slots_limit_concurrency():
+    throttle = RenderThrottle(10, start_slots=2, min_slots=1, max_slots=4)
+    granted = []
+    assert throttle.acquire('a.com', None)
+    assert throttle.acquire('a.com', None)
+    assert not throttle.acquire('a.com', lambda: granted.append(True))
+    # other domains have their own slots
+    assert throttle.acquire('b.com', None)
+    throttle.release('a.com')
+    assert granted == [True]
+    assert throttle.waiting == 0
+
+
+def test_slots_grow_when_fast():
+    throttle = RenderThrottle(10, start_slots=2, min_slots=1, max_slots=4)
+    for _ in range(10):
+        throttle.acquire('a.com', None)
+        throttle.release('a.com', latency=1)
+    assert throttle.limit('a.com') == 4
+
+
+def test_slots_shrink_when_slow():
+    throttle = RenderThrottle(10, start_slots=4, min_slots=1, max_slots=4)
+    for _ in range(10):
+        throttle.acquire('a.com', None)
+        throttle.release('a.com', latency=40)
+    assert throttle.limit('a.com') == 1
+
+
+def test_slots_halved_on_failure():
+    throttle = RenderThrottle(10, start_slots=4, min_slots=1, max_slots=4)
+    throttle.acquire('a.com', None)
+    throttle.release('a.com', ok=False)
+    assert throttle.limit('a.com') == 2
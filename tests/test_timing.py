@@ -0,0 +1,40 @@
+from scrapy.statscollectors import MemoryStatsCollector
+from scrapy.utils.test import get_crawler
+from gerapy_selenium.timing import Histogram, PhaseStats, RenderTimings
+
+
+def test_histogram_percentiles_within_bucket_error():
+    histogram = Histogram()
+    for value in range(1, 101):
+        histogram.add(value / 100)
+    assert histogram.count == 100
+    assert histogram.max == 1
+    assert 0.5 <= histogram.percentile(50) <= 0.5 * 1.1
+    assert 0.95 <= histogram.percentile(95) <= 1
+    assert histogram.percentile(100) == 1
+
+
+def test_histogram_empty():
+    assert Histogram().percentile(50) == 0
+
+
+def test_render_timings_sum_phases():
+    timings = RenderTimings()
+    with timings.phase('acquire'):
+        pass
+    with timings.phase('acquire'):
+        pass
+    result = timings.finish()
+    assert set(result) == {'acquire', 'total'}
+    assert result['total'] >= result['acquire']
+
+
+def test_phase_stats():
+    stats = MemoryStatsCollector(get_crawler())
+    phase_stats = PhaseStats(stats)
+    phase_stats.record_all({'navigate': 1.0, 'total': 2.0})
+    phase_stats.record('navigate', 3.0)
+    assert stats.get_value('selenium/timing/navigate/count') == 2
+    assert stats.get_value('selenium/timing/navigate/total') == 4.0
+    assert stats.get_value('selenium/timing/navigate/max') == 3.0
+    assert stats.get_value('selenium/timing/total/p50') == 2.0
@@ -0,0 +1,50 @@
+import os
+from types import SimpleNamespace
+from gerapy_selenium import watchdog
+from gerapy_selenium.watchdog import _owner, owner_argument, owner_token
+
+
+def test_owner_token_is_unique_per_middleware():
+    first, second = owner_token(), owner_token()
+    assert first != second
+    assert first.startswith(f'{os.getpid()}.')
+
+
+def test_owner_parsed_from_cmdline():
+    token = owner_token()
+    cmdline = ['chrome', '--headless', owner_argument(token)]
+    assert _owner(cmdline) == (token, os.getpid())
+    assert _owner(['chrome', '--headless']) is None
+    assert _owner(['chrome', '--gerapy-selenium-owner=invalid']) is None
+
+
+class FakeProcess(object):
+
+    def __init__(self, pid, name, cmdline=None, parent=None):
+        self.pid = pid
+        self.info = {'pid': pid, 'cmdline': cmdline or [name]}
+        self._name = name
+        self._parent = parent
+
+    def name(self):
+        return self._name
+
+    def parent(self):
+        return self._parent
+
+
+def test_reap_kills_only_chromedriver_launched_by_middleware(monkeypatch):
+    token = owner_token()
+    driver = FakeProcess(100, 'chromedriver')
+    node = FakeProcess(200, 'chromedriver')
+    processes = [
+        FakeProcess(101, 'chrome', ['chrome', owner_argument(token)], driver),
+        FakeProcess(201, 'chrome', ['chrome', owner_argument(token)], node),
+    ]
+    fake_psutil = SimpleNamespace(process_iter=lambda attrs: processes, pid_exists=lambda pid: True,
+                                  NoSuchProcess=Exception)
+    killed = []
+    monkeypatch.setattr(watchdog, 'psutil', fake_psutil)
+    monkeypatch.setattr(watchdog, 'kill_tree', lambda pid: killed.append(pid) or 1)
+    assert watchdog.reap(token, drivers={100}) == 2
+    assert killed == [101, 100]